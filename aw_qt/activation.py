@@ -0,0 +1,274 @@
+"""
+Socket activation of modules (``listen`` in a module's config), like systemd's socket units:
+aw-qt binds the port itself and starts the module on the first connection, passing it the socket.
+"""
+
+import sys
+import socket
+import logging
+import selectors
+import threading
+from time import monotonic
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from .wakeup import Waker
+
+if TYPE_CHECKING:
+    from .manager import Manager, Module
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for connections, when an idle_timeout is set
+_IDLE_CHECK_INTERVAL = 5.0
+_BACKLOG = 128
+# Sets the variables and moves the socket (passed as stdin) to fd 3, then runs the module with the
+# same pid, which LISTEN_PID has to be. Popen can't place fds itself, and sh only takes fds 0-9.
+_TRAMPOLINE = 'LISTEN_PID=$$ LISTEN_FDS=1; export LISTEN_PID LISTEN_FDS; exec "$@" 3<&0 0</dev/null'
+# TCP_ESTABLISHED in /proc/net/tcp
+_ESTABLISHED = "01"
+
+
+def is_supported() -> bool:
+    # LISTEN_FDS is a Unix convention, and passing sockets relies on fd inheritance
+    return sys.platform != "win32"
+
+
+def parse_address(value: object) -> Tuple[str, int]:
+    """Parses a ``listen`` address, like ``"localhost:5600"``, ``"[::1]:5600"`` or a port like 5600"""
+    if isinstance(value, int):
+        return "localhost", value
+    url = urlsplit(f"//{value}")
+    try:
+        port = url.port
+    except ValueError:
+        port = None
+    if port is None:
+        raise ValueError(f"Invalid address {value!r}, expected host:port")
+    return url.hostname or "localhost", port
+
+
+def format_address(address: Tuple[str, int]) -> str:
+    host, port = address
+    return f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+
+
+def wrap_command(command: List[str]) -> List[str]:
+    """
+    The command to start a module with its listening socket, which has to be passed as its stdin.
+    Its stdin is /dev/null once started.
+    """
+    return ["/bin/sh", "-c", _TRAMPOLINE, "aw-qt-activate"] + command
+
+
+def _count_connections(port: int) -> Optional[int]:
+    """Established TCP connections to a local port, or None if that can't be told (only on Linux)"""
+    count = 0
+    found = False
+    for path in ["/proc/net/tcp", "/proc/net/tcp6"]:
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split(None, 4)
+                    local_port = int(fields[1].rpartition(":")[2], 16)
+                    if local_port == port and fields[3] == _ESTABLISHED:
+                        count += 1
+            found = True
+        except (OSError, StopIteration, IndexError, ValueError):
+            pass
+    return count if found else None
+
+
+class _Listener:
+    def __init__(
+        self, name: str, sock: socket.socket, address: Tuple[str, int]
+    ) -> None:
+        self.name = name
+        self.sock = sock
+        self.address = address
+        # How often the module was started by a connection
+        self.activations = 0
+        # Monotonic time the module was last seen with connections, or started
+        self.active_at = monotonic()
+        self.stopping = False
+        self.idle_warned = False
+
+
+class SocketActivator:
+    def __init__(self, manager: "Manager") -> None:
+        """Listens on the sockets of the modules of ``manager``, starting them on the first connection"""
+        self.manager = manager
+        self._listeners: Dict[str, _Listener] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._waker = Waker()
+        manager.model.subscribe(self._on_module_event)
+
+    def listen(self, module: "Module") -> bool:
+        """
+        Binds the module's ``listen`` address, so that it's started on the first connection.
+        Returns False if it has none, or binding it failed (then it should be started right away).
+        """
+        address = self.manager.settings.module(module.name).listen
+        if address is None:
+            return False
+        with self._lock:
+            listener = self._listeners.get(module.name)
+            if listener is None:
+                try:
+                    sock = socket.create_server(address, backlog=_BACKLOG)
+                except OSError as e:
+                    logger.error(
+                        f"Could not listen on {format_address(address)} for module {module.name}, starting it right away: {e}"
+                    )
+                    return False
+                listener = self._listeners[module.name] = _Listener(
+                    module.name, sock, address
+                )
+            module.listen_socket = listener.sock
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="aw-qt-activation", daemon=True
+                )
+                self._thread.start()
+        logger.info(
+            f"Listening on {format_address(address)}, module {module.name} is started on the first connection"
+        )
+        self._wake()
+        return True
+
+    def get_socket(self, name: str) -> Optional[socket.socket]:
+        """The listening socket of a module, if aw-qt listens for it"""
+        listener = self._listeners.get(name)
+        return listener.sock if listener else None
+
+    def info(self, name: str) -> Optional[Dict[str, object]]:
+        listener = self._listeners.get(name)
+        if listener is None:
+            return None
+        return {
+            "address": format_address(listener.address),
+            "activations": listener.activations,
+        }
+
+    def stop_listening(self, name: Optional[str] = None) -> None:
+        """Closes the socket of a module (or of all of them), running modules keep their copy"""
+        with self._lock:
+            names = [name] if name is not None else list(self._listeners)
+            for n in names:
+                listener = self._listeners.pop(n, None)
+                if listener is None:
+                    continue
+                module = self.manager.get_module(n)
+                if module is not None and module.listen_socket is listener.sock:
+                    module.listen_socket = None
+                listener.sock.close()
+                logger.info(f"Stopped listening on {format_address(listener.address)}")
+        self._wake()
+
+    def _on_module_event(self, event: str, module: "Module") -> None:
+        if module.name in self._listeners:
+            # Started or stopped, so whether to wait for connections changed
+            self._wake()
+
+    def _wake(self) -> None:
+        self._waker.wake()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                listeners = list(self._listeners.values())
+            waiting: List[_Listener] = []
+            timeout: Optional[float] = None
+            for listener in listeners:
+                module = self.manager.get_module(listener.name)
+                if module is None:
+                    continue
+                if not module.started:
+                    # Failed modules are left alone until they're started again,
+                    # their pending connections would keep waking us up
+                    if module.state != "failed":
+                        waiting.append(listener)
+                    continue
+                idle_timeout = self.manager.settings.module(listener.name).idle_timeout
+                if idle_timeout > 0:
+                    self._check_idle(listener, module, idle_timeout)
+                    interval = min(_IDLE_CHECK_INTERVAL, idle_timeout)
+                    timeout = interval if timeout is None else min(timeout, interval)
+
+            with selectors.DefaultSelector() as selector:
+                selector.register(self._waker, selectors.EVENT_READ)
+                for listener in waiting:
+                    try:
+                        selector.register(listener.sock, selectors.EVENT_READ, listener)
+                    except (ValueError, OSError):
+                        # Closed in the meantime
+                        pass
+                events = selector.select(timeout)
+            for key, _ in events:
+                if key.fileobj is self._waker:
+                    self._waker.drain()
+                else:
+                    self._activate(key.data)
+
+    def _activate(self, listener: _Listener) -> None:
+        module = self.manager.get_module(listener.name)
+        if module is None or listener.name not in self._listeners:
+            return
+        # The connection stays in the backlog, the module accepts it once it's up
+        with module._lock:
+            if module.started:
+                return
+            logger.info(
+                f"Connection on {format_address(listener.address)}, starting module {module.name}"
+            )
+            listener.activations += 1
+            listener.active_at = monotonic()
+            try:
+                module.listen_socket = listener.sock
+                module.start(self.manager.testing)
+            except Exception:
+                logger.exception(f"Failed to start module {module.name}")
+                module.mark_failed()
+
+    def _check_idle(
+        self, listener: _Listener, module: "Module", idle_timeout: float
+    ) -> None:
+        if listener.stopping:
+            return
+        now = monotonic()
+        started_at = module.started_at or now
+        listener.active_at = max(listener.active_at, started_at)
+        connections = _count_connections(listener.address[1])
+        if connections is None:
+            if not listener.idle_warned:
+                logger.warning(
+                    f"Can't tell whether module {module.name} is idle on this platform, ignoring its idle_timeout"
+                )
+                listener.idle_warned = True
+            return
+        if connections:
+            listener.active_at = now
+            return
+        if now - listener.active_at < idle_timeout:
+            return
+        logger.info(
+            f"Module {module.name} had no connections for {idle_timeout:g}s, stopping it until the next one"
+        )
+        listener.stopping = True
+        threading.Thread(
+            target=self._stop_idle,
+            args=(listener, module),
+            name=f"aw-qt-idle-{module.name}",
+            daemon=True,
+        ).start()
+
+    def _stop_idle(self, listener: _Listener, module: "Module") -> None:
+        try:
+            module.stop()
+        except Exception:
+            logger.exception(f"Failed to stop idle module {module.name}")
+        finally:
+            listener.stopping = False
+            self._wake()
@@ -0,0 +1,204 @@
+"""
+Adoption of modules that are still running from an earlier aw-qt (after ``aw-qt detach`` or a crash),
+found through a journal of the processes it started.
+"""
+
+import os
+import sys
+import json
+import select
+import signal
+import logging
+import subprocess
+from time import monotonic, sleep
+from typing import Any, Dict, List, Optional, Tuple
+
+from aw_core.dirs import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+# Reported as the exit code of adopted processes, taken as a failure by the supervisor
+UNKNOWN_RETURNCODE = 255
+# How often adopted processes are checked without a pidfd
+_POLL_INTERVAL = 1.0
+
+
+def is_supported() -> bool:
+    # Needs /proc to verify that a pid is still the same process
+    return sys.platform.startswith("linux")
+
+
+def get_journal_path(testing: bool) -> str:
+    return os.path.join(
+        get_cache_dir("aw-qt"), f"running{'-testing' if testing else ''}.json"
+    )
+
+
+def _boot_id() -> Optional[str]:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def process_starttime(pid: int) -> Optional[int]:
+    """The start time of a live process in clock ticks since boot, None if it isn't running"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name can contain spaces and parentheses, the fields after it can't
+    fields = data[data.rindex(b")") + 2:].split()
+    if fields[0] in [b"Z", b"X"]:
+        # Exited, but not reaped yet
+        return None
+    return int(fields[19])
+
+
+class AdoptedProcess:
+    """A module process started by an earlier aw-qt, with the parts of the ``Popen`` interface the manager uses"""
+
+    stdout = None
+    stderr = None
+
+    def __init__(self, args: List[str], pid: int, starttime: int) -> None:
+        self.args = args
+        self.pid = pid
+        self.starttime = starttime
+        self.returncode: Optional[int] = None
+        # Readable once the process exited, and unlike the pid it can't refer to another process
+        self.sentinel: Optional[int] = None
+        if hasattr(os, "pidfd_open"):
+            try:
+                self.sentinel = os.pidfd_open(pid)  # type: ignore[attr-defined]
+            except OSError:
+                pass
+        # Checked after opening the pidfd, so it's for the verified process
+        self.poll()
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None and process_starttime(self.pid) != self.starttime:
+            self.returncode = UNKNOWN_RETURNCODE
+            if self.sentinel is not None:
+                os.close(self.sentinel)
+                self.sentinel = None
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else monotonic() + timeout
+        while self.poll() is None:
+            remaining = _POLL_INTERVAL
+            if deadline is not None:
+                remaining = min(remaining, deadline - monotonic())
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.args, timeout or 0)
+            sentinel = self.sentinel
+            if sentinel is None:
+                sleep(remaining)
+                continue
+            try:
+                select.select([sentinel], [], [], remaining)
+            except (OSError, ValueError):
+                # Closed by poll() in another thread, the process exited
+                pass
+        assert self.returncode is not None
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        if self.poll() is not None:
+            return
+        try:
+            if self.sentinel is not None and hasattr(signal, "pidfd_send_signal"):
+                signal.pidfd_send_signal(self.sentinel, sig)  # type: ignore[attr-defined]
+            else:
+                os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+
+class JournalEntry:
+    def __init__(
+        self, name: str, type: str, path: str, pid: int, starttime: int
+    ) -> None:
+        self.name = name
+        self.type = type
+        self.path = path
+        self.pid = pid
+        self.starttime = starttime
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "type": self.type,
+            "path": self.path,
+            "pid": self.pid,
+            "starttime": self.starttime,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "JournalEntry":
+        return cls(
+            str(data["name"]),
+            str(data["type"]),
+            str(data["path"]),
+            int(data["pid"]),
+            int(data["starttime"]),
+        )
+
+
+class StateJournal:
+    def __init__(self, path: Optional[str]) -> None:
+        """The journal of running modules at ``path`` (None to not keep one)"""
+        self.path = path
+        self._boot_id = _boot_id()
+        # What was last written, to skip writing it again
+        self._saved: Optional[List[Tuple[str, str, int]]] = None
+
+    def load(self) -> List[JournalEntry]:
+        """The entries whose process is still the same one, dropping those that exited"""
+        if not self.path:
+            return []
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") != JOURNAL_VERSION:
+                return []
+            if data.get("boot_id") != self._boot_id:
+                # From before a reboot, none of those pids are ours anymore
+                return []
+            entries = [JournalEntry.from_json(e) for e in data["modules"]]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Could not read {self.path}, not adopting modules: {e}")
+            return []
+        return [e for e in entries if process_starttime(e.pid) == e.starttime]
+
+    def save(self, entries: List[JournalEntry]) -> None:
+        if not self.path:
+            return
+        key = [(e.type, e.name, e.pid) for e in entries]
+        data = {
+            "version": JOURNAL_VERSION,
+            "boot_id": self._boot_id,
+            "modules": [e.to_json() for e in entries],
+        }
+        if key == self._saved:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._saved = key
+        except OSError as e:
+            logger.warning(f"Could not write {self.path}: {e}")
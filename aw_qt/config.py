@@ -1,17 +1,165 @@
-from typing import List, Any
+import os
+from fnmatch import fnmatchcase
+from typing import Dict, List, Any, Optional, Tuple
 
 from aw_core.config import load_config_toml
+from aw_core.dirs import get_config_dir
 
+from .activation import parse_address
+from .pause import parse_window
+from .limits import ProcessLimits, parse_size
+from .readiness import Probe, parse_probe
+
+
+RESTART_POLICIES = ["never", "on-failure", "always"]
+LAUNCH_MODES = ["exec", "forkserver"]
 
 default_config = """
 [aw-qt]
 autostart_modules = ["aw-server", "aw-watcher-afk", "aw-watcher-window"]
+shutdown_timeout = 30.0
+sample_interval = 10.0
+status_log_interval = 600.0
+hotplug = true
+
+[aw-qt.modules."*"]
+depends_on = ["aw-server", "aw-server-rust"]
+
+[aw-qt.modules.aw-server]
+depends_on = []
+ready = "http://localhost:5600/api/0/info"
+
+[aw-qt.modules.aw-server-rust]
+depends_on = []
+ready = "http://localhost:5600/api/0/info"
 
 [aw-qt-testing]
 autostart_modules = ["aw-server", "aw-watcher-afk", "aw-watcher-window"]
+shutdown_timeout = 30.0
+sample_interval = 10.0
+status_log_interval = 600.0
+hotplug = true
+
+[aw-qt-testing.modules."*"]
+depends_on = ["aw-server", "aw-server-rust"]
+
+[aw-qt-testing.modules.aw-server]
+depends_on = []
+ready = "http://localhost:5666/api/0/info"
+
+[aw-qt-testing.modules.aw-server-rust]
+depends_on = []
+ready = "http://localhost:5666/api/0/info"
 """.strip()
 
 
+def get_config_path() -> str:
+    """The user's config file, the one ``load_config_toml`` reads"""
+    return os.path.join(get_config_dir("aw-qt"), "aw-qt.toml")
+
+
+class ModuleSettings:
+    def __init__(self, name: str, section: Dict[str, Any]) -> None:
+        """
+        Settings for a single module, from the `[aw-qt.modules.<name>]` tables of the config.
+        Dependencies which aren't being started are ignored, so watchers can depend on
+        both aw-server and aw-server-rust.
+        """
+        self.name = name
+        self.depends_on: List[str] = [str(d) for d in section.get("depends_on", [])]
+        # Seconds the module gets to exit after being asked to, before it is killed
+        self.stop_timeout = float(section.get("stop_timeout", 10.0))
+        # How to tell that the module is ready after starting it (see `parse_probe`),
+        # modules depending on it are only started once it is, or after ready_timeout seconds
+        self.ready: Optional[Probe] = (
+            parse_probe(str(section["ready"])) if section.get("ready") else None
+        )
+        self.ready_timeout = float(section.get("ready_timeout", 30.0))
+        # nice, ionice, cpu_affinity, rlimit_as and rlimit_nofile, see `ProcessLimits`
+        self.limits = ProcessLimits.from_config(section)
+
+        # Capture stdout/stderr into a buffer of the last output_buffer_lines lines and
+        # rotating files (see `OutputCapture`), at most output_rate_limit lines per second
+        # on average, with bursts of up to output_rate_burst lines (0 disables the limit)
+        # Modules with captured output aren't adopted after a crash (see `Manager._save_journal`)
+        self.capture_output = bool(section.get("capture_output", True))
+        self.output_buffer_lines = int(section.get("output_buffer_lines", 1000))
+        self.output_rate_limit = float(section.get("output_rate_limit", 100.0))
+        self.output_rate_burst = int(section.get("output_rate_burst", 1000))
+        self.output_max_bytes = int(section.get("output_max_bytes", 1024 * 1024))
+        self.output_backup_count = int(section.get("output_backup_count", 3))
+
+        # Recycle (gracefully restart) the module when its memory usage stays above max_rss
+        # (a size like "500M"), or its CPU usage averages more than max_cpu_percent,
+        # for watchdog_window seconds (no longer than the samples kept span, see sample_history),
+        # at most max_recycles_per_hour times per hour (see `Watchdog`)
+        self.max_rss: Optional[int] = (
+            parse_size(section["max_rss"]) if "max_rss" in section else None
+        )
+        self.max_cpu_percent: Optional[float] = (
+            float(section["max_cpu_percent"]) if "max_cpu_percent" in section else None
+        )
+        self.watchdog_window = float(section.get("watchdog_window", 300.0))
+        self.max_recycles_per_hour = int(section.get("max_recycles_per_hour", 3))
+
+        # How to start the module: "exec" runs its executable, "forkserver" forks it from a Python
+        # process with aw_core and aw_client already imported, running python_module
+        # (a module run like `python -m`, or "package.module:function"), see `ForkServer`
+        self.launch = str(section.get("launch", "exec"))
+        if self.launch not in LAUNCH_MODES:
+            raise ValueError(
+                f"Invalid launch mode {self.launch!r} for module {name}, must be one of {LAUNCH_MODES}"
+            )
+        self.python_module = str(section.get("python_module", name.replace("-", "_")))
+
+        # Socket activation: aw-qt listens on this address ("host:port") instead of starting the module,
+        # starts it on the first connection and passes the socket on as fd 3 (the module has to support
+        # LISTEN_FDS, see `SocketActivator`), and stops it again after idle_timeout seconds without
+        # connections (0 keeps it running)
+        self.listen: Optional[Tuple[str, int]] = (
+            parse_address(section["listen"]) if section.get("listen") else None
+        )
+        self.idle_timeout = float(section.get("idle_timeout", 0.0))
+
+        # What to do when the module stops unexpectedly, see `Supervisor`
+        self.restart = str(section.get("restart", "on-failure"))
+        if self.restart not in RESTART_POLICIES:
+            raise ValueError(
+                f"Invalid restart policy {self.restart!r} for module {name}, must be one of {RESTART_POLICIES}"
+            )
+        # Delay before the first restart in seconds, doubled for every further crash
+        self.restart_delay = float(section.get("restart_delay", 1.0))
+        self.restart_delay_max = float(section.get("restart_delay_max", 60.0))
+        # Give up after this many crashes within restart_window seconds
+        self.restart_limit = int(section.get("restart_limit", 5))
+        self.restart_window = float(section.get("restart_window", 300.0))
+
+
+class GroupSettings:
+    def __init__(self, name: str, section: Dict[str, Any]) -> None:
+        """
+        A group of modules which are paused and resumed together, from the `[aw-qt.groups.<name>]`
+        tables of the config. `modules` are module names or glob patterns (like `"aw-watcher-*"`).
+        """
+        self.name = name
+        self.modules: List[str] = [str(m) for m in section.get("modules", [])]
+        # Daily windows the group is paused in, like ["22:00-07:00"] (see `PauseScheduler`)
+        self.pause_schedule: List[Tuple[int, int]] = [
+            parse_window(str(w)) for w in section.get("pause_schedule", [])
+        ]
+
+    def __contains__(self, module_name: str) -> bool:
+        return any(fnmatchcase(module_name, pattern) for pattern in self.modules)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, GroupSettings):
+            return NotImplemented
+        return (self.modules, self.pause_schedule) == (
+            other.modules,
+            other.pause_schedule,
+        )
+
+
 class AwQtSettings:
     def __init__(self, testing: bool):
         """
@@ -22,3 +170,75 @@ class AwQtSettings:
         config_section: Any = config["aw-qt" if not testing else "aw-qt-testing"]
 
         self.autostart_modules: List[str] = config_section["autostart_modules"]
+        if not isinstance(self.autostart_modules, list) or not all(
+            isinstance(name, str) for name in self.autostart_modules
+        ):
+            raise ValueError("autostart_modules must be a list of module names")
+        # Upper bound in seconds on stopping all modules when quitting
+        self.shutdown_timeout = float(config_section.get("shutdown_timeout", 30.0))
+        # Seconds between samples of the modules' resource usage (0 disables sampling),
+        # and how many samples to keep per module
+        self.sample_interval = float(config_section.get("sample_interval", 10.0))
+        self.sample_history = int(config_section.get("sample_history", 360))
+        # Seconds between status summaries in the log when running with --no-gui (0 disables them)
+        self.status_log_interval = float(
+            config_section.get("status_log_interval", 600.0)
+        )
+        # Pick up modules that are installed or removed while running (see `DirectoryWatcher`),
+        # by polling every hotplug_poll_interval seconds where inotify isn't available
+        self.hotplug = bool(config_section.get("hotplug", True))
+        self.hotplug_poll_interval = float(
+            config_section.get("hotplug_poll_interval", 10.0)
+        )
+        # Write module lifecycle events (see `EventLog`), at most event_log_flush_interval seconds
+        # after they happened, to a file rotated once it's bigger than event_log_max_bytes
+        self.event_log = bool(config_section.get("event_log", True))
+        self.event_log_max_bytes = int(
+            config_section.get("event_log_max_bytes", 1024 * 1024)
+        )
+        self.event_log_backup_count = int(
+            config_section.get("event_log_backup_count", 3)
+        )
+        self.event_log_flush_interval = float(
+            config_section.get("event_log_flush_interval", 5.0)
+        )
+        # Imported by the forkserver, before forking modules from it
+        self.forkserver_preload: List[str] = [
+            str(name)
+            for name in config_section.get("forkserver_preload", ["aw_core", "aw_client"])
+        ]
+        self.groups: Dict[str, GroupSettings] = {
+            str(name): GroupSettings(str(name), dict(section))
+            for name, section in config_section.get("groups", {}).items()
+        }
+        self._module_sections: Dict[str, Any] = dict(config_section.get("modules", {}))
+        # Fail early on invalid module settings
+        for name in self._module_sections:
+            self.module(name)
+
+    def module(self, name: str) -> ModuleSettings:
+        """
+        Returns the settings for the module `name`.
+        Tables with glob patterns as names (like `"aw-watcher-*"`) apply to all matching modules,
+        keys in a table with the exact module name take precedence.
+        """
+        settings = ModuleSettings(name, self.module_section(name))
+        # The CPU usage is averaged over the samples kept, which have to span the whole window
+        history = (self.sample_history - 1) * self.sample_interval
+        checks_cpu = settings.max_cpu_percent is not None and self.sample_interval > 0
+        if checks_cpu and settings.watchdog_window > history:
+            raise ValueError(
+                f"watchdog_window of module {name} ({settings.watchdog_window:g}s) is longer than the "
+                f"{history:g}s of samples kept (sample_interval * (sample_history - 1)), "
+                "so its max_cpu_percent would never be checked"
+            )
+        return settings
+
+    def module_section(self, name: str) -> Dict[str, Any]:
+        """The merged config values for the module `name`, that its `ModuleSettings` are made from"""
+        section: Dict[str, Any] = {}
+        for pattern, values in self._module_sections.items():
+            if pattern != name and fnmatchcase(name, pattern):
+                section.update(values)
+        section.update(self._module_sections.get(name, {}))
+        return section
@@ -0,0 +1,377 @@
+"""
+Control socket for a running aw-qt, JSON-RPC 2.0 over a Unix domain socket with one request per line.
+The client side only needs the standard library, so it's fast to import.
+"""
+import os
+import sys
+import stat
+import json
+import socket
+import asyncio
+import signal
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from .pause import format_window
+
+if TYPE_CHECKING:
+    from .manager import Manager, Module
+    from .reload import ConfigReloader
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# Application specific
+MODULE_NOT_FOUND = 1
+OUTPUT_NOT_CAPTURED = 2
+INVALID_CONFIG = 3
+NOT_SUPPORTED = 4
+
+# Requests are small, anything bigger than this is a broken client
+_MAX_LINE = 64 * 1024
+
+
+class ControlError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+def is_supported() -> bool:
+    # asyncio only supports Unix domain sockets on Unix
+    return sys.platform != "win32"
+
+
+def get_socket_path(testing: bool) -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        directory = runtime_dir
+    else:
+        # Private directory per user, like XDG_RUNTIME_DIR would be
+        directory = os.path.join("/tmp", f"aw-qt-{os.getuid()}")
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Anyone can create it first, and then listen on (or replace) our socket
+        st = os.lstat(directory)
+        owned = stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid()
+        if not owned or stat.S_IMODE(st.st_mode) != 0o700:
+            raise PermissionError(
+                f"{directory} isn't a directory private to this user, not using it for the control socket"
+            )
+    return os.path.join(directory, f"aw-qt{'-testing' if testing else ''}.sock")
+
+
+def call(
+    method: str,
+    params: Optional[Dict[str, Any]] = None,
+    testing: bool = False,
+    timeout: Optional[float] = 60.0,
+) -> Any:
+    """
+    Calls a method on the running aw-qt and returns its result.
+    Raises ControlError if the call failed, and OSError (like ConnectionRefusedError
+    or FileNotFoundError) if aw-qt isn't running.
+    """
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(get_socket_path(testing))
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ControlError(INTERNAL_ERROR, "Connection closed without a response")
+    response = json.loads(line)
+    if "error" in response:
+        raise ControlError(response["error"]["code"], response["error"]["message"])
+    return response["result"]
+
+
+def module_info(manager: "Manager", module: "Module") -> Dict[str, Any]:
+    info: Dict[str, Any] = {
+        "name": module.name,
+        "type": module.type,
+        "path": str(module.path),
+        "state": module.state,
+        "pid": module.pid,
+        "returncode": module.returncode,
+    }
+    if module.adopted:
+        info["adopted"] = True
+    usage = manager.sampler.usage(module)
+    if usage:
+        info.update(
+            cpu_percent=usage.current.cpu_percent,
+            rss=usage.current.rss,
+            peak_rss=usage.peak_rss,
+            fds=usage.current.fds,
+            threads=usage.current.threads,
+        )
+    if module.limits and module.pid is not None:
+        # Read back from the process, rather than what was configured
+        info["limits"] = module.limits.read(module.pid)
+    activation = manager.activator.info(module.name) if manager.activator else None
+    if activation:
+        info["listening"] = activation
+    recycles = manager.watchdog.recycles(module.name)
+    if recycles:
+        info["recycles"] = [
+            {"time": r.time, "pid": r.pid, "reason": r.reason} for r in recycles
+        ]
+    return info
+
+
+async def _is_listening(path: str) -> bool:
+    """Whether something accepts connections on the Unix socket at ``path``"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_unix_connection(path), 1.0)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+class ControlServer:
+    def __init__(
+        self, manager: "Manager", reloader: Optional["ConfigReloader"] = None
+    ) -> None:
+        self.manager = manager
+        self.reloader = reloader
+        # Set once listening
+        self.path: Optional[str] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._methods: Dict[str, Callable[..., Any]] = {
+            "list": self._list,
+            "status": self._status,
+            "start": self._start,
+            "stop": self._stop,
+            "restart": self._restart,
+            "output": self._output,
+            "reload": self._reload,
+            "pause": self._pause,
+            "resume": self._resume,
+            "groups": self._groups,
+            "detach": self._detach,
+            "flush_events": self._flush_events,
+        }
+
+    def start_in_thread(self) -> None:
+        """Serves on a private event loop in a background thread"""
+        if not is_supported():
+            logger.info("Control socket is not supported on this platform")
+            return
+
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.serve())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="aw-qt-control", daemon=True).start()
+        ready.wait()
+
+    async def serve(self) -> None:
+        """Starts listening on the control socket, in the running event loop"""
+        try:
+            path = get_socket_path(self.manager.testing)
+        except OSError as e:
+            logger.error(f"Could not start control socket: {e}")
+            return
+        if os.path.exists(path):
+            if await _is_listening(path):
+                logger.warning(
+                    f"Another aw-qt is already listening on {path}, not starting the control socket"
+                )
+                return
+            # Left behind by an aw-qt that didn't exit cleanly
+            os.unlink(path)
+        try:
+            self._server = await asyncio.start_unix_server(
+                self._handle, path, limit=_MAX_LINE
+            )
+        except OSError as e:
+            logger.error(f"Could not start control socket at {path}: {e}")
+            return
+        os.chmod(path, 0o600)
+        self.path = path
+        logger.info(f"Listening for control commands on {path}")
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if self.path is not None:
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                self.path = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Line longer than the limit
+                    break
+                if not line:
+                    break
+                response = await self._dispatch(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, line: bytes) -> Dict[str, Any]:
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise ControlError(PARSE_ERROR, "Parse error")
+            if not isinstance(request, dict) or not isinstance(
+                request.get("method"), str
+            ):
+                raise ControlError(INVALID_REQUEST, "Invalid request")
+            request_id = request.get("id")
+            method = self._methods.get(request["method"])
+            if method is None:
+                raise ControlError(
+                    METHOD_NOT_FOUND, f"Method not found: {request['method']}"
+                )
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise ControlError(INVALID_PARAMS, "Params must be an object")
+            try:
+                inspect.signature(method).bind(**params)
+            except TypeError as e:
+                raise ControlError(INVALID_PARAMS, f"Invalid params: {e}")
+            # Starting and stopping modules blocks, keep the event loop responsive
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, lambda: method(**params))
+            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except ControlError as e:
+            error = {"code": e.code, "message": str(e)}
+        except Exception as e:
+            logger.exception("Error while handling control request")
+            error = {"code": INTERNAL_ERROR, "message": str(e)}
+        return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+    def _get_module(self, module: str) -> "Module":
+        found = self.manager.get_module(module)
+        if found is None:
+            raise ControlError(MODULE_NOT_FOUND, f"Module {module} not found")
+        return found
+
+    def _list(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": m.name, "type": m.type, "path": str(m.path), "state": m.state}
+            for m in self.manager.modules
+        ]
+
+    def _status(self, module: Optional[str] = None) -> List[Dict[str, Any]]:
+        modules = (
+            [self._get_module(module)] if module is not None else self.manager.modules
+        )
+        return [module_info(self.manager, m) for m in modules]
+
+    def _start(self, module: str) -> Dict[str, Any]:
+        m = self._get_module(module)
+        if not m.is_alive():
+            m.start(self.manager.testing)
+        return module_info(self.manager, m)
+
+    def _stop(self, module: str) -> Dict[str, Any]:
+        m = self._get_module(module)
+        if m.started:
+            m.stop()
+        return module_info(self.manager, m)
+
+    def _restart(self, module: str) -> Dict[str, Any]:
+        m = self._get_module(module)
+        if m.started:
+            m.stop()
+        m.start(self.manager.testing)
+        return module_info(self.manager, m)
+
+    def _get_modules(self, name: str) -> List["Module"]:
+        """The modules of a group, or the module, with that name"""
+        if name in self.manager.settings.groups:
+            return self.manager.group_modules(name)
+        found = self.manager.get_module(name)
+        if found is None:
+            raise ControlError(MODULE_NOT_FOUND, f"No module or group named {name}")
+        return [found]
+
+    def _pause(self, name: str) -> List[Dict[str, Any]]:
+        modules = self._get_modules(name)
+        if name in self.manager.settings.groups:
+            self.manager.pause_group(name)
+        else:
+            modules[0].pause()
+        return [module_info(self.manager, m) for m in modules]
+
+    def _resume(self, name: str) -> List[Dict[str, Any]]:
+        modules = self._get_modules(name)
+        if name in self.manager.settings.groups:
+            self.manager.resume_group(name)
+        else:
+            modules[0].resume()
+        return [module_info(self.manager, m) for m in modules]
+
+    def _groups(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": name,
+                "modules": [m.name for m in self.manager.group_modules(name)],
+                "paused": name in self.manager.paused_groups,
+                "pause_schedule": [format_window(w) for w in group.pause_schedule],
+            }
+            for name, group in self.manager.settings.groups.items()
+        ]
+
+    def _output(self, module: str, lines: int = 100) -> List[str]:
+        self._get_module(module)
+        if self.manager.output is None:
+            raise ControlError(
+                OUTPUT_NOT_CAPTURED, "Module output is not captured on this platform"
+            )
+        output = self.manager.output.output(module)
+        return [line.format() for line in output.tail(lines)] if output else []
+
+    def _reload(self) -> str:
+        if self.reloader is None:
+            raise ControlError(INTERNAL_ERROR, "Reloading the config is not enabled")
+        try:
+            return str(self.reloader.reload())
+        except ValueError as e:
+            raise ControlError(INVALID_CONFIG, str(e))
+
+    def _detach(self) -> List[str]:
+        from .adoption import is_supported  # pylint: disable=import-outside-toplevel
+
+        if not is_supported():
+            raise ControlError(
+                NOT_SUPPORTED, "Adopting modules is not supported on this platform"
+            )
+        running = self.manager.detach()
+        # Quits like on SIGTERM, once the reply is sent
+        threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGTERM)).start()
+        return [m.name for m in running]
+
+    def _flush_events(self) -> None:
+        self.manager.events.flush()
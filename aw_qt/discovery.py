@@ -0,0 +1,195 @@
+import os
+import stat
+import json
+import logging
+import platform
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from aw_core.dirs import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the cache file changes, old caches are then discarded
+CACHE_VERSION = 1
+
+# Listings of directories modified less than this long ago are not cached, since a change within
+# the same mtime tick (coarse on some network filesystems) would otherwise go unnoticed
+_RACY_MTIME_NS = 2 * 10**9
+
+# (device, inode, mtime in ns) of a directory, changes whenever an entry is added, removed or renamed
+Signature = Tuple[int, int, int]
+
+
+class Listing:
+    """The ``aw-*`` entries of a single directory"""
+
+    def __init__(
+        self, signature: Signature, executables: List[str], subdirs: List[str]
+    ) -> None:
+        self.signature = signature
+        self.executables = executables
+        self.subdirs = subdirs
+
+    def to_json(self) -> dict:
+        return {
+            "signature": list(self.signature),
+            "executables": self.executables,
+            "subdirs": self.subdirs,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Listing":
+        dev, ino, mtime = data["signature"]
+        return cls((dev, ino, mtime), list(data["executables"]), list(data["subdirs"]))
+
+
+def directory_signature(path: str) -> Optional[Signature]:
+    """The device, inode and mtime of a directory, None if it doesn't exist or isn't a directory"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode):
+        # Like a file on PATH, which isn't worth a warning on every scan
+        return None
+    return (st.st_dev, st.st_ino, st.st_mtime_ns)
+
+
+def _is_executable_entry(entry: os.DirEntry) -> bool:
+    # DirEntry.is_file() is answered from the directory listing itself on most platforms,
+    # so only the (few) aw-* candidates ever cost an extra syscall.
+    try:
+        if not entry.is_file():
+            return False
+    except OSError:
+        return False
+    # On windows all files ending with .exe are executables
+    if platform.system() == "Windows":
+        return entry.name.endswith(".exe")
+    # On Unix platforms all files having executable permissions are executables
+    # We do not however want to include .desktop files
+    if entry.name.endswith(".desktop"):
+        return False
+    return os.access(entry.path, os.X_OK)
+
+
+def scan_directory(path: str) -> Optional[Listing]:
+    """Lists the ``aw-*`` executables and subdirectories of ``path``, or None if it can't be listed"""
+    signature = directory_signature(path)
+    if signature is None:
+        return None
+
+    executables: List[str] = []
+    subdirs: List[str] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if not entry.name.startswith("aw-"):
+                    continue
+                if _is_executable_entry(entry):
+                    executables.append(entry.name)
+                elif entry.is_dir() and os.access(entry.path, os.X_OK):
+                    subdirs.append(entry.name)
+                else:
+                    logger.warning(
+                        f"Found matching file but was not executable: {entry.path}"
+                    )
+    except PermissionError:
+        logger.warning(f"PermissionError while listing {path}, skipping")
+        return None
+    except OSError as e:
+        logger.warning(f"Error while listing {path}, skipping: {e}")
+        return None
+
+    return Listing(signature, sorted(executables), sorted(subdirs))
+
+
+class DiscoveryCache:
+    """
+    Persistent cache of directory listings, reused while a directory's device, inode and mtime are unchanged.
+    Use ``aw-qt --rediscover`` after changing file permissions, which doesn't change the mtime.
+    """
+
+    def __init__(self, path: Optional[str] = None, rediscover: bool = False) -> None:
+        self.path = path
+        self._listings: Dict[str, Listing] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        # Directories that could be listed since this was last cleared, to watch for changes
+        self.scanned: Set[str] = set()
+        if path and not rediscover:
+            self._load()
+
+    def _load(self) -> None:
+        assert self.path
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                logger.debug("Discovery cache has an old version, ignoring it")
+                return
+            self._listings = {
+                d: Listing.from_json(listing)
+                for d, listing in data["directories"].items()
+            }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(
+                f"Could not read discovery cache {self.path}, ignoring it: {e}"
+            )
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        data = {
+            "version": CACHE_VERSION,
+            "directories": {d: l.to_json() for d, l in self._listings.items()},
+        }
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not write discovery cache {self.path}: {e}")
+
+    def scan(self, path: str) -> Optional[Listing]:
+        """Like ``scan_directory``, but only lists the directory if it changed since last time"""
+        cached = self._listings.get(path)
+        if cached is not None and cached.signature == directory_signature(path):
+            self.hits += 1
+            self.scanned.add(path)
+            return cached
+
+        self.misses += 1
+        listing = scan_directory(path)
+        if listing is not None:
+            self.scanned.add(path)
+        if listing is None:
+            if self._listings.pop(path, None) is not None:
+                self._dirty = True
+        elif time.time_ns() - listing.signature[2] > _RACY_MTIME_NS:
+            self._listings[path] = listing
+            self._dirty = True
+        elif self._listings.pop(path, None) is not None:
+            self._dirty = True
+        return listing
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """
+        Forgets the cached listing of ``path``, or of all directories.
+        Needed when an entry changed without changing the directory's mtime, like a chmod +x.
+        """
+        if path is None:
+            self._listings.clear()
+            self._dirty = True
+        elif self._listings.pop(path, None) is not None:
+            self._dirty = True
+
+
+def get_cache_path() -> str:
+    return os.path.join(get_cache_dir("aw-qt"), "discovery.json")
@@ -0,0 +1,242 @@
+"""
+Structured journal of module lifecycle events, a line of JSON per event in ``events.jsonl``
+in the aw-qt log directory (read by ``aw-qt events``).
+"""
+
+import os
+import json
+import logging
+import threading
+from glob import escape, glob
+from logging.handlers import MemoryHandler, RotatingFileHandler
+from time import monotonic, time
+from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .config import AwQtSettings
+
+logger = logging.getLogger(__name__)
+
+EVENTS = [
+    "spawned",
+    "adopted",
+    "ready",
+    "paused",
+    "resumed",
+    "stopped",
+    "killed",
+    "exited",
+    "restarted",
+    "recycled",
+    "failed",
+]
+# Written right away, they're what a crash of aw-qt shouldn't lose
+_URGENT_EVENTS = {"killed", "exited", "recycled", "failed"}
+# Events kept in memory before writing them regardless of the flush interval
+_BUFFER_CAPACITY = 100
+
+
+def get_events_path(testing: bool) -> str:
+    from aw_core.dirs import get_log_dir  # pylint: disable=import-outside-toplevel
+
+    return os.path.join(
+        get_log_dir("aw-qt"), f"events{'-testing' if testing else ''}.jsonl"
+    )
+
+
+class EventLog:
+    def __init__(
+        self,
+        path: Optional[str],
+        max_bytes: int = 1024 * 1024,
+        backup_count: int = 3,
+        flush_interval: float = 5.0,
+    ) -> None:
+        """Writes lifecycle events to ``path`` (or nowhere if it's None), see the module docstring"""
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._handler: Optional[MemoryHandler] = None
+        # Pending while events are buffered, so an idle aw-qt has no thread waking up
+        self._timer: Optional[threading.Timer] = None
+
+    def configure(self, settings: "AwQtSettings") -> None:
+        with self._lock:
+            self.flush_interval = settings.event_log_flush_interval
+            if (self.max_bytes, self.backup_count) != (
+                settings.event_log_max_bytes,
+                settings.event_log_backup_count,
+            ):
+                self.max_bytes = settings.event_log_max_bytes
+                self.backup_count = settings.event_log_backup_count
+                self._close_handler()
+
+    def record(self, event: str, module: str, **fields: Any) -> None:
+        """Appends an event, ``fields`` have to be JSON serializable"""
+        if self.path is None:
+            return
+        entry: Dict[str, Any] = {
+            "time": round(time(), 6),
+            "monotonic": round(monotonic(), 6),
+            "event": event,
+            "module": module,
+        }
+        entry.update(
+            (key, round(value, 6) if isinstance(value, float) else value)
+            for key, value in fields.items()
+        )
+        record = logging.makeLogRecord(
+            {
+                "msg": json.dumps(entry),
+                "levelno": logging.WARNING if event in _URGENT_EVENTS else logging.INFO,
+            }
+        )
+        with self._lock:
+            handler = self._get_handler()
+            if handler is None:
+                return
+            handler.handle(record)
+            if handler.buffer and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_buffered)
+                self._timer.name = "aw-qt-events-flush"
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _get_handler(self) -> Optional[MemoryHandler]:
+        if self._handler is None and self.path is not None:
+            try:
+                target = RotatingFileHandler(
+                    self.path,
+                    maxBytes=self.max_bytes,
+                    backupCount=self.backup_count,
+                    encoding="utf-8",
+                    delay=True,
+                )
+            except OSError as e:
+                logger.warning(f"Can't write module events to {self.path}: {e}")
+                self.path = None
+                return None
+            self._handler = MemoryHandler(
+                _BUFFER_CAPACITY, flushLevel=logging.WARNING, target=target
+            )
+        return self._handler
+
+    def _flush_buffered(self) -> None:
+        with self._lock:
+            self._timer = None
+            if self._handler is not None:
+                self._handler.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._handler is not None:
+                self._handler.flush()
+
+    def close(self) -> None:
+        """Writes the buffered events and closes the file, it's opened again by the next event"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._close_handler()
+
+    def _close_handler(self) -> None:
+        if self._handler is not None:
+            target = self._handler.target
+            # Flushes the buffer
+            self._handler.close()
+            if target is not None:
+                target.close()
+            self._handler = None
+
+
+def _log_files(path: str) -> List[str]:
+    """The event log and its rotated files, oldest first"""
+    backups = []
+    for backup in glob(escape(path) + ".*"):
+        suffix = backup[len(path) + 1:]
+        if suffix.isdigit():
+            backups.append((int(suffix), backup))
+    return [backup for _, backup in sorted(backups, reverse=True)] + [path]
+
+
+def read_events(
+    path: str,
+    modules: Optional[Iterable[str]] = None,
+    events: Optional[Iterable[str]] = None,
+    since: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Reads the events from the event log at ``path`` and its rotated files, oldest first.
+    Only those of ``modules``, of the types in ``events``, and after the unix time ``since``
+    are returned, if given. Lines that aren't valid events (like one cut short by a crash) are skipped.
+    """
+    module_set = set(modules) if modules is not None else None
+    event_set = set(events) if events is not None else None
+    found = []
+    for file_path in _log_files(path):
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if not isinstance(entry, dict):
+                            continue
+                        if module_set is not None and entry["module"] not in module_set:
+                            continue
+                        if event_set is not None and entry["event"] not in event_set:
+                            continue
+                        if since is not None and entry["time"] < since:
+                            continue
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    found.append(entry)
+        except FileNotFoundError:
+            continue
+    return found
+
+
+def summarize(events: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per module statistics from lifecycle events: how often it was started, crashed (exited unexpectedly),
+    was killed, recycled or given up on, its total uptime over the processes that ended,
+    and how long it took to become ready on average.
+    """
+    stats: Dict[str, Dict[str, Any]] = {}
+    ready_times: Dict[str, List[float]] = {}
+    for entry in events:
+        module = stats.setdefault(
+            entry["module"],
+            {
+                "starts": 0,
+                "crashes": 0,
+                "kills": 0,
+                "recycles": 0,
+                "failures": 0,
+                "uptime": 0.0,
+                "mean_ready_time": None,
+            },
+        )
+        event = entry["event"]
+        if event == "spawned":
+            module["starts"] += 1
+        elif event == "exited":
+            module["crashes"] += 1
+        elif event == "killed":
+            module["kills"] += 1
+        elif event == "recycled":
+            module["recycles"] += 1
+        elif event == "failed":
+            module["failures"] += 1
+        elif event == "ready" and "duration" in entry:
+            ready_times.setdefault(entry["module"], []).append(entry["duration"])
+        if event in ["stopped", "killed", "exited"] and "uptime" in entry:
+            module["uptime"] += entry["uptime"]
+    for name, times in ready_times.items():
+        stats[name]["mean_ready_time"] = sum(times) / len(times)
+    return stats
@@ -0,0 +1,437 @@
+"""
+Forkserver for Python modules (``launch = "forkserver"`` in a module's config), which forks
+watchers from a process that already imported aw_core and aw_client.
+"""
+
+# Only stdlib imports (and aw_qt modules with only those), so that the forkserver doesn't
+# import anything it doesn't preload
+import io
+import os
+import sys
+import json
+import array
+import signal
+import socket
+import logging
+import selectors
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+from .wakeup import Waker
+
+logger = logging.getLogger(__name__)
+
+# The stdin, stdout and stderr of the module, and the socket to report its pid and exit status on
+_FDS_PER_REQUEST = 4
+# Listening sockets of socket-activated modules, passed on after those
+_MAX_LISTEN_FDS = 8
+_MAX_REQUEST = 64 * 1024
+_SPAWN_TIMEOUT = 10.0
+
+
+def is_supported() -> bool:
+    # No fork on Windows, and a PyInstaller build has no Python to run the forkserver with
+    return sys.platform != "win32" and not getattr(sys, "frozen", False)
+
+
+def _send_fds(sock: socket.socket, data: bytes, fds: List[int]) -> None:
+    sock.sendmsg(
+        [data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))]
+    )
+
+
+def _recv_fds(sock: socket.socket, size: int, max_fds: int) -> Tuple[bytes, List[int]]:
+    fds = array.array("i")
+    data, ancdata, _, _ = sock.recvmsg(size, socket.CMSG_LEN(max_fds * fds.itemsize))
+    for level, kind, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[: len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+    return data, list(fds)
+
+
+def _returncode(status: int) -> int:
+    """Like ``Popen.returncode``, negative if the process was killed by a signal"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class ForkedProcess:
+    """A module process forked by the forkserver, with the parts of the ``Popen`` interface aw-qt uses"""
+
+    def __init__(
+        self,
+        args: List[str],
+        pid: int,
+        status_sock: socket.socket,
+        stdout: Optional[io.FileIO],
+        stderr: Optional[io.FileIO],
+    ) -> None:
+        self.args = args
+        self.pid = pid
+        self.returncode: Optional[int] = None
+        self.stdout = stdout
+        self.stderr = stderr
+        self._sock: Optional[socket.socket] = status_sock
+        self._buffer = b""
+        self._lock = threading.Lock()
+        # Readable once the process exited, like ``multiprocessing.Process.sentinel``
+        self.sentinel = status_sock.fileno()
+
+    def poll(self) -> Optional[int]:
+        with self._lock:
+            if self._sock is not None:
+                self._read(block=False)
+            return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        with self._lock:
+            if self._sock is not None:
+                self._sock.settimeout(timeout)
+                try:
+                    self._read(block=True)
+                except socket.timeout:
+                    raise subprocess.TimeoutExpired(self.args, timeout or 0)
+            assert self.returncode is not None
+            return self.returncode
+
+    def _read(self, block: bool) -> None:
+        assert self._sock is not None
+        if not block:
+            self._sock.setblocking(False)
+        while b"\n" not in self._buffer:
+            try:
+                data = self._sock.recv(64)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            if not data:
+                # The forkserver died, and with it the only way to know when the process exits
+                logger.error(
+                    f"Lost track of {self.args[0]} (pid {self.pid}) since the forkserver exited, killing it"
+                )
+                self._signal(signal.SIGKILL)
+                self._close(-signal.SIGKILL)
+                return
+            self._buffer += data
+        line = self._buffer.split(b"\n", 1)[0].decode()
+        self._close(_returncode(int(line.split()[1])))
+
+    def _close(self, returncode: int) -> None:
+        self.returncode = returncode
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def send_signal(self, sig: int) -> None:
+        if self.poll() is None:
+            self._signal(sig)
+
+    def _signal(self, sig: int) -> None:
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+
+class ForkServer:
+    def __init__(self, preload: List[str]) -> None:
+        """A forkserver with the modules in ``preload`` imported, started when it's first needed"""
+        self.preload = preload
+        self._process: Optional["subprocess.Popen[bytes]"] = None
+        self._channel: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Starts the forkserver ahead of the first spawn"""
+        with self._lock:
+            self._ensure_started()
+
+    def _ensure_started(self) -> socket.socket:
+        if self._process is not None:
+            if self._process.poll() is None and self._channel is not None:
+                return self._channel
+            logger.warning(
+                f"Forkserver exited with code {self._process.returncode}, starting a new one"
+            )
+        channel, child_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        fd = child_channel.fileno()
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "aw_qt.forkserver", str(fd)] + self.preload,
+            pass_fds=[fd],
+            stdin=subprocess.PIPE,
+        )
+        child_channel.close()
+        self._channel = channel
+        logger.info(
+            f"Started forkserver (pid {self._process.pid}), preloading {', '.join(self.preload) or 'nothing'}"
+        )
+        return channel
+
+    def spawn(
+        self,
+        python_module: str,
+        args: List[str],
+        capture: bool,
+        listen_fds: Optional[List[int]] = None,
+        limits: Optional[Dict[str, Any]] = None,
+    ) -> ForkedProcess:
+        """
+        Forks a process running ``python_module`` (``package.module`` run like ``python -m``,
+        or ``package.module:function``) with ``args`` as its ``sys.argv``.
+        If ``capture`` is True its stdout and stderr are pipes (like ``stdout=PIPE``), otherwise aw-qt's.
+        ``listen_fds`` are passed on from fd 3 on, with ``LISTEN_FDS`` and ``LISTEN_PID`` set.
+        ``limits`` (a module's ``ProcessLimits`` config) are applied by the child to itself before it runs the module.
+        """
+        listen_fds = listen_fds or []
+        if len(listen_fds) > _MAX_LISTEN_FDS:
+            raise ValueError(
+                f"At most {_MAX_LISTEN_FDS} listening sockets can be passed"
+            )
+        status_sock, child_status_sock = socket.socketpair()
+        stdout_r = stderr_r = None
+        child_fds = [child_status_sock.fileno()]
+        to_close: List[int] = []
+        try:
+            stdin = os.open(os.devnull, os.O_RDONLY)
+            to_close.append(stdin)
+            child_fds.append(stdin)
+            if capture:
+                stdout_r, stdout_w = os.pipe()
+                stderr_r, stderr_w = os.pipe()
+                to_close += [stdout_w, stderr_w]
+                child_fds += [stdout_w, stderr_w]
+            else:
+                # Like Popen without stdout/stderr, the module writes to aw-qt's
+                child_fds += [1, 2]
+            request = json.dumps(
+                {
+                    "module": python_module,
+                    "args": args,
+                    "listen_fds": len(listen_fds),
+                    "limits": limits or {},
+                }
+            ).encode()
+            with self._lock:
+                _send_fds(self._ensure_started(), request, child_fds + listen_fds)
+            status_sock.settimeout(_SPAWN_TIMEOUT)
+            reply = status_sock.recv(64).decode()
+            if not reply.startswith("pid "):
+                raise OSError(f"Forkserver didn't start {args[0]}")
+            pid = int(reply.split("\n", 1)[0].split()[1])
+        except BaseException:
+            status_sock.close()
+            for fd in [stdout_r, stderr_r]:
+                if fd is not None:
+                    os.close(fd)
+            raise
+        finally:
+            # The forkserver has its own copies now
+            child_status_sock.close()
+            for fd in to_close:
+                os.close(fd)
+        process = ForkedProcess(
+            args,
+            pid,
+            status_sock,
+            io.FileIO(stdout_r, "r") if stdout_r is not None else None,
+            io.FileIO(stderr_r, "r") if stderr_r is not None else None,
+        )
+        # Anything after the pid (an exit status, if it exited right away) is read by poll()
+        process._buffer = reply.split("\n", 1)[1].encode() if "\n" in reply else b""
+        return process
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._process is None:
+                return
+            # Closing its stdin tells it to exit, processes it forked keep running
+            if self._process.stdin:
+                self._process.stdin.close()
+            try:
+                self._process.wait(5.0)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            if self._channel is not None:
+                self._channel.close()
+                self._channel = None
+            self._process = None
+
+
+def _set_process_name(name: str) -> None:
+    if not sys.platform.startswith("linux"):
+        return
+    import ctypes  # pylint: disable=import-outside-toplevel
+
+    try:
+        # PR_SET_NAME, so ps/top show the module rather than python
+        ctypes.CDLL(None).prctl(15, name.encode()[:15], 0, 0, 0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _run_child(request: Dict[str, Any], fds: List[int], close: List[int]) -> None:
+    """Runs the module in the forked child, never returns"""
+    code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        # A process group of its own, like modules that aren't forked (see `freeze`)
+        os.setsid()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        stdio = fds[1:_FDS_PER_REQUEST]
+        listen = fds[_FDS_PER_REQUEST:]
+        if listen:
+            import fcntl  # pylint: disable=import-outside-toplevel
+
+            # Out of the way first, the received fds may well be numbered 3 and up
+            listen = [fcntl.fcntl(fd, fcntl.F_DUPFD, 3 + len(listen)) for fd in listen]
+            os.environ["LISTEN_PID"] = str(os.getpid())
+            os.environ["LISTEN_FDS"] = str(len(listen))
+        for target, fd in enumerate(stdio):
+            os.dup2(fd, target)
+        for target, fd in enumerate(listen, 3):
+            os.dup2(fd, target)
+        for fd in close + fds + listen:
+            if fd < 3 + len(listen):
+                # Replaced by one of the module's
+                continue
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        args: List[str] = request["args"]
+        sys.argv = list(args)
+        _set_process_name(os.path.basename(args[0]))
+        if request.get("limits"):
+            # Stdlib only, and already imported with the aw_qt package the forkserver runs from
+            from .limits import ProcessLimits  # pylint: disable=import-outside-toplevel
+
+            limits = ProcessLimits.from_config(request["limits"])
+            if limits is not None:
+                limits.apply(os.getpid(), os.path.basename(args[0]))
+
+        import runpy  # pylint: disable=import-outside-toplevel
+        import importlib  # pylint: disable=import-outside-toplevel
+
+        module, _, function = str(request["module"]).partition(":")
+        try:
+            if function:
+                getattr(importlib.import_module(module), function)()
+            else:
+                runpy.run_module(module, run_name="__main__", alter_sys=True)
+            code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+    except BaseException:
+        import traceback  # pylint: disable=import-outside-toplevel
+
+        traceback.print_exc()
+    finally:
+        for stream in [sys.stdout, sys.stderr]:
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(code)
+
+
+def serve(channel: socket.socket, preload: List[str]) -> None:
+    import importlib  # pylint: disable=import-outside-toplevel
+
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"aw-qt forkserver: could not preload {name}: {e}", file=sys.stderr)
+
+    waker = Waker()
+    signal.set_wakeup_fd(waker.wake_fileno())
+    # Needs a handler (not SIG_IGN, which would reap children itself) for the wakeup fd to be written
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+    # Ctrl+C in a terminal goes to aw-qt's whole process group, aw-qt stops the modules itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stdin = sys.stdin.fileno()
+
+    # Status socket per child pid
+    children: Dict[int, socket.socket] = {}
+    with selectors.DefaultSelector() as selector:
+        selector.register(channel, selectors.EVENT_READ)
+        selector.register(waker, selectors.EVENT_READ)
+        selector.register(stdin, selectors.EVENT_READ)
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj is channel:
+                    data, fds = _recv_fds(
+                        channel, _MAX_REQUEST, _FDS_PER_REQUEST + _MAX_LISTEN_FDS
+                    )
+                    request = json.loads(data)
+                    if len(fds) != _FDS_PER_REQUEST + request.get("listen_fds", 0):
+                        for fd in fds:
+                            os.close(fd)
+                        continue
+                    pid = os.fork()
+                    if pid == 0:
+                        # stdin is replaced by the module's
+                        own = [
+                            channel.fileno(),
+                            selector.fileno(),
+                            waker.fileno(),
+                            waker.wake_fileno(),
+                        ]
+                        status_fds = [s.fileno() for s in children.values()]
+                        _run_child(request, fds, own + status_fds)
+                    status_sock = socket.socket(fileno=fds[0])
+                    for fd in fds[1:]:
+                        os.close(fd)
+                    children[pid] = status_sock
+                    try:
+                        status_sock.sendall(f"pid {pid}\n".encode())
+                    except OSError:
+                        pass
+                elif key.fileobj == stdin:
+                    if not os.read(stdin, 4096):
+                        # aw-qt exited or stopped us
+                        return
+                else:
+                    waker.drain()
+                    _reap(children)
+
+
+def _reap(children: Dict[int, socket.socket]) -> None:
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        status_sock = children.pop(pid, None)
+        if status_sock is not None:
+            try:
+                status_sock.sendall(f"exit {status}\n".encode())
+            except OSError:
+                pass
+            status_sock.close()
+
+
+def main() -> None:
+    channel = socket.socket(fileno=int(sys.argv[1]))
+    serve(channel, sys.argv[2:])
+
+
+if __name__ == "__main__":
+    main()
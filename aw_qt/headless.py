@@ -0,0 +1,181 @@
+"""Supervision loop for ``aw-qt --no-gui``, on asyncio instead of Qt."""
+
+import sys
+import signal
+import asyncio
+import logging
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .control import ControlServer
+    from .manager import Manager, Module
+    from .reload import ConfigReloader
+    from .supervisor import Supervisor
+
+logger = logging.getLogger(__name__)
+
+_SIGNALS = [signal.SIGINT, signal.SIGTERM]
+
+
+class HeadlessSupervisor:
+    def __init__(
+        self,
+        supervisor: "Supervisor",
+        control_server: Optional["ControlServer"] = None,
+        status_interval: float = 600.0,
+        reloader: Optional["ConfigReloader"] = None,
+    ) -> None:
+        """
+        Runs ``supervisor`` and ``control_server`` on one event loop, logging the status of
+        the modules every ``status_interval`` seconds (0 disables the status log).
+        ``reloader`` reloads the config on SIGHUP.
+        """
+        self.supervisor = supervisor
+        self.manager: "Manager" = supervisor.manager
+        self.control_server = control_server
+        self.status_interval = status_interval
+        self.reloader = reloader
+        # Scheduled restarts, per module name
+        self._restarts: Dict[str, asyncio.TimerHandle] = {}
+        self._quit: Optional[asyncio.Event] = None
+
+    def run(self) -> None:
+        """Supervises the modules until a signal to quit is received, then stops them all"""
+        # The proactor loop (default on Windows) can't watch the exit notifier socket
+        loop = asyncio.SelectorEventLoop()
+        try:
+            loop.run_until_complete(self._main())
+        finally:
+            loop.close()
+
+    def quit(self) -> None:
+        """Asks the loop to shut down, must be called from the loop's thread"""
+        if self._quit is None:
+            return
+        if self._quit.is_set():
+            logger.info("Already shutting down, waiting for modules to stop")
+        self._quit.set()
+
+    async def _main(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._quit = asyncio.Event()
+        self._add_signal_handlers(loop)
+        fd = self.manager.exit_notifier.fileno()
+        loop.add_reader(fd, self._process_exits)
+        # Exits may have happened before the reader was added, like during autostart
+        self._process_exits()
+
+        tasks: List["asyncio.Task[None]"] = []
+        if self.status_interval > 0:
+            tasks.append(loop.create_task(self._log_status_periodically()))
+        if sys.platform == "win32":
+            # Signal handlers only run once the loop wakes up, which it doesn't for Ctrl+C on Windows
+            tasks.append(loop.create_task(self._wake_up_periodically()))
+        if self.control_server is not None:
+            await self.control_server.serve()
+
+        try:
+            await self._quit.wait()
+        finally:
+            logger.info("Shutdown initiated, stopping all modules...")
+            loop.remove_reader(fd)
+            for handle in self._restarts.values():
+                handle.cancel()
+            self._restarts.clear()
+            for task in tasks:
+                task.cancel()
+            if self.control_server is not None:
+                self.control_server.close()
+            # Stopping blocks, keep handling signals in the meantime
+            await loop.run_in_executor(None, self.manager.stop_all)
+            self._remove_signal_handlers(loop)
+
+    def _add_signal_handlers(self, loop: asyncio.AbstractEventLoop) -> None:
+        for sig in _SIGNALS:
+            if sys.platform == "win32":
+                signal.signal(sig, lambda *args: loop.call_soon_threadsafe(self.quit))
+            else:
+                loop.add_signal_handler(sig, self.quit)
+        if self.reloader is not None and sys.platform != "win32":
+            loop.add_signal_handler(signal.SIGHUP, self._reload)
+
+    def _remove_signal_handlers(self, loop: asyncio.AbstractEventLoop) -> None:
+        for sig in _SIGNALS:
+            if sys.platform == "win32":
+                signal.signal(
+                    sig,
+                    (
+                        signal.default_int_handler
+                        if sig == signal.SIGINT
+                        else signal.SIG_DFL
+                    ),
+                )
+            else:
+                loop.remove_signal_handler(sig)
+        if self.reloader is not None and sys.platform != "win32":
+            loop.remove_signal_handler(signal.SIGHUP)
+
+    def _reload(self) -> None:
+        assert self.reloader is not None
+        reloader = self.reloader
+
+        def reload() -> None:
+            try:
+                reloader.reload()
+            except ValueError:
+                # Already logged
+                pass
+
+        # Starting and stopping modules blocks
+        asyncio.get_running_loop().run_in_executor(None, reload)
+
+    def _process_exits(self) -> None:
+        loop = asyncio.get_running_loop()
+        for module, delay in self.supervisor.process_exits():
+            if delay is None:
+                logger.error(
+                    f"Module {module.name} stopped and won't be restarted automatically"
+                )
+                continue
+            self._schedule_restart(loop, module, delay)
+
+    def _schedule_restart(
+        self, loop: asyncio.AbstractEventLoop, module: "Module", delay: float
+    ) -> None:
+        previous = self._restarts.pop(module.name, None)
+        if previous is not None:
+            previous.cancel()
+        self._restarts[module.name] = loop.call_later(delay, self._restart, module)
+
+    def _restart(self, module: "Module") -> None:
+        del self._restarts[module.name]
+        try:
+            self.supervisor.restart(module)
+        except Exception:
+            logger.exception(f"Failed to restart module {module.name}")
+            delay = self.supervisor.start_failed(module)
+            if delay is not None:
+                self._schedule_restart(asyncio.get_running_loop(), module, delay)
+
+    async def _log_status_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.status_interval)
+            self.log_status()
+
+    async def _wake_up_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(1.0)
+
+    def log_status(self) -> None:
+        by_state: Dict[str, List[str]] = {}
+        for module in self.manager.modules:
+            if module.started or module.state == "failed":
+                by_state.setdefault(module.state, []).append(module.name)
+        parts = [
+            f"{state}: {', '.join(sorted(names))}"
+            for state, names in sorted(by_state.items())
+        ]
+        if self._restarts:
+            parts.append(f"restart pending: {', '.join(sorted(self._restarts))}")
+        summary = "; ".join(parts)
+        logger.info(f"Module status: {summary or 'no modules started'}")
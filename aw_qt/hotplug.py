@@ -0,0 +1,214 @@
+"""
+Watches the module search directories, so that modules installed or removed while aw-qt is running
+show up without restarting it.
+"""
+
+import os
+import sys
+import struct
+import ctypes
+import ctypes.util
+import logging
+import selectors
+import threading
+from time import monotonic
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from .wakeup import Waker
+
+logger = logging.getLogger(__name__)
+
+# From <sys/inotify.h>
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x1000000
+# Entries added, removed or renamed
+_WATCH_MASK = _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_ONLYDIR
+# Made executable (which doesn't change the directory's mtime), written, or the directory itself gone
+_WATCH_MASK |= _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_DELETE_SELF | _IN_MOVE_SELF
+_EVENT = struct.Struct("iIII")
+
+# Installing a module takes many events (create, writes, chmod), wait until they settle
+_SETTLE_TIME = 0.3
+_MAX_SETTLE_TIME = 2.0
+
+# Called with the directories that changed, or None if any directory may have changed
+OnChange = Callable[[Optional[Set[str]]], None]
+
+
+def is_module_name(name: str) -> bool:
+    return name.startswith("aw-")
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            return None
+    except OSError:
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class DirectoryWatcher:
+    def __init__(
+        self,
+        on_change: OnChange,
+        poll_interval: float = 10.0,
+        match: Callable[[str], bool] = is_module_name,
+    ) -> None:
+        """
+        Calls ``on_change`` from a background thread whenever an entry in one of the watched
+        directories whose name ``match`` accepts (``aw-*`` by default) changes.
+        Without inotify, it's called every ``poll_interval`` seconds instead.
+        """
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.match = match
+        self._libc = _load_libc()
+        self._fd: Optional[int] = None
+        # watch descriptor -> directory, and back
+        self._watches: Dict[int, str] = {}
+        self._paths: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._waker = Waker()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+    def start(self, paths: Iterable[str]) -> None:
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                logger.warning(
+                    f"inotify_init1 failed ({os.strerror(ctypes.get_errno())}), polling for new modules instead"
+                )
+            else:
+                self._fd = fd
+        self.set_paths(paths)
+        target = self._run_inotify if self._fd is not None else self._run_polling
+        self._thread = threading.Thread(
+            target=target, name="aw-qt-hotplug", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._waker.wake()
+        if self._thread is not None:
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._waker.close()
+
+    def set_paths(self, paths: Iterable[str]) -> None:
+        """Watches exactly ``paths`` from now on"""
+        if self._fd is None or self._libc is None:
+            return
+        wanted = set(paths)
+        with self._lock:
+            for path in set(self._paths) - wanted:
+                wd = self._paths.pop(path)
+                self._watches.pop(wd, None)
+                self._libc.inotify_rm_watch(self._fd, wd)
+            for path in wanted - set(self._paths):
+                wd = self._libc.inotify_add_watch(
+                    self._fd, os.fsencode(path), _WATCH_MASK
+                )
+                if wd < 0:
+                    # Like a directory on PATH that doesn't exist (yet)
+                    logger.debug(
+                        f"Could not watch {path}: {os.strerror(ctypes.get_errno())}"
+                    )
+                    continue
+                self._paths[path] = wd
+                self._watches[wd] = path
+
+    def _run_polling(self) -> None:
+        logger.debug(f"Polling for new modules every {self.poll_interval}s")
+        while not self._stop.wait(self.poll_interval):
+            self._notify(None)
+
+    def _run_inotify(self) -> None:
+        assert self._fd is not None
+        logger.debug(f"Watching {len(self._paths)} directories for new modules")
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._fd, selectors.EVENT_READ)
+            selector.register(self._waker, selectors.EVENT_READ)
+            while not self._stop.is_set():
+                selector.select()
+                changed: Set[str] = set()
+                overflow = self._read_events(changed)
+                if not changed and not overflow:
+                    continue
+                # Wait for the rest of the events of an installation, which come in quick succession
+                deadline = monotonic() + _MAX_SETTLE_TIME
+                while not self._stop.is_set():
+                    remaining = deadline - monotonic()
+                    if remaining <= 0 or not selector.select(
+                        min(_SETTLE_TIME, remaining)
+                    ):
+                        break
+                    overflow = self._read_events(changed) or overflow
+                if not self._stop.is_set():
+                    self._notify(None if overflow else changed)
+
+    def _read_events(self, changed: Set[str]) -> bool:
+        """
+        Adds the directories with changed entries (that ``match`` accepts) to ``changed``.
+        Returns True if events were lost, so any directory may have changed.
+        """
+        assert self._fd is not None
+        overflowed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length]
+                offset += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                with self._lock:
+                    path = self._watches.get(wd)
+                    if mask & _IN_IGNORED and path is not None:
+                        # The directory was deleted or unmounted
+                        del self._watches[wd]
+                        self._paths.pop(path, None)
+                if path is None:
+                    continue
+                if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                    changed.add(path)
+                elif name and self.match(os.fsdecode(name.rstrip(b"\0"))):
+                    # The name is padded with NULs
+                    changed.add(path)
+        self._waker.drain()
+        return overflowed
+
+    def _notify(self, changed: Optional[Set[str]]) -> None:
+        try:
+            self.on_change(changed)
+        except Exception:
+            logger.exception("Error while rediscovering modules")
@@ -0,0 +1,266 @@
+"""CPU and IO priority, CPU affinity and resource limits of module processes."""
+
+import os
+import sys
+import signal
+import logging
+import platform
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IONICE_CLASSES = ["realtime", "best-effort", "idle"]
+
+# ioprio_set(2) has no wrapper in libc, nor in the os module
+_SYS_IOPRIO_SET = {
+    "x86_64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "armv7l": 314,
+}
+_SYS_IOPRIO_GET = {
+    "x86_64": 252,
+    "i386": 290,
+    "i686": 290,
+    "aarch64": 31,
+    "armv7l": 315,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+
+_SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+# Stops itself until continued (once the limits are applied), then runs the module with the same pid.
+# Not a preexec_fn, which isn't safe with threads, and modules are started from several.
+_TRAMPOLINE = 'kill -STOP $$ && exec "$@"'
+
+
+def can_hold() -> bool:
+    """Whether modules can be held before exec (see ``hold_command``) on this platform"""
+    return sys.platform != "win32" and hasattr(os, "waitid")
+
+
+def hold_command(command: List[str]) -> List[str]:
+    """The command to start a module with, so that ``ProcessLimits.release`` applies the limits before it runs"""
+    return ["/bin/sh", "-c", _TRAMPOLINE, "aw-qt-limits"] + command
+
+
+def parse_size(value: Any) -> int:
+    """Parses a size in bytes, like 536870912 or "512M" """
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().upper().rstrip("B")
+    if text and text[-1] in _SIZE_SUFFIXES:
+        return int(float(text[:-1]) * _SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _format_size(n: int) -> str:
+    for suffix, size in reversed(_SIZE_SUFFIXES.items()):
+        if n % size == 0:
+            return f"{n // size}{suffix}"
+    return str(n)
+
+
+def _parse_ionice(value: str) -> Tuple[int, int]:
+    """Parses ``class`` or ``class:level`` into the ioprio class number and level"""
+    name, _, level = value.partition(":")
+    if name not in IONICE_CLASSES:
+        raise ValueError(
+            f"Invalid ionice class {name!r}, must be one of {IONICE_CLASSES}"
+        )
+    n = int(level) if level else 4
+    if not 0 <= n <= 7:
+        raise ValueError(f"Invalid ionice level {n}, must be between 0 and 7")
+    return IONICE_CLASSES.index(name) + 1, 0 if name == "idle" else n
+
+
+def _ioprio_syscall(numbers: Dict[str, int], *args: int) -> int:
+    import ctypes  # pylint: disable=import-outside-toplevel
+
+    number = numbers.get(platform.machine())
+    if number is None:
+        raise OSError(f"ioprio syscalls unknown on {platform.machine()}")
+    libc = ctypes.CDLL(None, use_errno=True)
+    result = libc.syscall(number, *args)
+    if result < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return result
+
+
+class ProcessLimits:
+    def __init__(
+        self,
+        nice: Optional[int] = None,
+        ionice: Optional[str] = None,
+        cpu_affinity: Optional[List[int]] = None,
+        rlimit_as: Optional[int] = None,
+        rlimit_nofile: Optional[int] = None,
+    ) -> None:
+        """
+        ``nice`` is the absolute niceness (-20 to 19), ``ionice`` an IO scheduling class
+        (``realtime``, ``best-effort`` or ``idle``) optionally followed by ``:level`` (0 to 7),
+        ``cpu_affinity`` the CPUs the module may run on, and the rlimits the maximum address space
+        in bytes and the maximum number of open files. None leaves the setting as inherited from aw-qt.
+        """
+        if nice is not None and not -20 <= nice <= 19:
+            raise ValueError(f"Invalid nice value {nice}, must be between -20 and 19")
+        if ionice is not None:
+            _parse_ionice(ionice)
+        if cpu_affinity is not None and not cpu_affinity:
+            raise ValueError("cpu_affinity must not be empty")
+        self.nice = nice
+        self.ionice = ionice
+        self.cpu_affinity = cpu_affinity
+        self.rlimit_as = rlimit_as
+        self.rlimit_nofile = rlimit_nofile
+
+    @classmethod
+    def from_config(cls, section: Dict[str, Any]) -> Optional["ProcessLimits"]:
+        """The limits in a module's config table, or None if it has none"""
+        keys = ["nice", "ionice", "cpu_affinity", "rlimit_as", "rlimit_nofile"]
+        if not any(key in section for key in keys):
+            return None
+        return cls(
+            nice=int(section["nice"]) if "nice" in section else None,
+            ionice=str(section["ionice"]) if "ionice" in section else None,
+            cpu_affinity=(
+                [int(cpu) for cpu in section["cpu_affinity"]]
+                if "cpu_affinity" in section
+                else None
+            ),
+            rlimit_as=(
+                parse_size(section["rlimit_as"]) if "rlimit_as" in section else None
+            ),
+            rlimit_nofile=(
+                int(section["rlimit_nofile"]) if "rlimit_nofile" in section else None
+            ),
+        )
+
+    def to_config(self) -> Dict[str, Any]:
+        """The settings, as in a module's config table (see ``from_config``)"""
+        keys = ["nice", "ionice", "cpu_affinity", "rlimit_as", "rlimit_nofile"]
+        return {key: getattr(self, key) for key in keys if getattr(self, key) is not None}
+
+    def release(self, pid: int, name: str) -> None:
+        """
+        Applies the limits to a child started with ``hold_command`` once it stopped itself,
+        then lets it run the module.
+        """
+        try:
+            # WNOWAIT: if it exited instead, it's left to be reaped by its Popen
+            result = os.waitid(os.P_PID, pid, os.WSTOPPED | os.WEXITED | os.WNOWAIT)  # type: ignore[attr-defined]
+        except ChildProcessError:
+            # Can't tell whether it stopped yet, applying them late is better than leaving it stopped
+            result = None
+        if result is not None and result.si_code != os.CLD_STOPPED:  # type: ignore[attr-defined]
+            return
+        try:
+            self.apply(pid, name)
+        finally:
+            os.kill(pid, signal.SIGCONT)
+
+    def apply(self, pid: int, name: str) -> None:
+        """Applies the limits to a process, logging a warning for those that fail"""
+        for setting, apply in [
+            ("nice", self._apply_nice),
+            ("ionice", self._apply_ionice),
+            ("cpu_affinity", self._apply_affinity),
+            ("rlimit_as", self._apply_rlimit_as),
+            ("rlimit_nofile", self._apply_rlimit_nofile),
+        ]:
+            if getattr(self, setting) is None:
+                continue
+            try:
+                apply(pid)
+            except (OSError, AttributeError, ValueError) as e:
+                # AttributeError: not available on this platform
+                logger.warning(f"Could not set {setting} of module {name}: {e}")
+
+    def _apply_nice(self, pid: int) -> None:
+        assert self.nice is not None
+        os.setpriority(os.PRIO_PROCESS, pid, self.nice)
+
+    def _apply_ionice(self, pid: int) -> None:
+        assert self.ionice is not None
+        if not sys.platform.startswith("linux"):
+            raise OSError("ionice is only supported on Linux")
+        ioclass, level = _parse_ionice(self.ionice)
+        _ioprio_syscall(
+            _SYS_IOPRIO_SET,
+            _IOPRIO_WHO_PROCESS,
+            pid,
+            ioclass << _IOPRIO_CLASS_SHIFT | level,
+        )
+
+    def _apply_affinity(self, pid: int) -> None:
+        assert self.cpu_affinity is not None
+        os.sched_setaffinity(pid, self.cpu_affinity)
+
+    def _apply_rlimit_as(self, pid: int) -> None:
+        import resource  # pylint: disable=import-outside-toplevel
+
+        assert self.rlimit_as is not None
+        self._prlimit(pid, resource.RLIMIT_AS, self.rlimit_as)
+
+    def _apply_rlimit_nofile(self, pid: int) -> None:
+        import resource  # pylint: disable=import-outside-toplevel
+
+        assert self.rlimit_nofile is not None
+        self._prlimit(pid, resource.RLIMIT_NOFILE, self.rlimit_nofile)
+
+    @staticmethod
+    def _prlimit(pid: int, limit: int, value: int) -> None:
+        import resource  # pylint: disable=import-outside-toplevel
+
+        # Only the soft limit: aw-qt couldn't raise a lowered hard limit again on a config reload
+        _, hard = resource.prlimit(pid, limit)
+        if hard != resource.RLIM_INFINITY and value > hard:
+            raise ValueError(f"{value} is above the hard limit of {hard}")
+        resource.prlimit(pid, limit, (value, hard))
+
+    def read(self, pid: int) -> Dict[str, Any]:
+        """
+        The current values of the configured settings of a process, to verify they're in effect.
+        Settings that can't be read are left out.
+        """
+        import resource  # pylint: disable=import-outside-toplevel
+
+        current: Dict[str, Any] = {}
+        try:
+            if self.nice is not None:
+                current["nice"] = os.getpriority(os.PRIO_PROCESS, pid)
+            if self.ionice is not None:
+                ioprio = _ioprio_syscall(_SYS_IOPRIO_GET, _IOPRIO_WHO_PROCESS, pid)
+                ioclass = ioprio >> _IOPRIO_CLASS_SHIFT
+                level = ioprio & ((1 << _IOPRIO_CLASS_SHIFT) - 1)
+                if 1 <= ioclass <= len(IONICE_CLASSES):
+                    name = IONICE_CLASSES[ioclass - 1]
+                    current["ionice"] = name if name == "idle" else f"{name}:{level}"
+                else:
+                    # No class set, so it follows the CPU priority
+                    current["ionice"] = "none"
+            if self.cpu_affinity is not None:
+                current["cpu_affinity"] = sorted(os.sched_getaffinity(pid))
+            if self.rlimit_as is not None:
+                current["rlimit_as"] = resource.prlimit(pid, resource.RLIMIT_AS)[0]
+            if self.rlimit_nofile is not None:
+                current["rlimit_nofile"] = resource.prlimit(
+                    pid, resource.RLIMIT_NOFILE
+                )[0]
+        except (OSError, AttributeError):
+            pass
+        return current
+
+
+def format_limits(current: Dict[str, Any]) -> str:
+    parts = []
+    for key, value in current.items():
+        if key == "cpu_affinity":
+            value = ",".join(str(cpu) for cpu in value)
+        elif key == "rlimit_as" and value >= 0:
+            value = _format_size(value)
+        parts.append(f"{key}={value}")
+    return " ".join(parts)
@@ -3,21 +3,27 @@ import sys
 import logging
 import subprocess
 import platform
-import signal
 import threading
-from typing import Optional
-from time import sleep
+from datetime import datetime
+from typing import Any, Dict, Optional, List, TYPE_CHECKING
 
 import click
-from aw_core.log import setup_logging
 
-from .manager import Manager
-from .config import AwQtSettings
+from . import profiling
+
+# Everything else (aw_core, Qt, the manager) is imported in main() once the options are parsed,
+# so that --help is fast, and imports show up in --profile-startup.
+if TYPE_CHECKING:
+    from .manager import Manager
 
 logger = logging.getLogger(__name__)
 
 
-@click.command("aw-qt", help="A trayicon and service manager for ActivityWatch")
+@click.group(
+    "aw-qt",
+    help="A trayicon and service manager for ActivityWatch. Commands control an already running aw-qt.",
+    invoke_without_command=True,
+)
 @click.option(
     "--testing", is_flag=True, help="Run the trayicon and services in testing mode"
 )
@@ -38,18 +44,59 @@ logger = logging.getLogger(__name__)
     is_flag=True,
     help="Start aw-qt in interactive cli mode (forces --no-gui)",
 )
+@click.option(
+    "--rediscover",
+    is_flag=True,
+    help="Ignore the module discovery cache and rescan all search directories",
+)
+@click.option(
+    "--profile-startup",
+    is_flag=True,
+    help="Log how long each startup phase and each import took",
+)
+@click.option(
+    "--trace-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write a timeline of startup, module starts and stops and shutdown to this file, as Chrome trace JSON (open it in https://ui.perfetto.dev)",
+)
+@click.option(
+    "--count-wakeups",
+    is_flag=True,
+    help="Log how often the tray's event loop woke up per second when quitting, to check that it's quiet when idle",
+)
+@click.pass_context
 def main(
+    ctx: click.Context,
     testing: bool,
     verbose: bool,
     autostart_modules: Optional[str],
     no_gui: bool,
     interactive_cli: bool,
+    rediscover: bool,
+    profile_startup: bool,
+    trace_file: Optional[str],
+    count_wakeups: bool,
 ) -> None:
+    if ctx.invoked_subcommand is not None:
+        # The subcommand talks to a running aw-qt, only --testing matters to it
+        ctx.obj = testing
+        return
+
+    if profile_startup:
+        profiling.enable()
+    if trace_file:
+        profiling.enable_tracing(trace_file)
+
+    gui = not no_gui and not interactive_cli
+
     # Since the .app can crash when started from Finder for unknown reasons, we send a syslog message here to make debugging easier.
     if platform.system() == "Darwin":
         subprocess.call("syslog -s 'aw-qt started'", shell=True)
 
-    setup_logging("aw-qt", testing=testing, verbose=verbose, log_file=True)
+    with profiling.phase("setup logging"):
+        from aw_core.log import setup_logging  # pylint: disable=import-outside-toplevel
+
+        setup_logging("aw-qt", testing=testing, verbose=verbose, log_file=True)
     logger.info("Started aw-qt...")
 
     # Since the .app can crash when started from Finder for unknown reasons, we send a syslog message here to make debugging easier.
@@ -67,43 +114,317 @@ def main(
         except PermissionError:
             pass
 
-    config = AwQtSettings(testing=testing)
+    with profiling.phase("load config"):
+        from .config import AwQtSettings  # pylint: disable=import-outside-toplevel
+
+        config = AwQtSettings(testing=testing)
     _autostart_modules = (
         [m.strip() for m in autostart_modules.split(",") if m and m.lower() != "none"]
         if autostart_modules
         else config.autostart_modules
     )
 
-    manager = Manager(testing=testing)
-    manager.autostart(_autostart_modules)
+    with profiling.phase("discover modules"):
+        from .manager import Manager  # pylint: disable=import-outside-toplevel
+        from .supervisor import Supervisor  # pylint: disable=import-outside-toplevel
+
+        manager = Manager(testing=testing, rediscover=rediscover, settings=config)
+        supervisor = Supervisor(manager)
+    with profiling.phase("adopt modules"):
+        manager.adopt_modules()
+    manager.start_sampling()
+    manager.start_hotplug()
+
+    from .reload import ConfigReloader  # pylint: disable=import-outside-toplevel
+
+    reloader = ConfigReloader(
+        manager, _autostart_modules if autostart_modules else None
+    )
+    reloader.start()
+
+    from . import control  # pylint: disable=import-outside-toplevel
+
+    control_server: Optional[control.ControlServer] = None
+    if control.is_supported():
+        control_server = control.ControlServer(manager, reloader)
+        if gui or interactive_cli:
+            control_server.start_in_thread()
+
+    if gui:
+        # Importing Qt takes a while, so do it while the modules are starting.
+        # Qt has to be imported from the main thread, since it treats the thread that loads it as such.
+        autostart_thread = threading.Thread(
+            target=manager.autostart, args=(_autostart_modules,), name="aw-qt-autostart"
+        )
+        autostart_thread.start()
+        with profiling.phase("import Qt"):
+            from . import trayicon  # pylint: disable=import-outside-toplevel
+        with profiling.phase("autostart modules (remaining)"):
+            autostart_thread.join()
+    else:
+        with profiling.phase("autostart modules"):
+            manager.autostart(_autostart_modules)
+
+    from .pause import PauseScheduler  # pylint: disable=import-outside-toplevel
 
-    if not no_gui and not interactive_cli:
-        from . import trayicon  # pylint: disable=import-outside-toplevel
+    scheduler = PauseScheduler(manager)
+    scheduler.start()
 
+    if gui:
         # run the trayicon, wait for signal to quit
-        error_code = trayicon.run(manager, testing=testing)
+        error_code = trayicon.run(
+            manager, supervisor, testing=testing, count_wakeups=count_wakeups
+        )
     elif interactive_cli:
+        profiling.report()
         # just an experiment, don't really see the use right now
         _interactive_cli(manager)
         error_code = 0
     else:
-        # wait for signal to quit
-        if sys.platform == "win32":
-            # Windows doesn't support signals, so we just sleep until interrupted
-            try:
-                sleep(threading.TIMEOUT_MAX)
-            except KeyboardInterrupt:
-                pass
-        else:
-            signal.pause()
+        from .headless import HeadlessSupervisor  # pylint: disable=import-outside-toplevel
 
+        profiling.report()
+        # Serves the control socket on the same event loop
+        HeadlessSupervisor(
+            supervisor,
+            control_server,
+            status_interval=config.status_log_interval,
+            reloader=reloader,
+        ).run()
         error_code = 0
 
+    scheduler.stop()
+    reloader.stop()
+    if control_server is not None:
+        control_server.close()
     manager.stop_all()
+    manager.close()
+    profiling.write_trace()
     sys.exit(error_code)
 
 
-def _interactive_cli(manager: Manager) -> None:
+def _call(ctx: click.Context, method: str, **params: Any) -> Any:
+    from . import control  # pylint: disable=import-outside-toplevel
+
+    if not control.is_supported():
+        raise click.ClickException(
+            "Controlling a running aw-qt is not supported on this platform"
+        )
+    try:
+        return control.call(method, params, testing=ctx.obj)
+    except control.ControlError as e:
+        raise click.ClickException(str(e))
+    except OSError as e:
+        raise click.ClickException(f"Could not connect to a running aw-qt: {e}")
+
+
+def _echo_status(infos: List[Dict[str, Any]]) -> None:
+    from .limits import format_limits  # pylint: disable=import-outside-toplevel
+    from .sampler import format_bytes  # pylint: disable=import-outside-toplevel
+
+    click.echo(
+        f"{'name':18}  {'state':8}  {'type':7}  {'pid':>7}  {'cpu':>6}  rss (peak)"
+    )
+    for info in infos:
+        pid = info["pid"] if info["pid"] is not None else ""
+        line = f"{info['name']:18}  {info['state']:8}  {info['type']:7}  {pid:>7}"
+        if "rss" in info:
+            line += f"  {info['cpu_percent']:5.1f}%  {format_bytes(info['rss'])} ({format_bytes(info['peak_rss'])})"
+        click.echo(line)
+        if info.get("limits"):
+            click.echo(f"{'':18}  limits: {format_limits(info['limits'])}")
+        if info.get("adopted"):
+            click.echo(f"{'':18}  adopted from an earlier aw-qt, output not captured")
+        if info.get("listening"):
+            listening = info["listening"]
+            click.echo(
+                f"{'':18}  listening on {listening['address']}, started by a connection {listening['activations']} times"
+            )
+        if info.get("recycles"):
+            last = info["recycles"][-1]
+            click.echo(
+                f"{'':18}  recycled {len(info['recycles'])} times, last at {datetime.fromtimestamp(last['time']):%Y-%m-%d %H:%M:%S}: {last['reason']}"
+            )
+
+
+@main.command(help="Show the status of all modules, or of MODULE")
+@click.argument("module", required=False)
+@click.pass_context
+def status(ctx: click.Context, module: Optional[str]) -> None:
+    _echo_status(_call(ctx, "status", **({"module": module} if module else {})))
+
+
+@main.command("list", help="List all discovered modules")
+@click.pass_context
+def list_modules(ctx: click.Context) -> None:
+    for info in _call(ctx, "list"):
+        click.echo(f"{info['name']:18}  {info['state']:8}  {info['type']:7}  {info['path']}")
+
+
+@main.command(help="Start MODULE")
+@click.argument("module")
+@click.pass_context
+def start(ctx: click.Context, module: str) -> None:
+    _echo_status([_call(ctx, "start", module=module)])
+
+
+@main.command(help="Stop MODULE")
+@click.argument("module")
+@click.pass_context
+def stop(ctx: click.Context, module: str) -> None:
+    _echo_status([_call(ctx, "stop", module=module)])
+
+
+@main.command(help="Restart MODULE")
+@click.argument("module")
+@click.pass_context
+def restart(ctx: click.Context, module: str) -> None:
+    _echo_status([_call(ctx, "restart", module=module)])
+
+
+@main.command(
+    help="Pause MODULE, or all modules of a group, until resumed (like from a screen lock hook)"
+)
+@click.argument("name")
+@click.pass_context
+def pause(ctx: click.Context, name: str) -> None:
+    _echo_status(_call(ctx, "pause", name=name))
+
+
+@main.command(help="Resume MODULE, or all modules of a group, after being paused")
+@click.argument("name")
+@click.pass_context
+def resume(ctx: click.Context, name: str) -> None:
+    _echo_status(_call(ctx, "resume", name=name))
+
+
+@main.command(help="List the module groups from the config")
+@click.pass_context
+def groups(ctx: click.Context) -> None:
+    for info in _call(ctx, "groups"):
+        line = f"{info['name']:18}  {'paused' if info['paused'] else '':8}  {', '.join(info['modules'])}"
+        if info["pause_schedule"]:
+            line += f"  (paused {', '.join(info['pause_schedule'])})"
+        click.echo(line.rstrip())
+
+
+@main.command(help="Show the recently captured output of MODULE")
+@click.argument("module")
+@click.option(
+    "-n", "--lines", type=int, default=100, show_default=True, help="Number of lines"
+)
+@click.pass_context
+def output(ctx: click.Context, module: str, lines: int) -> None:
+    for line in _call(ctx, "output", module=module, lines=lines):
+        click.echo(line)
+
+
+@main.command(help="Show the lifecycle events of all modules, or of MODULE")
+@click.argument("module", required=False)
+@click.option(
+    "-e",
+    "--event",
+    "event_types",
+    multiple=True,
+    help="Only show events of this type (like exited), can be given several times",
+)
+@click.option(
+    "--since",
+    type=float,
+    help="Only show events from the last SINCE hours",
+)
+@click.option(
+    "-n", "--lines", type=int, default=50, show_default=True, help="Number of events"
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    help="Show starts, crashes, kills and uptime per module instead",
+)
+@click.option("--json", "as_json", is_flag=True, help="Show events as JSON lines")
+@click.pass_context
+def events(
+    ctx: click.Context,
+    module: Optional[str],
+    event_types: List[str],
+    since: Optional[float],
+    lines: int,
+    stats: bool,
+    as_json: bool,
+) -> None:
+    import json  # pylint: disable=import-outside-toplevel
+    from time import time  # pylint: disable=import-outside-toplevel
+
+    from . import control  # pylint: disable=import-outside-toplevel
+    from .events import (  # pylint: disable=import-outside-toplevel
+        EVENTS,
+        get_events_path,
+        read_events,
+        summarize,
+    )
+
+    for event_type in event_types:
+        if event_type not in EVENTS:
+            raise click.BadParameter(
+                f"{event_type!r}, must be one of {', '.join(EVENTS)}",
+                param_hint="--event",
+            )
+    if control.is_supported():
+        try:
+            # A running aw-qt buffers events for a few seconds
+            control.call("flush_events", {}, testing=ctx.obj)
+        except (OSError, control.ControlError):
+            pass
+    found = read_events(
+        get_events_path(ctx.obj),
+        modules=[module] if module else None,
+        events=event_types or None,
+        since=time() - since * 3600 if since is not None else None,
+    )
+    if stats:
+        click.echo(
+            f"{'name':18}  {'starts':>6}  {'crashes':>7}  {'kills':>5}  {'recycles':>8}  {'failures':>8}  {'uptime':>9}  ready in"
+        )
+        for name, s in sorted(summarize(found).items()):
+            ready = (
+                f"{s['mean_ready_time']:.2f}s"
+                if s["mean_ready_time"] is not None
+                else ""
+            )
+            click.echo(
+                f"{name:18}  {s['starts']:6}  {s['crashes']:7}  {s['kills']:5}  {s['recycles']:8}  {s['failures']:8}  {s['uptime'] / 3600:8.1f}h  {ready}"
+            )
+        return
+    for entry in found[-lines:] if lines else found:
+        if as_json:
+            click.echo(json.dumps(entry))
+            continue
+        details = ", ".join(
+            f"{key}={value}"
+            for key, value in entry.items()
+            if key not in ["time", "monotonic", "event", "module"]
+        )
+        click.echo(
+            f"{datetime.fromtimestamp(entry['time']):%Y-%m-%d %H:%M:%S}  {entry['module']:18}  {entry['event']:9}  {details}"
+        )
+
+
+@main.command(
+    help="Quit aw-qt, leaving its modules running for the next aw-qt to adopt (like when upgrading it)"
+)
+@click.pass_context
+def detach(ctx: click.Context) -> None:
+    names = _call(ctx, "detach")
+    click.echo(f"Left running: {', '.join(names) or 'none'}")
+
+
+@main.command(help="Reload the config file (it's also reloaded when it changes)")
+@click.pass_context
+def reload(ctx: click.Context) -> None:
+    click.echo(_call(ctx, "reload"))
+
+
+def _interactive_cli(manager: "Manager") -> None:
     while True:
         answer = input("> ")
         if answer == "q":
@@ -1,15 +1,63 @@
 import os
 import sys
+import signal
 import logging
 import subprocess
 import platform
+import functools
+import socket
+import threading
 from pathlib import Path
-from glob import glob
-from time import sleep
-from typing import Optional, List, Hashable, Set, Iterable
+from time import sleep, monotonic, perf_counter
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    List,
+    Dict,
+    IO,
+    Set,
+    Iterable,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import aw_core
 
+from . import profiling
+from .activation import (
+    SocketActivator,
+    is_supported as activation_supported,
+    wrap_command,
+)
+from .adoption import (
+    AdoptedProcess,
+    JournalEntry,
+    StateJournal,
+    get_journal_path,
+    is_supported as adoption_supported,
+    process_starttime,
+)
+from .config import AwQtSettings
+from .discovery import DiscoveryCache, get_cache_path
+from .events import EventLog, get_events_path
+from .forkserver import ForkedProcess, ForkServer, is_supported as forkserver_supported
+from .hotplug import DirectoryWatcher
+from .limits import ProcessLimits, can_hold, format_limits, hold_command
+from .output import (
+    OutputCapture,
+    can_hand_over,
+    is_supported as output_capture_supported,
+)
+from .pause import freeze, thaw, is_supported as pause_supported
+from .readiness import Probe
+from .sampler import ResourceSampler, format_bytes
+from .wakeup import SelectThread, Waker
+from .watchdog import Watchdog
+
 logger = logging.getLogger(__name__)
 
 # The path of aw_qt
@@ -24,6 +72,20 @@ def _log_modules(modules: List["Module"]) -> None:
         logger.debug(f" - {m.name} at {m.path}")
 
 
+# A module's process, started directly or by the forkserver
+Process = Union["subprocess.Popen[str]", ForkedProcess, AdoptedProcess]
+
+# Seconds a module gets to exit after SIGTERM before it is killed, unless configured otherwise
+DEFAULT_STOP_TIMEOUT = 10.0
+DEFAULT_READY_TIMEOUT = 30.0
+
+# How much of a module's log read_log returns
+LOG_TAIL_LINES = 500
+LOG_TAIL_BYTES = 256 * 1024
+
+# Seconds to wait for a killed module to disappear
+_KILL_TIMEOUT = 1.0
+
 ignored_filenames = ["aw-cli", "aw-client", "aw-qt", "aw-qt.desktop", "aw-qt.spec"]
 
 
@@ -33,35 +95,21 @@ def filter_modules(modules: Iterable["Module"]) -> Set["Module"]:
     return {m for m in modules if m.name not in ignored_filenames}
 
 
-def is_executable(path: str, filename: str) -> bool:
-    if not os.path.isfile(path):
-        return False
-    # On windows all files ending with .exe are executables
-    if platform.system() == "Windows":
-        return filename.endswith(".exe")
-    # On Unix platforms all files having executable permissions are executables
-    # We do not however want to include .desktop files
-    else:  # Assumes Unix
-        if not os.access(path, os.X_OK):
-            return False
-        if filename.endswith(".desktop"):
-            return False
-        return True
-
-
-def _discover_modules_in_directory(path: str) -> List["Module"]:
+def _discover_modules_in_directory(
+    path: str, cache: DiscoveryCache
+) -> List["Module"]:
     """Look for modules in given directory path and recursively in subdirs matching aw-*"""
-    modules = []
-    matches = glob(os.path.join(path, "aw-*"))
-    for path in matches:
-        basename = os.path.basename(path)
-        if is_executable(path, basename) and basename.startswith("aw-"):
-            name = _filename_to_name(basename)
-            modules.append(Module(name, Path(path), "bundled"))
-        elif os.path.isdir(path) and os.access(path, os.X_OK):
-            modules.extend(_discover_modules_in_directory(path))
-        else:
-            logger.warning(f"Found matching file but was not executable: {path}")
+    listing = cache.scan(path)
+    if listing is None:
+        return []
+    modules = [
+        Module(_filename_to_name(basename), Path(path) / basename, "bundled")
+        for basename in listing.executables
+    ]
+    for subdir in listing.subdirs:
+        modules.extend(
+            _discover_modules_in_directory(os.path.join(path, subdir), cache)
+        )
     return modules
 
 
@@ -69,7 +117,7 @@ def _filename_to_name(filename: str) -> str:
     return filename.replace(".exe", "")
 
 
-def _discover_modules_bundled() -> List["Module"]:
+def _discover_modules_bundled(cache: DiscoveryCache) -> List["Module"]:
     """Use ``_discover_modules_in_directory`` to find all bundled modules"""
     search_paths = [_module_dir, _parent_dir]
     if platform.system() == "Darwin":
@@ -79,7 +127,7 @@ def _discover_modules_bundled() -> List["Module"]:
 
     modules: List[Module] = []
     for path in search_paths:
-        modules += _discover_modules_in_directory(path)
+        modules += _discover_modules_in_directory(path, cache)
 
     modules = list(filter_modules(modules))
     logger.info(f"Found {len(modules)} bundled modules")
@@ -87,7 +135,7 @@ def _discover_modules_bundled() -> List["Module"]:
     return modules
 
 
-def _discover_modules_system() -> List["Module"]:
+def _discover_modules_system(cache: DiscoveryCache) -> List["Module"]:
     """Find all aw- modules in PATH"""
     search_paths = os.get_exec_path()
 
@@ -97,22 +145,17 @@ def _discover_modules_system() -> List["Module"]:
 
     # logger.debug(f"Searching for system modules in PATH: {search_paths}")
     modules: List["Module"] = []
-    paths = [p for p in search_paths if os.path.isdir(p)]
-    for path in paths:
-        try:
-            ls = os.listdir(path)
-        except PermissionError:
-            logger.warning(f"PermissionError while listing {path}, skipping")
+    seen: Set[str] = set()
+    for path in search_paths:
+        listing = cache.scan(path)
+        if listing is None:
             continue
 
-        for basename in ls:
-            if not basename.startswith("aw-"):
-                continue
-            if not is_executable(os.path.join(path, basename), basename):
-                continue
+        for basename in listing.executables:
             name = _filename_to_name(basename)
             # Only pick the first match (to respect PATH priority)
-            if name not in [m.name for m in modules]:
+            if name not in seen:
+                seen.add(name)
                 modules.append(Module(name, Path(path) / basename, "system"))
 
     modules = list(filter_modules(modules))
@@ -121,6 +164,159 @@ def _discover_modules_system() -> List["Module"]:
     return modules
 
 
+def _dependency_levels(
+    names: Iterable[str], depends_on: Dict[str, List[str]]
+) -> List[List[str]]:
+    """
+    Sorts ``names`` into levels, where every module only depends on modules in earlier levels.
+    Modules that are part of a dependency cycle can't be ordered, they are returned
+    together as a last level.
+    """
+    remaining = {name: set(depends_on.get(name, [])) for name in names}
+    levels: List[List[str]] = []
+    while remaining:
+        level = sorted(name for name, deps in remaining.items() if not deps)
+        if not level:
+            logger.error(
+                f"Dependency cycle between modules {sorted(remaining)}, ignoring their dependencies"
+            )
+            levels.append(sorted(remaining))
+            break
+        levels.append(level)
+        for name in level:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(level)
+    return levels
+
+
+class ExitNotifier:
+    """
+    Reports exits of module processes as soon as they happen, without polling: ``fileno()`` becomes
+    readable on an exit, then ``drain()`` returns the exited processes.
+    """
+
+    def __init__(self) -> None:
+        self._waker = Waker()
+        self._lock = threading.Lock()
+        self._exits: List[Tuple["Module", Process]] = []
+
+        self._use_pidfd = hasattr(os, "pidfd_open")
+        self._select_thread = SelectThread("aw-qt-exit-notifier")
+
+    def fileno(self) -> int:
+        return self._waker.fileno()
+
+    def watch(self, module: "Module", process: Process) -> None:
+        if isinstance(process, ForkedProcess):
+            # Not our child, the forkserver reports its exit on a socket
+            self._select(module, process, os.dup(process.sentinel))
+            return
+        if isinstance(process, AdoptedProcess):
+            # Not our child either, it can't be waited for, only watched through its pidfd or polled
+            if process.sentinel is not None:
+                self._select(module, process, os.dup(process.sentinel))
+            else:
+                self._watch_in_thread(module, process)
+            return
+        if self._use_pidfd:
+            try:
+                pidfd = os.pidfd_open(process.pid)  # type: ignore[attr-defined]
+            except ProcessLookupError:
+                # Already exited and reaped
+                self._notify(module, process)
+                return
+            except OSError as e:
+                # pidfd_open is only supported on Linux 5.3 and later
+                logger.debug(f"pidfd_open not supported ({e}), using a wait thread")
+                self._use_pidfd = False
+            else:
+                if process.returncode is not None:
+                    # Reaped before the pidfd was opened, the pid may already be reused
+                    os.close(pidfd)
+                    self._notify(module, process)
+                    return
+                self._select(module, process, pidfd)
+                return
+        self._watch_in_thread(module, process)
+
+    def _watch_in_thread(self, module: "Module", process: Process) -> None:
+        threading.Thread(
+            target=self._wait,
+            args=(module, process),
+            name=f"aw-qt-wait-{module.name}",
+            daemon=True,
+        ).start()
+
+    def _select(self, module: "Module", process: Process, fd: int) -> None:
+        """Watches ``fd``, which becomes readable when the process exits, from the select thread"""
+
+        def on_exit() -> None:
+            self._select_thread.remove(fd, functools.partial(os.close, fd))
+            # Reap the child, so the returncode is available to consumers
+            process.poll()
+            self._notify(module, process)
+
+        self._select_thread.add(fd, on_exit)
+
+    def drain(self) -> List[Tuple["Module", Process]]:
+        """Returns the (module, process) pairs that exited since the last call"""
+        self._waker.drain()
+        with self._lock:
+            exits, self._exits = self._exits, []
+        return exits
+
+    def _wait(self, module: "Module", process: Process) -> None:
+        process.wait()
+        self._notify(module, process)
+
+    def _notify(self, module: "Module", process: Process) -> None:
+        with self._lock:
+            self._exits.append((module, process))
+        self._waker.wake()
+
+
+class ModuleStateModel:
+    """
+    Observable view of the manager's modules, listeners are called with ``"added"``, ``"removed"`` or
+    ``"changed"`` and the module, from whichever thread caused the event.
+    """
+
+    def __init__(self) -> None:
+        self._listeners: List[Callable[[str, "Module"], None]] = []
+
+    def subscribe(self, listener: Callable[[str, "Module"], None]) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, "Module"], None]) -> None:
+        self._listeners.remove(listener)
+
+    def emit(self, event: str, module: "Module") -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(event, module)
+            except Exception:
+                logger.exception(f"Error in module state listener for {event} event")
+
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+# States of a module with a process that's supposed to be running.
+# A module is "starting" until its readiness probe succeeds, modules without a probe are ready right away.
+RUNNING_STATES = ["starting", "ready", "paused"]
+
+
+def _synchronized(method: _F) -> _F:
+    """Serializes calls to the decorated method with the instance's ``_lock``"""
+
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return cast(_F, wrapper)
+
+
 class Module:
     def __init__(self, name: str, path: Path, type: str) -> None:
         self.name = name
@@ -132,18 +328,52 @@ class Module:
         )
         # assert location in ["system", "bundled"]
         # self.location = "system" if _is_system_module(name) else "bundled"
-        self._process: Optional[subprocess.Popen[str]] = None
-        self._last_process: Optional[subprocess.Popen[str]] = None
+        self._process: Optional[Process] = None
+        self._last_process: Optional[Process] = None
+        self._exit_notifier: Optional[ExitNotifier] = None
+        # Called with the stdout and stderr pipes of each new process, if output is captured
+        self._capture: Optional[Callable[[Optional[IO], Optional[IO]], None]] = None
+        self._model: Optional[ModuleStateModel] = None
+        self._events: Optional[EventLog] = None
+        self._state = "stopped"
+        # Seconds to wait for the module to exit after terminating it, before killing it
+        self.stop_timeout = DEFAULT_STOP_TIMEOUT
+        # Checked after starting until it succeeds (for at most ready_timeout seconds)
+        self.probe: Optional[Probe] = None
+        # Priorities and resource limits applied to each new process
+        self.limits: Optional[ProcessLimits] = None
+        # Forked from the forkserver running this Python module if set, instead of executing path
+        self._forkserver: Optional[ForkServer] = None
+        self.python_module: Optional[str] = None
+        # Passed on as fd 3 (with LISTEN_FDS set) if the module is socket-activated, see `SocketActivator`
+        self.listen_socket: Optional[socket.socket] = None
+        self.ready_timeout = DEFAULT_READY_TIMEOUT
+        # Set once the current process became ready, or won't anymore
+        self._ready_checked = threading.Event()
+        # Monotonic time of the last start
+        self.started_at: Optional[float] = None
+        # Set by the supervisor when it gave up restarting the module
+        self.failed = False
+        # Set while stop() is waiting for the process to exit, so the exit isn't taken as unexpected
+        self._stopping = False
+        # How the process was frozen (see `freeze`) while paused, and the state to return to
+        self._paused_with: Optional[str] = None
+        self._resume_state = "ready"
+        # Modules are started and stopped from the GUI, the supervisor and the control socket
+        self._lock = threading.RLock()
 
     def __hash__(self) -> int:
         return hash((self.name, self.path))
 
-    def __eq__(self, other: Hashable) -> bool:
-        return hash(self) == hash(other)
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Module):
+            return NotImplemented
+        return (self.name, self.path) == (other.name, other.path)
 
     def __repr__(self) -> str:
         return f"<Module {self.name} at {self.path}>"
 
+    @_synchronized
     def start(self, testing: bool) -> None:
         logger.info(f"Starting module {self.name}")
 
@@ -164,40 +394,270 @@ class Module:
 
             AppKit.NSBundle.mainBundle().infoDictionary()["LSBackgroundOnly"] = "1"
 
-        # There is a very good reason stdout and stderr is not PIPE here
+        # There is a very good reason stdout and stderr is only PIPE when captured (and so drained)
         # See: https://github.com/ActivityWatch/aw-server/issues/27
-        self._process = subprocess.Popen(
-            exec_cmd, universal_newlines=True, startupinfo=startupinfo
+        pipe = subprocess.PIPE if self._capture else None
+        listen_fds = [self.listen_socket.fileno()] if self.listen_socket else []
+        spawn_start = perf_counter()
+        with profiling.span(f"spawn {self.name}", "module", path=str(self.path)):
+            if self._forkserver is not None and self.python_module:
+                # The forked child applies the limits itself
+                self._process = self._forkserver.spawn(
+                    self.python_module,
+                    exec_cmd,
+                    capture=self._capture is not None,
+                    listen_fds=listen_fds,
+                    limits=self.limits.to_config() if self.limits else None,
+                )
+            else:
+                cmd = wrap_command(exec_cmd) if listen_fds else exec_cmd
+                # Held before exec until the limits are applied, so nothing it forks escapes them
+                hold = self.limits is not None and can_hold()
+                self._process = subprocess.Popen(
+                    hold_command(cmd) if hold else cmd,
+                    universal_newlines=True,
+                    startupinfo=startupinfo,
+                    stdin=listen_fds[0] if listen_fds else None,
+                    stdout=pipe,
+                    stderr=pipe,
+                    # A process group of its own, to pause it along with what it forks (see `freeze`)
+                    start_new_session=pause_supported(),
+                )
+                if self.limits and hold:
+                    self.limits.release(self._process.pid, self.name)
+                elif self.limits:
+                    self.limits.apply(self._process.pid, self.name)
+            if self._capture:
+                self._capture(self._process.stdout, self._process.stderr)
+        self._record(
+            "spawned",
+            pid=self._process.pid,
+            launch="forkserver" if isinstance(self._process, ForkedProcess) else "exec",
+            duration=perf_counter() - spawn_start,
+        )
+        self._started(self._process, spawn_start)
+
+    @_synchronized
+    def adopt(self, process: AdoptedProcess) -> None:
+        """Takes over a process of this module started by an earlier aw-qt, instead of starting a new one"""
+        logger.info(
+            f"Adopting module {self.name} (pid {process.pid}), still running from an earlier aw-qt"
         )
+        self._process = process
+        if self.limits:
+            # The config may have changed since it was started
+            self.limits.apply(process.pid, self.name)
+        self._record("adopted", pid=process.pid)
+        self._started(process, perf_counter())
+
+    def _started(self, process: Process, spawn_start: float) -> None:
         self.started = True
+        self.started_at = monotonic()
+        self.failed = False
+        self._ready_checked = threading.Event()
+        if self.probe is None:
+            self._set_state("ready")
+            self._record(
+                "ready", pid=process.pid, duration=perf_counter() - spawn_start
+            )
+            self._ready_checked.set()
+        else:
+            self._set_state("starting")
+            threading.Thread(
+                target=self._probe_readiness,
+                args=(self.probe, process, self._ready_checked, spawn_start),
+                name=f"aw-qt-ready-{self.name}",
+                daemon=True,
+            ).start()
+        if self._exit_notifier:
+            self._exit_notifier.watch(self, process)
 
-    def stop(self) -> None:
+    def _probe_readiness(
+        self,
+        probe: Probe,
+        process: Process,
+        checked: threading.Event,
+        spawn_start: float,
+    ) -> None:
+        start = monotonic()
+        try:
+            ready = probe.wait(
+                self.ready_timeout,
+                lambda: self._process is process and process.poll() is None,
+            )
+            # From spawning until the probe succeeded or gave up
+            profiling.add_span(
+                f"{self.name} ready",
+                "module",
+                spawn_start,
+                perf_counter(),
+                probe=repr(probe),
+                ready=ready,
+            )
+            with self._lock:
+                if self._process is not process or process.poll() is not None:
+                    # Stopped or exited in the meantime
+                    return
+                if ready:
+                    logger.info(
+                        f"Module {self.name} is ready after {monotonic() - start:.2f}s"
+                    )
+                    self._record(
+                        "ready",
+                        pid=process.pid,
+                        duration=perf_counter() - spawn_start,
+                    )
+                    if self._paused_with is not None:
+                        self._resume_state = "ready"
+                    else:
+                        self._set_state("ready")
+                else:
+                    logger.warning(
+                        f"Module {self.name} didn't become ready ({probe}) within {self.ready_timeout:.0f}s"
+                    )
+        finally:
+            checked.set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the readiness probe of the running module succeeded, failed or timed out,
+        or ``timeout`` seconds passed. Returns True if the module is ready.
+        """
+        self._ready_checked.wait(timeout)
+        return self._state == "ready"
+
+    @_synchronized
+    def stop(self, timeout: Optional[float] = None) -> bool:
         """
         Stops a module, and waits until it terminates.
+
+        If the module hasn't terminated ``timeout`` seconds (by default ``stop_timeout``)
+        after being asked to, it is killed. Returns True if the module had to be killed.
         """
-        # TODO: What if a module doesn't stop? Add timeout to p.wait() and then do a p.kill() if timeout is hit
+        with profiling.span(f"stop {self.name}", "module"):
+            return self._stop(timeout)
+
+    def _stop(self, timeout: Optional[float]) -> bool:
+        if timeout is None:
+            timeout = self.stop_timeout
+        killed = False
         if not self.started:
             logger.warning(
                 f"Tried to stop module {self.name}, but it hasn't been started"
             )
-            return
+            return False
         elif not self.is_alive():
             logger.warning(f"Tried to stop module {self.name}, but it wasn't running")
         else:
             if not self._process:
                 logger.error("No reference to process object")
             logger.debug(f"Stopping module {self.name}")
+            stop_start = monotonic()
+            self._stopping = True
+            if self._paused_with is not None:
+                # A stopped process doesn't handle SIGTERM until it's continued
+                self._thaw()
             if self._process:
                 self._process.terminate()
             logger.debug(f"Waiting for module {self.name} to shut down")
             if self._process:
-                self._process.wait()
-            logger.info(f"Stopped module {self.name}")
+                try:
+                    self._process.wait(max(timeout, 0))
+                except subprocess.TimeoutExpired:
+                    logger.warning(
+                        f"Module {self.name} didn't stop within {timeout:.1f}s, killing it"
+                    )
+                    self._process.kill()
+                    killed = True
+                    try:
+                        self._process.wait(_KILL_TIMEOUT)
+                    except subprocess.TimeoutExpired:
+                        # Can happen if the process is stuck in uninterruptible sleep
+                        logger.error(
+                            f"Module {self.name} (pid {self._process.pid}) is still alive after being killed"
+                        )
+            logger.info(f"{'Killed' if killed else 'Stopped'} module {self.name}")
+            if self._process:
+                self._record(
+                    "killed" if killed else "stopped",
+                    pid=self._process.pid,
+                    returncode=self._process.returncode,
+                    uptime=self.uptime,
+                    duration=monotonic() - stop_start,
+                )
 
-        assert not self.is_alive()
+        self._clear_process()
+        return killed
+
+    @_synchronized
+    def reset(self) -> None:
+        """
+        Cleans up after a process that exited by itself (as reported by the exit notifier),
+        without trying to stop it like ``stop()`` does.
+        """
+        if self.is_alive():
+            logger.warning(f"Tried to reset module {self.name}, but it's still running")
+            return
+        self._clear_process()
+
+    def _clear_process(self) -> None:
         self._last_process = self._process
         self._process = None
         self.started = False
+        self._stopping = False
+        self._paused_with = None
+        if not self.failed:
+            self._set_state("stopped")
+
+    @_synchronized
+    def pause(self) -> bool:
+        """
+        Freezes the running module (see `freeze`), so it uses no CPU until it's resumed.
+        Returns False if it isn't running or already paused.
+        """
+        pid = self.pid
+        if pid is None or self._paused_with is not None or not self.is_alive():
+            return False
+        try:
+            self._paused_with = freeze(pid)
+        except (OSError, AttributeError) as e:
+            # AttributeError: no SIGSTOP on Windows
+            logger.warning(f"Could not pause module {self.name}: {e}")
+            return False
+        logger.info(f"Paused module {self.name} (pid {pid}, {self._paused_with})")
+        self._record("paused", pid=pid, method=self._paused_with)
+        self._resume_state = self._state
+        self._set_state("paused")
+        return True
+
+    @_synchronized
+    def resume(self) -> bool:
+        """Resumes the paused module, returns False if it wasn't paused"""
+        if self._paused_with is None:
+            return False
+        self._record("resumed", pid=self.pid)
+        self._thaw()
+        logger.info(f"Resumed module {self.name}")
+        self._set_state(self._resume_state)
+        return True
+
+    def _thaw(self) -> None:
+        pid = self.pid
+        if pid is not None and self._paused_with is not None:
+            try:
+                thaw(pid, self._paused_with)
+            except OSError as e:
+                logger.warning(f"Could not resume module {self.name}: {e}")
+        self._paused_with = None
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_with is not None
+
+    @property
+    def adopted(self) -> bool:
+        """Whether the running process was started by an earlier aw-qt"""
+        return isinstance(self._process, AdoptedProcess)
 
     def toggle(self, testing: bool) -> None:
         if self.started:
@@ -213,23 +673,173 @@ class Module:
         # If returncode is none after p.poll(), module is still running
         return True if self._process.returncode is None else False
 
-    def read_log(self, testing: bool) -> str:
-        """Useful if you want to retrieve the logs of a module"""
+    @property
+    def output_captured(self) -> bool:
+        """Whether the current process writes its output to pipes read by this aw-qt"""
+        process = self._process
+        if process is None:
+            return False
+        return process.stdout is not None or process.stderr is not None
+
+    @property
+    def forked(self) -> bool:
+        """Whether the current process was forked by the forkserver"""
+        return isinstance(self._process, ForkedProcess)
+
+    @property
+    def state(self) -> str:
+        """
+        ``starting`` until its readiness probe succeeds, then ``ready``, and ``paused`` while frozen.
+        ``stopped``, or ``failed`` if the supervisor gave up restarting it.
+        Kept up to date by start/stop and the manager's exit notifications, so reading it costs no syscall.
+        """
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.debug(f"Module {self.name} is now {state}")
+        self._state = state
+        if self._model:
+            self._model.emit("changed", self)
+
+    def mark_failed(self) -> None:
+        """Marks a stopped module as failed, until it's started again"""
+        self.failed = True
+        self._set_state("failed")
+        self._record("failed")
+
+    def _record(self, event: str, **fields: Any) -> None:
+        if self._events is not None:
+            self._events.record(event, self.name, **fields)
+
+    @property
+    def uptime(self) -> Optional[float]:
+        """Seconds since the module was last started (or adopted)"""
+        return monotonic() - self.started_at if self.started_at is not None else None
+
+    @property
+    def pid(self) -> Optional[int]:
+        """The pid of the module's process, if it's running (doesn't check whether it still is)"""
+        if self._process is None or self._process.returncode is not None:
+            return None
+        return self._process.pid
+
+    @property
+    def returncode(self) -> Optional[int]:
+        """The exit code of the current or last process, negative if it was killed by a signal"""
+        process = self._process or self._last_process
+        return process.returncode if process else None
+
+    def read_log(
+        self,
+        testing: bool,
+        max_lines: int = LOG_TAIL_LINES,
+        max_bytes: int = LOG_TAIL_BYTES,
+    ) -> str:
+        """
+        Useful if you want to retrieve the logs of a module.
+        Only the end of the latest log file is read, at most ``max_lines`` lines and ``max_bytes`` bytes,
+        so this is cheap even for huge logs (but still does disk IO, so avoid calling it from a GUI thread).
+        """
         log_path = aw_core.log.get_latest_log_file(self.name, testing)
         if log_path:
-            with open(log_path) as f:
-                return f.read()
+            return _tail_file(log_path, max_lines, max_bytes)
         else:
             return "No log file found"
 
 
+def _tail_file(path: str, max_lines: int, max_bytes: int) -> str:
+    """Returns the last ``max_lines`` lines of a file, reading it backwards in blocks from the end"""
+    block_size = 8192
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        blocks: List[bytes] = []
+        newlines = 0
+        # A trailing newline ends the last line, it doesn't start a new one
+        while pos > 0 and newlines <= max_lines and end - pos < max_bytes:
+            size = min(block_size, pos, max_bytes - (end - pos))
+            pos -= size
+            f.seek(pos)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+
+    data = b"".join(reversed(blocks))
+    lines = data.splitlines(keepends=True)
+    if pos > 0 and lines:
+        # The first line is most likely cut off
+        lines = lines[1:]
+    return b"".join(lines[-max_lines:]).decode("utf-8", errors="replace")
+
+
 class Manager:
-    def __init__(self, testing: bool = False) -> None:
-        self.modules: List[Module] = []
+    def __init__(
+        self,
+        testing: bool = False,
+        rediscover: bool = False,
+        settings: Optional[AwQtSettings] = None,
+    ) -> None:
+        # Discovered modules by (type, name), only one of each name per type is used
+        self._registry: Dict[Tuple[str, str], Module] = {}
+        self._discover_lock = threading.Lock()
         self.testing = testing
+        self.settings = settings if settings is not None else AwQtSettings(testing)
+        self.exit_notifier = ExitNotifier()
+        self.model = ModuleStateModel()
+        self.sampler = ResourceSampler(
+            self.settings.sample_interval, self.settings.sample_history
+        )
+        # Started once a module launched through it is started
+        self.forkserver: Optional[ForkServer] = None
+        if forkserver_supported():
+            self.forkserver = ForkServer(self.settings.forkserver_preload)
+        # Listens for socket-activated modules, started by their first connection
+        self.activator: Optional[SocketActivator] = None
+        if activation_supported():
+            self.activator = SocketActivator(self)
+        self.watchdog = Watchdog(self)
+        self.sampler.listeners.append(self.watchdog.check)
+        self._discovery_cache = DiscoveryCache(get_cache_path(), rediscover=rediscover)
+        self.output: Optional[OutputCapture] = None
+        if output_capture_supported():
+            self.output = OutputCapture(
+                os.path.join(aw_core.dirs.get_log_dir("aw-qt"), "output"), testing
+            )
+        self._search_directories: Set[str] = set()
+        self._watcher: Optional[DirectoryWatcher] = None
+        # What to replace running modules with once they stop (None to remove them),
+        # for modules whose executable was removed or moved while running
+        self._pending: Dict[Tuple[str, str], Optional[Module]] = {}
+        # Groups paused with pause_group, until they're resumed
+        self.paused_groups: Set[str] = set()
+        # The running modules, for the next aw-qt to adopt them (see `adopt_modules`)
+        self.journal = StateJournal(
+            get_journal_path(testing) if adoption_supported() else None
+        )
+        # Not written until it was read by adopt_modules
+        self._journal_loaded = False
+        # Modules start and stop from several threads, the last write has to be the current state
+        self._journal_lock = threading.Lock()
+        # Set by detach(), stop_all() then leaves the modules in _left_running running
+        self.detached = False
+        self._left_running: Set[Module] = set()
+        # Lifecycle events of the modules
+        self.events = EventLog(
+            get_events_path(testing) if self.settings.event_log else None,
+            self.settings.event_log_max_bytes,
+            self.settings.event_log_backup_count,
+            self.settings.event_log_flush_interval,
+        )
+        self.model.subscribe(self._on_module_event)
 
         self.discover_modules()
 
+    @property
+    def modules(self) -> List[Module]:
+        return list(self._registry.values())
+
     @property
     def modules_system(self) -> List[Module]:
         return [m for m in self.modules if m.type == "system"]
@@ -239,51 +849,417 @@ class Manager:
         return [m for m in self.modules if m.type == "bundled"]
 
     def discover_modules(self) -> None:
-        # These should always be bundled with aw-qt
-        modules = set(_discover_modules_bundled())
-        modules |= set(_discover_modules_system())
-        modules = filter_modules(modules)
+        """
+        Looks for modules in the bundle and on PATH, and updates the registry with what changed.
+        Running modules are kept even if their executable disappeared, until they're stopped.
+        """
+        with self._discover_lock, profiling.span("discover modules", "manager"):
+            cache = self._discovery_cache
+            cache.scanned.clear()
+            found: Dict[Tuple[str, str], Module] = {}
+            for m in _discover_modules_bundled(cache) + _discover_modules_system(cache):
+                found.setdefault((m.type, m.name), m)
+            cache.save()
+            logger.debug(
+                f"Discovery cache: {cache.hits} directories unchanged, {cache.misses} rescanned"
+            )
+            self._search_directories = set(cache.scanned)
+
+            # update one by one
+            self._pending.clear()
+            for key, m in found.items():
+                current = self._registry.get(key)
+                if current == m:
+                    continue
+                if current is not None:
+                    if current.started:
+                        self._pending[key] = m
+                        continue
+                    self._remove_module(current)
+                self._add_module(m)
+            for key, m in list(self._registry.items()):
+                if key not in found:
+                    if m.started:
+                        self._pending[key] = None
+                    else:
+                        self._remove_module(m)
+
+        if self._watcher is not None:
+            self._watcher.set_paths(self._search_directories)
 
-        # update one by one
-        for m in modules:
-            if m not in self.modules:
-                self.modules.append(m)
+    def _add_module(self, m: Module) -> None:
+        m._exit_notifier = self.exit_notifier
+        m._model = self.model
+        m._events = self.events
+        self._configure_module(m)
+        self._registry[(m.type, m.name)] = m
+        self.model.emit("added", m)
+
+    def _configure_module(self, m: Module) -> None:
+        module_settings = self.settings.module(m.name)
+        m.stop_timeout = module_settings.stop_timeout
+        m.probe = module_settings.ready
+        m.ready_timeout = module_settings.ready_timeout
+        m.limits = module_settings.limits
+        m._forkserver = None
+        if module_settings.launch == "forkserver":
+            if self.forkserver is not None:
+                m._forkserver = self.forkserver
+                m.python_module = module_settings.python_module
+            else:
+                logger.warning(
+                    f"The forkserver isn't supported here, starting {m.name} as an executable"
+                )
+        m.listen_socket = None
+        if module_settings.listen is not None:
+            if self.activator is not None:
+                m.listen_socket = self.activator.get_socket(m.name)
+            else:
+                logger.warning(
+                    f"Socket activation isn't supported here, starting {m.name} right away"
+                )
+        elif self.activator is not None:
+            self.activator.stop_listening(m.name)
+        m._capture = None
+        if self.output is not None and module_settings.capture_output:
+            m._capture = functools.partial(self.output.attach, module_settings)
+
+    def reconfigure(self, settings: AwQtSettings) -> List[str]:
+        """
+        Switches to new settings while running, returns the names of the modules whose settings changed.
+
+        Running modules aren't restarted: their limits and output settings are applied right away,
+        the rest (like the readiness probe, or turning output capture on or off) when they're next started.
+        The restart policy and dependencies are always read from the current settings.
+        """
+        for group in list(self.paused_groups):
+            if group not in settings.groups:
+                logger.info(f"Resuming group {group}, it was removed from the config")
+                self.resume_group(group)
+        old, self.settings = self.settings, settings
+        changed = []
+        with self._discover_lock:
+            for m in self.modules:
+                section = settings.module_section(m.name)
+                if section == old.module_section(m.name):
+                    continue
+                changed.append(m.name)
+                self._configure_module(m)
+                pid = m.pid
+                if pid is not None and m.limits is not None:
+                    m.limits.apply(pid, m.name)
+                output = self.output.output(m.name) if self.output else None
+                if output is not None:
+                    output.configure(settings.module(m.name))
+
+        self.sampler.configure(settings.sample_interval, settings.sample_history)
+        self.events.configure(settings)
+        if self._watcher is not None:
+            self._watcher.poll_interval = settings.hotplug_poll_interval
+        if settings.hotplug and not old.hotplug:
+            self.start_hotplug()
+        elif old.hotplug and not settings.hotplug:
+            self.stop_hotplug()
+        return changed
+
+    def _remove_module(self, m: Module) -> None:
+        del self._registry[(m.type, m.name)]
+        self.model.emit("removed", m)
+
+    def _on_module_event(self, event: str, module: Module) -> None:
+        if event == "changed":
+            self._save_journal()
+        key = (module.type, module.name)
+        if event != "changed" or module.started or key not in self._pending:
+            return
+        with self._discover_lock:
+            if key not in self._pending or self._registry.get(key) is not module:
+                return
+            replacement = self._pending.pop(key)
+            self._remove_module(module)
+            if replacement is not None:
+                self._add_module(replacement)
+
+    def _save_journal(self) -> None:
+        """
+        Writes the modules that the next aw-qt can adopt to the journal. Modules whose output is
+        captured would lose the reader of their pipes if aw-qt crashed, so they're only written
+        once their pipes were handed over by detach().
+        """
+        if not self._journal_loaded:
+            return
+        with self._journal_lock:
+            entries = []
+            for m in self.modules:
+                pid = m.pid
+                if pid is None:
+                    continue
+                if m.output_captured and m not in self._left_running:
+                    continue
+                starttime = process_starttime(pid)
+                if starttime is not None:
+                    entries.append(
+                        JournalEntry(m.name, m.type, str(m.path), pid, starttime)
+                    )
+            self.journal.save(entries)
+
+    def adopt_modules(self) -> List[Module]:
+        """
+        Adopts the modules an earlier aw-qt left running (see `StateJournal`), instead of starting
+        them again, returns the adopted modules. To be called before autostarting modules.
+        """
+        adopted = []
+        for entry in self.journal.load():
+            module = self.get_module(entry.name, entry.type)
+            if module is None:
+                logger.warning(
+                    f"Module {entry.name} (pid {entry.pid}) is still running from an earlier aw-qt, but isn't installed anymore, leaving it alone"
+                )
+                continue
+            if module.started:
+                continue
+            if str(module.path) != entry.path:
+                logger.info(
+                    f"Module {entry.name} moved from {entry.path} to {module.path}, the new one is used once it's restarted"
+                )
+            process = AdoptedProcess([entry.path], entry.pid, entry.starttime)
+            if process.poll() is not None:
+                continue
+            if pause_supported():
+                try:
+                    # It may have been paused when the earlier aw-qt exited
+                    thaw(process.pid, "cgroup")
+                except OSError:
+                    pass
+            module.adopt(process)
+            adopted.append(module)
+        self._journal_loaded = True
+        self._save_journal()
+        return adopted
+
+    def detach(self) -> List[Module]:
+        """
+        Makes stop_all() leave the running modules running, for the next aw-qt to adopt them
+        (like when upgrading aw-qt). Returns the modules that are left running.
+        The output of captured modules is handed over to a keeper (see `OutputCapture.hand_over`),
+        modules it can't be handed over for, and those from the forkserver, are stopped on exit.
+        """
+        running = [m for m in self.modules if m.is_alive()]
+        forked = [m for m in running if m.forked]
+        if forked:
+            logger.warning(
+                f"Stopping {', '.join(m.name for m in forked)} on exit, they were started by the forkserver"
+            )
+            running = [m for m in running if not m.forked]
+        captured = [m for m in running if m.output_captured]
+        if captured:
+            handed_over = False
+            if self.output is not None and can_hand_over():
+                try:
+                    self.output.hand_over(m.name for m in captured)
+                    handed_over = True
+                except OSError as e:
+                    logger.warning(f"Could not start a keeper for module output: {e}")
+            if not handed_over:
+                logger.warning(
+                    f"Stopping {', '.join(m.name for m in captured)} on exit, their output is captured by this aw-qt"
+                )
+                running = [m for m in running if m not in captured]
+        for m in running:
+            # Nothing would resume them
+            m.resume()
+        self._left_running = set(running)
+        self.detached = True
+        self._save_journal()
+        logger.info(
+            f"Detached, leaving modules running on exit: {', '.join(m.name for m in running) or 'none'}"
+        )
+        return running
+
+    def start_hotplug(self) -> None:
+        """
+        Watches the search directories in the background, so that modules which are installed
+        or removed while running are picked up without a restart.
+        """
+        if not self.settings.hotplug:
+            return
+        self._watcher = DirectoryWatcher(
+            self._on_directories_changed, self.settings.hotplug_poll_interval
+        )
+        self._watcher.start(self._search_directories)
+
+    def stop_hotplug(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _on_directories_changed(self, changed: Optional[Set[str]]) -> None:
+        if changed is None:
+            self._discovery_cache.invalidate()
+        else:
+            for path in changed:
+                self._discovery_cache.invalidate(path)
+        self.discover_modules()
 
     def get_unexpected_stops(self) -> List[Module]:
         return list(filter(lambda x: x.started and not x.is_alive(), self.modules))
 
-    def start(self, module_name: str) -> None:
-        # NOTE: Will always prefer a bundled version, if available. This will not affect the
-        #       aw-qt menu since it directly calls the module's start() method.
-        bundled = [m for m in self.modules_bundled if m.name == module_name]
-        system = [m for m in self.modules_system if m.name == module_name]
-        if bundled:
-            bundled[0].start(self.testing)
-        elif system:
-            system[0].start(self.testing)
-        else:
+    def handle_exits(self) -> List[Module]:
+        """
+        Processes the exits reported by ``exit_notifier`` since the last call,
+        returns the modules which stopped while they were supposed to be running.
+        """
+        unexpected = []
+        for module, process in self.exit_notifier.drain():
+            logger.debug(
+                f"Module {module.name} (pid {process.pid}) exited with code {process.returncode}"
+            )
+            # Exits caused by Module.stop() (possibly still running in another thread),
+            # or of a process that has since been replaced, are expected
+            if module.started and not module._stopping and module._process is process:
+                unexpected.append(module)
+                self._record_exit(module, process)
+        return unexpected
+
+    def _record_exit(self, module: Module, process: Process) -> None:
+        # Nothing is known about how an adopted process exited
+        returncode = (
+            None if isinstance(process, AdoptedProcess) else process.returncode
+        )
+        fields: Dict[str, Any] = {"pid": process.pid, "returncode": returncode}
+        if returncode is not None and returncode < 0:
+            try:
+                fields["signal"] = signal.Signals(-returncode).name
+            except ValueError:
+                pass
+        fields["uptime"] = module.uptime
+        self.events.record("exited", module.name, **fields)
+
+    def get_module(
+        self, module_name: str, type: Optional[str] = None
+    ) -> Optional[Module]:
+        # NOTE: Will always prefer a bundled version, if available, unless ``type`` is given.
+        #       This will not affect the aw-qt menu since it directly calls the module's start() method.
+        if type is not None:
+            return self._registry.get((type, module_name))
+        return self._registry.get(("bundled", module_name)) or self._registry.get(
+            ("system", module_name)
+        )
+
+    def start(self, module_name: str) -> Optional[Module]:
+        module = self.get_module(module_name)
+        if module is None:
             logger.error(f"Manager tried to start nonexistent module {module_name}")
+            return None
+        module.start(self.testing)
+        return module
 
     def autostart(self, autostart_modules: List[str]) -> None:
+        """
+        Starts the given modules, each one as soon as the modules it depends on (``depends_on``
+        in the config) are ready (see ``Module.wait_ready``). Independent modules are started concurrently,
+        so the time this takes is bounded by the longest dependency chain rather than the number of modules.
+        """
         # NOTE: Currently impossible to autostart a system module if a bundled module with the same name exists
 
         # We only want to autostart modules that are both in found modules and are asked to autostart.
+        found = {m.name for m in self.modules}
         for name in autostart_modules:
-            if name not in [m.name for m in self.modules]:
+            if name not in found:
                 logger.error(f"Module {name} not found")
-        autostart_modules = list(set(autostart_modules))
+        names = [name for name in dict.fromkeys(autostart_modules) if name in found]
+        if not names:
+            return
 
-        # Start aw-server-rust first
-        if "aw-server-rust" in autostart_modules:
-            self.start("aw-server-rust")
-        elif "aw-server" in autostart_modules:
-            self.start("aw-server")
+        depends_on = {
+            name: [
+                dep
+                for dep in self.settings.module(name).depends_on
+                if dep in names and dep != name
+            ]
+            for name in names
+        }
+        logger.debug(f"Autostart order: {_dependency_levels(names, depends_on)}")
+        forked = [m for m in self.modules if m.name in names and m._forkserver]
+        if self.forkserver is not None and forked:
+            # Boots while the modules they depend on (like aw-server) are starting
+            threading.Thread(
+                target=self.forkserver.start, name="aw-qt-forkserver", daemon=True
+            ).start()
 
-        autostart_modules = list(
-            set(autostart_modules) - {"aw-server", "aw-server-rust"}
-        )
-        for name in autostart_modules:
-            self.start(name)
+        done: Set[str] = set()
+        pending: Dict[Future, str] = {}
+        waiting = list(names)
+        with profiling.span("autostart", "manager", modules=names), ThreadPoolExecutor(
+            max_workers=len(names), thread_name_prefix="aw-qt-autostart"
+        ) as pool:
+            while waiting or pending:
+                for name in list(waiting):
+                    if all(dep in done for dep in depends_on[name]):
+                        waiting.remove(name)
+                        pending[pool.submit(self._autostart_module, name)] = name
+                if not pending:
+                    # Only modules in a dependency cycle are left, start them without waiting on each other
+                    for name in waiting:
+                        depends_on[name] = []
+                    continue
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done.add(pending.pop(future))
+
+    def _autostart_module(self, module_name: str) -> None:
+        with profiling.span(f"autostart {module_name}", "manager"):
+            module = self.get_module(module_name)
+            if module and module.started:
+                # Adopted from an earlier aw-qt
+                return
+            if module and self.activator and self.activator.listen(module):
+                # Dependents can connect right away, connections wait in the backlog until it's up
+                return
+            try:
+                module = self.start(module_name)
+            except Exception:
+                logger.exception(f"Failed to start module {module_name}")
+                return
+            ready = module is None or module.wait_ready()
+        # Dependents are started regardless, they'll have to retry until it's up
+        if not ready:
+            logger.warning(
+                f"Module {module_name} isn't ready, starting the modules depending on it anyway"
+            )
+
+    def group_modules(self, group: str) -> List[Module]:
+        """The modules of a group from the config, raises KeyError if there's no such group"""
+        settings = self.settings.groups[group]
+        return [m for m in self.modules if m.name in settings]
+
+    def pause_group(self, group: str) -> List[Module]:
+        """
+        Pauses the running modules of a group, returns the ones that were paused.
+        Modules started while the group is paused aren't paused.
+        """
+        modules = self.group_modules(group)
+        if not pause_supported():
+            logger.warning("Pausing modules isn't supported on this platform")
+            return []
+        self.paused_groups.add(group)
+        return [m for m in modules if m.pause()]
+
+    def resume_group(self, group: str) -> List[Module]:
+        """
+        Resumes the paused modules of a group, returns the ones that were resumed.
+        Modules that are also in another paused group stay paused.
+        """
+        modules = self.group_modules(group)
+        self.paused_groups.discard(group)
+        still_paused = [
+            self.settings.groups[g] for g in self.paused_groups if g in self.settings.groups
+        ]
+        return [
+            m
+            for m in modules
+            if not any(m.name in other for other in still_paused) and m.resume()
+        ]
 
     def stop(self, module_name: str) -> None:
         for m in self.modules:
@@ -293,12 +1269,70 @@ class Manager:
         else:
             logger.error(f"Manager tried to stop nonexistent module {module_name}")
 
-    def stop_all(self) -> None:
-        for module in filter(lambda m: m.is_alive(), self.modules):
-            module.stop()
+    def stop_all(self, timeout: Optional[float] = None) -> List[Module]:
+        """
+        Stops all running modules, dependents before their dependencies (watchers before the server),
+        within ``timeout`` seconds (``shutdown_timeout`` by default). Returns the modules that had to be killed.
+        Once detached, the modules it left running aren't stopped (see `detach`).
+        """
+        if self.activator is not None:
+            self.activator.stop_listening()
+        with profiling.span("stop all", "manager"):
+            return self._stop_all(timeout)
+
+    def _stop_all(self, timeout: Optional[float]) -> List[Module]:
+        if timeout is None:
+            timeout = self.settings.shutdown_timeout
+        deadline = monotonic() + timeout
+
+        running = {
+            m.name: m
+            for m in self.modules
+            if m.is_alive() and m not in self._left_running
+        }
+        if not running:
+            return []
+        depends_on = {
+            name: [dep for dep in self.settings.module(name).depends_on if dep in running]
+            for name in running
+        }
+        levels = _dependency_levels(running, depends_on)
+
+        killed: List[Module] = []
+        with ThreadPoolExecutor(
+            max_workers=len(running), thread_name_prefix="aw-qt-shutdown"
+        ) as pool:
+            for level in reversed(levels):
+                modules = [running[name] for name in level]
+                remaining = deadline - monotonic()
+                results = pool.map(
+                    lambda m: m.stop(min(m.stop_timeout, remaining)), modules
+                )
+                killed += [m for m, was_killed in zip(modules, results) if was_killed]
+
+        if killed:
+            logger.warning(
+                f"Had to kill modules that didn't stop in time: {', '.join(m.name for m in killed)}"
+            )
+        return killed
+
+    def close(self) -> None:
+        """
+        Stops sampling, hotplug and the forkserver, and writes the buffered events.
+        Modules are left as they are, see stop_all().
+        """
+        self.sampler.stop()
+        self.stop_hotplug()
+        if self.forkserver is not None:
+            self.forkserver.stop()
+        self.events.close()
+
+    def start_sampling(self) -> None:
+        """Starts sampling the resource usage of running modules in the background"""
+        self.sampler.start(lambda: list(self.modules))
 
     def print_status(self, module_name: Optional[str] = None) -> None:
-        header = "name                status      type"
+        header = "name                status      type     cpu     rss (peak)          fds  threads"
         if module_name:
             # find module
             module = next((m for m in self.modules if m.name == module_name), None)
@@ -313,9 +1347,19 @@ class Manager:
                 self._print_status_module(module)
 
     def _print_status_module(self, module: Module) -> None:
+        usage = self.sampler.usage(module)
+        if usage:
+            current = usage.current
+            rss = f"{format_bytes(current.rss)} ({format_bytes(usage.peak_rss)})"
+            resources = f"{current.cpu_percent:5.1f}%  {rss:18}  {current.fds:4}  {current.threads:7}"
+        else:
+            resources = ""
         logger.info(
-            f"{module.name:18}  {'running' if module.is_alive() else 'stopped' :10}  {module.type}"
+            f"{module.name:18}  {'running' if module.is_alive() else 'stopped' :10}  {module.type:7}  {resources}".rstrip()
         )
+        pid = module.pid
+        if module.limits and pid is not None:
+            logger.info(f"{'':18}  limits: {format_limits(module.limits.read(pid))}")
 
 
 def main_test():
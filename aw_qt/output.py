@@ -0,0 +1,342 @@
+"""Capture of the stdout and stderr of modules, into a buffer per module and rotating files."""
+
+import os
+import sys
+import json
+import logging
+import functools
+import selectors
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from time import monotonic, time
+from typing import (
+    IO,
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    TYPE_CHECKING,
+)
+
+from .wakeup import SelectThread
+
+if TYPE_CHECKING:
+    from .config import ModuleSettings
+
+logger = logging.getLogger(__name__)
+
+# Longer lines are cut, so a module writing without newlines can't use unbounded memory
+MAX_LINE_LENGTH = 8 * 1024
+_READ_SIZE = 64 * 1024
+
+
+def is_supported() -> bool:
+    # select() only works with sockets on Windows, not with pipes
+    return sys.platform != "win32"
+
+
+def can_hand_over() -> bool:
+    # A PyInstaller build has no Python to run the keeper with
+    return is_supported() and not getattr(sys, "frozen", False)
+
+
+class OutputLine(NamedTuple):
+    time: float  # unix time
+    stream: str  # stdout or stderr
+    text: str
+
+    def format(self) -> str:
+        timestamp = datetime.fromtimestamp(self.time).isoformat(" ", "milliseconds")
+        return f"{timestamp} [{self.stream}] {self.text}"
+
+
+class ModuleOutput:
+    """The captured output of one module, across its restarts"""
+
+    def __init__(self, name: str, path: Optional[str]) -> None:
+        self.name = name
+        self.path = path
+        self.lines: Deque[OutputLine] = deque(maxlen=1000)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._handler: Optional[RotatingFileHandler] = None
+        # Token bucket, refilled with rate_limit lines per second up to rate_burst
+        self.rate_limit = 0.0
+        self.rate_burst = 0.0
+        self._tokens = 0.0
+        self._refilled = monotonic()
+        self._max_bytes = 0
+        self._backup_count = 0
+
+    def configure(self, settings: "ModuleSettings") -> None:
+        self.set_limits(
+            buffer_lines=settings.output_buffer_lines,
+            rate_limit=settings.output_rate_limit,
+            rate_burst=settings.output_rate_burst,
+            max_bytes=settings.output_max_bytes,
+            backup_count=settings.output_backup_count,
+        )
+
+    def set_limits(
+        self,
+        buffer_lines: int,
+        rate_limit: float,
+        rate_burst: int,
+        max_bytes: int,
+        backup_count: int,
+    ) -> None:
+        with self._lock:
+            if self.lines.maxlen != buffer_lines:
+                self.lines = deque(self.lines, maxlen=buffer_lines)
+            if (self.rate_limit, self.rate_burst) != (rate_limit, rate_burst):
+                self.rate_limit = rate_limit
+                self.rate_burst = float(rate_burst)
+                self._tokens = self.rate_burst
+            if (self._max_bytes, self._backup_count) != (max_bytes, backup_count):
+                self._max_bytes = max_bytes
+                self._backup_count = backup_count
+                if self._handler is not None:
+                    self._handler.close()
+                    self._handler = None
+
+    def limits(self) -> Dict[str, Any]:
+        """The arguments of ``set_limits`` in effect"""
+        with self._lock:
+            return {
+                "buffer_lines": self.lines.maxlen,
+                "rate_limit": self.rate_limit,
+                "rate_burst": int(self.rate_burst),
+                "max_bytes": self._max_bytes,
+                "backup_count": self._backup_count,
+            }
+
+    def add(self, stream: str, text: str) -> None:
+        now = monotonic()
+        with self._lock:
+            if self.rate_limit > 0:
+                self._tokens = min(
+                    self.rate_burst,
+                    self._tokens + (now - self._refilled) * self.rate_limit,
+                )
+                self._refilled = now
+                if self._tokens < 1:
+                    self.dropped += 1
+                    return
+                self._tokens -= 1
+            if self.dropped:
+                self._append(
+                    "aw-qt",
+                    f"{self.dropped} lines dropped, over the limit of {self.rate_limit:g} lines/s",
+                )
+                self.dropped = 0
+            self._append(stream, text)
+
+    def _append(self, stream: str, text: str) -> None:
+        line = OutputLine(time(), stream, text)
+        self.lines.append(line)
+        if self.path is None:
+            return
+        if self._handler is None:
+            try:
+                self._handler = RotatingFileHandler(
+                    self.path,
+                    maxBytes=self._max_bytes,
+                    backupCount=self._backup_count,
+                    encoding="utf-8",
+                    delay=True,
+                )
+            except OSError as e:
+                logger.warning(f"Can't write output of {self.name} to {self.path}: {e}")
+                self.path = None
+                return
+        record = logging.makeLogRecord({"msg": line.format(), "created": line.time})
+        self._handler.handle(record)
+
+    def tail(self, n: Optional[int] = None) -> List[OutputLine]:
+        with self._lock:
+            lines = list(self.lines)
+        return lines[-n:] if n else lines
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handler is not None:
+                self._handler.close()
+                self._handler = None
+
+
+class _Pipe:
+    def __init__(self, output: ModuleOutput, stream: str, pipe: IO) -> None:
+        self.output = output
+        self.stream = stream
+        self.pipe = pipe
+        self.partial = b""
+
+    def feed(self, data: bytes) -> None:
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        if len(self.partial) > MAX_LINE_LENGTH:
+            lines.append(self.partial)
+            self.partial = b""
+        for line in lines:
+            self.output.add(
+                self.stream,
+                line[:MAX_LINE_LENGTH].rstrip(b"\r").decode("utf-8", errors="replace"),
+            )
+
+    def drain(self) -> bool:
+        """Reads the output that's available, returns False once the writing end was closed"""
+        try:
+            data = os.read(self.pipe.fileno(), _READ_SIZE)
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            logger.debug(f"Error reading output of {self.output.name}: {e}")
+            return False
+        if not data:
+            # The process (and any children it passed the pipe on to) exited
+            return False
+        try:
+            self.feed(data)
+        except Exception:
+            logger.exception(f"Error while capturing output of {self.output.name}")
+        return True
+
+    def close(self) -> None:
+        if self.partial:
+            self.feed(b"\n")
+        self.pipe.close()
+
+
+class OutputCapture:
+    def __init__(self, directory: Optional[str], testing: bool = False) -> None:
+        """
+        Captures module output, writing it to ``<directory>/<module>.log``
+        (or only keeping it in memory if directory is None).
+        """
+        self.directory = directory
+        self.testing = testing
+        self._outputs: Dict[str, ModuleOutput] = {}
+        self._lock = threading.Lock()
+        # All pipes being drained
+        self._pipes: List[_Pipe] = []
+        self._select_thread = SelectThread("aw-qt-output")
+
+    def output(self, name: str) -> Optional[ModuleOutput]:
+        return self._outputs.get(name)
+
+    def attach(
+        self, settings: "ModuleSettings", stdout: Optional[IO], stderr: Optional[IO]
+    ) -> None:
+        """Starts draining the pipes of a newly started process of the module"""
+        with self._lock:
+            output = self._outputs.get(settings.name)
+            if output is None:
+                path = None
+                if self.directory is not None:
+                    suffix = "-testing" if self.testing else ""
+                    path = os.path.join(self.directory, f"{settings.name}{suffix}.log")
+                    try:
+                        os.makedirs(self.directory, exist_ok=True)
+                    except OSError as e:
+                        logger.warning(f"Can't create {self.directory}: {e}")
+                        path = None
+                output = self._outputs[settings.name] = ModuleOutput(
+                    settings.name, path
+                )
+            output.configure(settings)
+            pipes = [
+                _Pipe(output, stream, pipe)
+                for stream, pipe in [("stdout", stdout), ("stderr", stderr)]
+                if pipe is not None
+            ]
+            for pipe in pipes:
+                os.set_blocking(pipe.pipe.fileno(), False)
+                self._select_thread.add(pipe.pipe, functools.partial(self._drain, pipe))
+            self._pipes += pipes
+
+    def hand_over(self, names: Iterable[str]) -> Optional[int]:
+        """
+        Hands the pipes of the modules ``names`` over to a keeper process, which goes on writing their
+        output to their files after aw-qt exits, until they exit. Their output isn't captured here anymore.
+        Returns the pid of the keeper, None if none of the modules' output was captured.
+        Raises OSError if the keeper can't be started, the pipes are still drained here then.
+        """
+        names = set(names)
+        with self._lock:
+            pipes = [pipe for pipe in self._pipes if pipe.output.name in names]
+            if not pipes:
+                return None
+            spec = [
+                {
+                    "fd": pipe.pipe.fileno(),
+                    "module": pipe.output.name,
+                    "stream": pipe.stream,
+                    "path": pipe.output.path,
+                    "limits": pipe.output.limits(),
+                }
+                for pipe in pipes
+            ]
+            keeper = subprocess.Popen(
+                [sys.executable, "-m", "aw_qt.output"],
+                pass_fds=[pipe.pipe.fileno() for pipe in pipes],
+                stdin=subprocess.PIPE,
+                # Not stopped along with aw-qt, like by Ctrl+C in its terminal
+                start_new_session=True,
+            )
+            assert keeper.stdin is not None
+            with keeper.stdin:
+                keeper.stdin.write(json.dumps(spec).encode())
+            for pipe in pipes:
+                self._pipes.remove(pipe)
+        for pipe in pipes:
+            self._select_thread.remove(pipe.pipe, pipe.close)
+        logger.info(
+            f"Handed the output of {', '.join(sorted({p.output.name for p in pipes}))} over to pid {keeper.pid}"
+        )
+        return keeper.pid
+
+    def _drain(self, pipe: _Pipe) -> None:
+        if pipe.drain():
+            return
+        with self._lock:
+            if pipe not in self._pipes:
+                # Handed over, which stops watching it
+                return
+            self._pipes.remove(pipe)
+        self._select_thread.remove(pipe.pipe, pipe.close)
+
+
+def keep(spec: List[Dict[str, Any]]) -> None:
+    """
+    Writes the output of modules to their files until they exit, from the pipes handed over
+    by ``OutputCapture.hand_over``
+    """
+    outputs: Dict[str, ModuleOutput] = {}
+    with selectors.DefaultSelector() as selector:
+        for entry in spec:
+            output = outputs.get(entry["module"])
+            if output is None:
+                output = outputs[entry["module"]] = ModuleOutput(
+                    entry["module"], entry["path"]
+                )
+                output.set_limits(**entry["limits"])
+            pipe = _Pipe(output, entry["stream"], open(entry["fd"], "rb", buffering=0))
+            selector.register(pipe.pipe, selectors.EVENT_READ, pipe)
+        while selector.get_map():
+            for key, _ in selector.select():
+                pipe = key.data
+                if not pipe.drain():
+                    selector.unregister(pipe.pipe)
+                    pipe.close()
+    for output in outputs.values():
+        output.close()
+
+
+if __name__ == "__main__":
+    keep(json.load(sys.stdin))
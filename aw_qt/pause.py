@@ -0,0 +1,165 @@
+"""Pausing modules, so that they stop waking up the CPU without being restarted afterwards."""
+
+import os
+import sys
+import signal
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .manager import Manager
+
+logger = logging.getLogger(__name__)
+
+_CGROUP_ROOT = "/sys/fs/cgroup"
+# Upper bound on sleeping between schedule checks, so config changes are picked up
+_MAX_SCHEDULE_INTERVAL = 60.0
+
+
+def is_supported() -> bool:
+    # No SIGSTOP on Windows
+    return sys.platform != "win32"
+
+
+def parse_window(spec: str) -> Tuple[int, int]:
+    """
+    Parses a daily time window like ``"22:00-07:00"`` into its start and end in minutes
+    since midnight. Windows ending before they start end on the next day.
+    """
+    start, sep, end = spec.partition("-")
+    if not sep:
+        raise ValueError(f"Invalid time window {spec!r}, expected HH:MM-HH:MM")
+    return _parse_time(start), _parse_time(end)
+
+
+def _parse_time(text: str) -> int:
+    try:
+        hours, minutes = (int(part) for part in text.strip().split(":"))
+    except ValueError:
+        raise ValueError(f"Invalid time {text.strip()!r}, expected HH:MM")
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time {text.strip()!r}, expected HH:MM")
+    return hours * 60 + minutes
+
+
+def format_window(window: Tuple[int, int]) -> str:
+    start, end = window
+    return f"{start // 60:02}:{start % 60:02}-{end // 60:02}:{end % 60:02}"
+
+
+def in_window(window: Tuple[int, int], minute: int) -> bool:
+    start, end = window
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+def _own_cgroup(pid: int) -> Optional[str]:
+    """The cgroup v2 directory of a process, if it's the only process in it and can be frozen"""
+    try:
+        with open(f"/proc/{pid}/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    path = os.path.join(_CGROUP_ROOT, line[3:].strip().lstrip("/"))
+                    break
+            else:
+                return None
+        with open(os.path.join(path, "cgroup.procs")) as f:
+            procs = f.read().split()
+    except OSError:
+        return None
+    if procs != [str(pid)] or not os.access(
+        os.path.join(path, "cgroup.freeze"), os.W_OK
+    ):
+        # Freezing a cgroup shared with aw-qt (or other modules) would freeze them too
+        return None
+    return path
+
+
+def _signal_group(pid: int, sig: int) -> None:
+    """Signals the process group ``pid`` leads (modules get a session of their own), or only the process"""
+    if os.getpgid(pid) == pid:
+        os.killpg(pid, sig)
+    else:
+        os.kill(pid, sig)
+
+
+def freeze(pid: int) -> str:
+    """Freezes a process, returns how (``cgroup`` or ``signal``), to pass on to ``thaw``"""
+    path = _own_cgroup(pid)
+    if path is not None:
+        try:
+            with open(os.path.join(path, "cgroup.freeze"), "w") as f:
+                f.write("1")
+            return "cgroup"
+        except OSError as e:
+            logger.debug(f"Could not freeze cgroup {path}, stopping pid {pid}: {e}")
+    _signal_group(pid, signal.SIGSTOP)
+    return "signal"
+
+
+def thaw(pid: int, method: str) -> None:
+    if method == "cgroup":
+        path = _own_cgroup(pid)
+        if path is not None:
+            with open(os.path.join(path, "cgroup.freeze"), "w") as f:
+                f.write("0")
+            return
+    _signal_group(pid, signal.SIGCONT)
+
+
+class PauseScheduler:
+    def __init__(self, manager: "Manager") -> None:
+        """
+        Pauses the groups of ``manager`` when one of the windows of their ``pause_schedule`` begins,
+        and resumes them when it ends. Pausing or resuming by hand in between is left alone
+        until the next window begins or ends.
+        """
+        self.manager = manager
+        # Whether each group's schedule said to pause it at the last check
+        self._scheduled: Dict[str, bool] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="aw-qt-pause-schedule", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.check(datetime.now())
+            except Exception:
+                logger.exception("Error while checking the pause schedule")
+            now = datetime.now()
+            # Window edges are on whole minutes
+            until_next_minute = 60 - now.second - now.microsecond / 1e6
+            self._stop.wait(min(until_next_minute, _MAX_SCHEDULE_INTERVAL))
+
+    def check(self, now: datetime) -> List[str]:
+        """Pauses or resumes the groups whose schedule changed since the last check, returns their names"""
+        minute = now.hour * 60 + now.minute
+        changed = []
+        for name, group in self.manager.settings.groups.items():
+            if not group.pause_schedule:
+                self._scheduled.pop(name, None)
+                continue
+            paused = any(in_window(w, minute) for w in group.pause_schedule)
+            if paused == self._scheduled.get(name, False):
+                continue
+            self._scheduled[name] = paused
+            changed.append(name)
+            if paused:
+                logger.info(f"Pausing group {name} as scheduled")
+                self.manager.pause_group(name)
+            else:
+                logger.info(f"Resuming group {name} as scheduled")
+                self.manager.resume_group(name)
+        return changed
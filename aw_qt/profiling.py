@@ -0,0 +1,290 @@
+"""Startup profiling, enabled with ``aw-qt --profile-startup``, and tracing, enabled with ``--trace-file``."""
+
+import os
+import sys
+import json
+import logging
+import platform
+import threading
+from contextlib import contextmanager
+from importlib.abc import Loader
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How many of the slowest imports to include in the report
+REPORT_IMPORTS = 25
+# Modules are started and stopped for as long as aw-qt runs, stop tracing at some point
+MAX_TRACE_EVENTS = 100_000
+
+
+class _ImportTimer:
+    """
+    A meta path finder which doesn't find anything itself, but wraps the loaders other finders
+    return (see `_TimedLoader`), to measure how long executing each module takes.
+    """
+
+    def __init__(self) -> None:
+        # name -> (inclusive seconds, self seconds)
+        self.times: Dict[str, Tuple[float, float]] = {}
+        self._local = threading.local()
+
+    def find_spec(self, fullname: str, path: Any, target: Any = None) -> Any:
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            loader: Any = spec.loader
+            # Builtin and frozen importers are classes the import system special-cases, leave them be
+            wrappable = loader is not None and not isinstance(loader, type)
+            if wrappable and hasattr(loader, "exec_module"):
+                # Per spec: one loader instance can load many modules (like PyInstaller's FrozenImporter)
+                spec.loader = _TimedLoader(self, fullname, loader)
+            return spec
+        return None
+
+    def timed_exec(self, name: str, loader: Any, module: Any) -> None:
+        stack: List[float] = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            elapsed = perf_counter() - start
+            children = stack.pop()
+            self.times[name] = (elapsed, elapsed - children)
+            if stack:
+                stack[-1] += elapsed
+            if _tracer is not None:
+                _tracer.add(f"import {name}", "import", start, elapsed)
+
+
+class _TimedLoader(Loader):
+    """
+    Loads one module with ``loader``, timing its execution. The module gets the original loader
+    back before it's executed, so the wrapper isn't visible afterwards.
+    """
+
+    def __init__(self, timer: _ImportTimer, name: str, loader: Any) -> None:
+        self.timer = timer
+        self.name = name
+        self.loader = loader
+
+    def create_module(self, spec: Any) -> Any:
+        create_module = getattr(self.loader, "create_module", None)
+        return create_module(spec) if create_module is not None else None
+
+    def exec_module(self, module: Any) -> None:
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self.loader
+        module.__loader__ = self.loader
+        self.timer.timed_exec(self.name, self.loader, module)
+
+    def __getattr__(self, name: str) -> Any:
+        # get_code, is_package, get_resource_reader...
+        return getattr(self.loader, name)
+
+
+class _Profiler:
+    def __init__(self, imports: _ImportTimer) -> None:
+        self.start = perf_counter()
+        self.phases: List[Tuple[str, float, float]] = []
+        self.imports = imports
+        self.reported = False
+
+
+class _Tracer:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.start = perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        # Thread names by native thread id, for the trace's metadata
+        self.threads: Dict[int, str] = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        duration: float,
+        args: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        thread = threading.current_thread()
+        tid = thread.native_id or 0
+        # Complete events, timestamps in microseconds since tracing started
+        event: Dict[str, Any] = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self.start) * 1e6, 1),
+            "dur": round(duration * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            if len(self.events) >= MAX_TRACE_EVENTS:
+                self.dropped += 1
+                return
+            self.threads.setdefault(tid, thread.name)
+            self.events.append(event)
+
+    def write(self) -> None:
+        pid = os.getpid()
+        with self._lock:
+            metadata: List[Dict[str, Any]] = [
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": "aw-qt"},
+                }
+            ]
+            metadata += [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self.threads.items()
+            ]
+            trace = {
+                "traceEvents": metadata + self.events,
+                "displayTimeUnit": "ms",
+                "otherData": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpus": os.cpu_count(),
+                    "dropped_events": self.dropped,
+                },
+            }
+            # Written to a temporary file first, so a trace being written is never read half-way
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(trace, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.error(f"Could not write trace to {self.path}: {e}")
+                return
+        logger.info(f"Wrote {len(self.events)} trace events to {self.path}")
+
+
+_imports: Optional[_ImportTimer] = None
+_profiler: Optional[_Profiler] = None
+_tracer: Optional[_Tracer] = None
+
+
+def _time_imports() -> _ImportTimer:
+    global _imports
+    if _imports is None:
+        _imports = _ImportTimer()
+        sys.meta_path.insert(0, _imports)  # type: ignore[arg-type]
+    return _imports
+
+
+def enable() -> None:
+    """Starts profiling, imports from here on are timed"""
+    global _profiler
+    if _profiler is None:
+        _profiler = _Profiler(_time_imports())
+
+
+def is_enabled() -> bool:
+    return _profiler is not None
+
+
+def enable_tracing(path: str) -> None:
+    """Starts tracing, written to ``path`` by ``write_trace()`` (and ``report()``)"""
+    global _tracer
+    if _tracer is None:
+        _tracer = _Tracer(path)
+        _time_imports()
+
+
+def is_tracing() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Times a startup phase, if profiling or tracing is enabled"""
+    if _profiler is None and _tracer is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        duration = perf_counter() - start
+        if _profiler is not None:
+            _profiler.phases.append((name, start - _profiler.start, duration))
+        if _tracer is not None:
+            _tracer.add(name, "startup", start, duration)
+
+
+@contextmanager
+def span(name: str, category: str = "aw-qt", **args: Any) -> Iterator[None]:
+    """Records a span on the current thread's timeline, if tracing is enabled"""
+    if _tracer is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        _tracer.add(name, category, start, perf_counter() - start, args)
+
+
+def add_span(name: str, category: str, start: float, end: float, **args: Any) -> None:
+    """
+    Records a span measured elsewhere (``start`` and ``end`` from ``perf_counter()``),
+    like one that ends on another thread than it started.
+    """
+    if _tracer is not None:
+        _tracer.add(name, category, start, end - start, args)
+
+
+def write_trace() -> None:
+    """Writes the spans recorded so far to the trace file, if tracing is enabled"""
+    if _tracer is not None:
+        _tracer.write()
+
+
+def report() -> None:
+    """
+    Logs the phase and import timings once startup is done, and writes the trace of startup
+    (written again with everything since when aw-qt quits).
+    """
+    if _tracer is not None:
+        add_span("startup", "startup", _tracer.start, perf_counter())
+        _tracer.write()
+    if _profiler is None or _profiler.reported:
+        return
+    _profiler.reported = True
+    total = perf_counter() - _profiler.start
+
+    lines = [f"Startup profile ({total * 1000:.1f} ms since profiling started):"]
+    lines.append(f"  {'phase':40} {'start ms':>9} {'duration ms':>12}")
+    for name, start, duration in _profiler.phases:
+        lines.append(f"  {name:40} {start * 1000:9.1f} {duration * 1000:12.1f}")
+
+    times = _profiler.imports.times
+    imports_total = sum(self_time for _, self_time in times.values())
+    lines.append(
+        f"  {len(times)} modules imported in {imports_total * 1000:.1f} ms, slowest (by self time):"
+    )
+    lines.append(f"  {'module':40} {'self ms':>9} {'cumulative ms':>14}")
+    slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (inclusive, self_time) in slowest[:REPORT_IMPORTS]:
+        lines.append(f"  {name:40} {self_time * 1000:9.1f} {inclusive * 1000:14.1f}")
+
+    logger.info("\n".join(lines))
@@ -0,0 +1,123 @@
+"""
+Readiness probes, which tell when a started module can actually be used (like aw-server accepting
+requests), so that modules depending on it aren't started before that.
+"""
+
+import os
+import socket
+from time import monotonic, sleep
+from typing import Callable
+from urllib.parse import urlsplit
+
+# Timeout of a single check, the probe is retried until the module's ready_timeout
+_CHECK_TIMEOUT = 1.0
+# Checks are retried quickly at first, then backing off up to this interval
+_MIN_INTERVAL = 0.02
+_MAX_INTERVAL = 0.5
+
+
+class Probe:
+    def check(self) -> bool:
+        """Returns True if the module is ready, must not block longer than about a second"""
+        raise NotImplementedError
+
+    def wait(self, timeout: float, should_continue: Callable[[], bool]) -> bool:
+        """
+        Checks repeatedly until the probe succeeds, ``timeout`` seconds have passed,
+        or ``should_continue()`` returns False (like when the module exited). Returns True if it succeeded.
+        """
+        deadline = monotonic() + timeout
+        interval = _MIN_INTERVAL
+        while should_continue():
+            if self.check():
+                return True
+            if monotonic() + interval > deadline:
+                return False
+            sleep(interval)
+            interval = min(interval * 2, _MAX_INTERVAL)
+        return False
+
+
+class TcpProbe(Probe):
+    """Ready once a TCP connection to host:port succeeds"""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+
+    def check(self) -> bool:
+        try:
+            with socket.create_connection(
+                (self.host, self.port), timeout=_CHECK_TIMEOUT
+            ):
+                return True
+        except OSError:
+            return False
+
+    def __repr__(self) -> str:
+        return f"tcp://{self.host}:{self.port}"
+
+
+class HttpProbe(Probe):
+    """Ready once a GET of the URL returns a 2xx status"""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+
+    def check(self) -> bool:
+        # urllib pulls in http.client and email, only import it when a module is starting
+        import urllib.request  # pylint: disable=import-outside-toplevel
+        import urllib.error  # pylint: disable=import-outside-toplevel
+
+        # Modules run locally, never go through a proxy from the environment
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        try:
+            with opener.open(self.url, timeout=_CHECK_TIMEOUT) as response:
+                return 200 <= response.status < 300
+        except (urllib.error.URLError, OSError, ValueError):
+            # HTTPError (non-2xx) is a URLError
+            return False
+
+    def __repr__(self) -> str:
+        return self.url
+
+
+class FileProbe(Probe):
+    """Ready once the file exists, like a pidfile or a socket"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def check(self) -> bool:
+        return os.path.exists(self.path)
+
+    def __repr__(self) -> str:
+        return f"file://{self.path}"
+
+
+def parse_probe(spec: str) -> Probe:
+    """
+    Parses a probe spec from the config:
+
+     - ``tcp://host:port``: a TCP connection to the port succeeds
+     - ``http://host:port/path`` (or https): a GET request returns a 2xx status
+     - ``file:///path/to/file`` or an absolute path: the file exists (``~`` is expanded)
+
+    Raises ValueError for invalid specs.
+    """
+    if os.path.isabs(os.path.expanduser(spec)):
+        return FileProbe(os.path.expanduser(spec))
+    url = urlsplit(spec)
+    if url.scheme == "tcp":
+        if not url.hostname or url.port is None:
+            raise ValueError(f"Invalid TCP probe {spec!r}, expected tcp://host:port")
+        return TcpProbe(url.hostname, url.port)
+    elif url.scheme in ["http", "https"]:
+        if not url.hostname:
+            raise ValueError(f"Invalid HTTP probe {spec!r}, missing host")
+        return HttpProbe(spec)
+    elif url.scheme == "file":
+        return FileProbe(os.path.expanduser(url.path))
+    raise ValueError(
+        f"Invalid readiness probe {spec!r}, must be a tcp://, http(s):// or file:// URL or an absolute path"
+    )
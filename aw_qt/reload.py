@@ -0,0 +1,170 @@
+"""Reloading of the config file while running, applying only what changed."""
+
+import os
+import logging
+import threading
+from typing import List, Optional, Set, Tuple, TYPE_CHECKING
+
+from .config import AwQtSettings, get_config_path
+from .hotplug import DirectoryWatcher
+
+if TYPE_CHECKING:
+    from .manager import Manager
+
+logger = logging.getLogger(__name__)
+
+# Settings of the [aw-qt] table which only take effect when aw-qt is restarted
+_RESTART_REQUIRED = ["status_log_interval", "event_log"]
+_GLOBAL_SETTINGS = [
+    "shutdown_timeout",
+    "sample_interval",
+    "sample_history",
+    "hotplug",
+    "hotplug_poll_interval",
+    "groups",
+    "event_log_max_bytes",
+    "event_log_backup_count",
+    "event_log_flush_interval",
+] + _RESTART_REQUIRED
+
+
+class ConfigDiff:
+    def __init__(
+        self, old: AwQtSettings, new: AwQtSettings, autostart: bool = True
+    ) -> None:
+        """
+        What changed between two settings, as far as aw-qt can apply it while running.
+        Changes to ``autostart_modules`` are ignored if ``autostart`` is False.
+        """
+        self.autostart_added: List[str] = []
+        self.autostart_removed: List[str] = []
+        if autostart:
+            self.autostart_added = [
+                name
+                for name in new.autostart_modules
+                if name not in old.autostart_modules
+            ]
+            self.autostart_removed = [
+                name
+                for name in old.autostart_modules
+                if name not in new.autostart_modules
+            ]
+        self.settings_changed = [
+            key for key in _GLOBAL_SETTINGS if getattr(old, key) != getattr(new, key)
+        ]
+        # Filled in once applied, per-module settings depend on which modules are discovered
+        self.modules_changed: List[str] = []
+
+    def __bool__(self) -> bool:
+        return any(
+            [
+                self.autostart_added,
+                self.autostart_removed,
+                self.settings_changed,
+                self.modules_changed,
+            ]
+        )
+
+    def __str__(self) -> str:
+        parts = []
+        if self.autostart_added:
+            parts.append(f"autostarting {', '.join(self.autostart_added)}")
+        if self.autostart_removed:
+            parts.append(f"no longer autostarting {', '.join(self.autostart_removed)}")
+        if self.settings_changed:
+            parts.append(f"changed {', '.join(self.settings_changed)}")
+        if self.modules_changed:
+            parts.append(f"reconfigured {', '.join(self.modules_changed)}")
+        return "; ".join(parts) or "no changes"
+
+
+class ConfigReloader:
+    def __init__(
+        self, manager: "Manager", autostart_override: Optional[List[str]] = None
+    ) -> None:
+        """
+        Applies changes to the config file to ``manager``. If the modules to autostart were given
+        on the command line (``autostart_override``), changes to ``autostart_modules`` are ignored.
+        """
+        self.manager = manager
+        self.autostart_override = autostart_override
+        self.path = get_config_path()
+        self._lock = threading.Lock()
+        self._file = self._stat()
+        self._watcher: Optional[DirectoryWatcher] = None
+
+    def start(self) -> None:
+        """Watches the config file in the background, reloading it whenever it changes"""
+        filename = os.path.basename(self.path)
+        self._watcher = DirectoryWatcher(
+            self._on_change,
+            self.manager.settings.hotplug_poll_interval,
+            match=lambda name: name == filename,
+        )
+        self._watcher.start([os.path.dirname(self.path)])
+
+    def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _on_change(self, changed: Optional[Set[str]]) -> None:
+        # Polling calls this whether the file changed or not
+        if self._stat() == self._file:
+            return
+        try:
+            self.reload()
+        except ValueError:
+            # Already logged
+            pass
+
+    def reload(self) -> ConfigDiff:
+        """
+        Loads the config file and applies what changed. Raises ValueError (after logging it)
+        if the config is invalid, in which case nothing is changed.
+        """
+        with self._lock:
+            self._file = self._stat()
+            try:
+                settings = AwQtSettings(self.manager.testing)
+            except Exception as e:
+                # tomlkit's parse errors, invalid values, missing tables...
+                logger.error(
+                    f"Not applying changes to {self.path}, keeping the current config: {e}"
+                )
+                raise ValueError(f"Invalid config: {e}") from e
+            diff = ConfigDiff(
+                self.manager.settings,
+                settings,
+                autostart=self.autostart_override is None,
+            )
+            diff.modules_changed = self.manager.reconfigure(settings)
+            logger.info(f"Reloaded {self.path}: {diff}")
+            for key in diff.settings_changed:
+                if key in _RESTART_REQUIRED:
+                    logger.warning(f"{key} only takes effect when aw-qt is restarted")
+            self._apply_autostart(diff)
+            return diff
+
+    def _apply_autostart(self, diff: ConfigDiff) -> None:
+        for name in diff.autostart_removed:
+            if self.manager.activator is not None:
+                self.manager.activator.stop_listening(name)
+            module = self.manager.get_module(name)
+            if module is not None and module.started:
+                logger.info(f"Stopping {name}, it was removed from autostart_modules")
+                module.stop()
+        to_start = []
+        for name in diff.autostart_added:
+            module = self.manager.get_module(name)
+            if module is None or not module.started:
+                to_start.append(name)
+        if to_start:
+            self.manager.autostart(to_start)
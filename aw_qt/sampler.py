@@ -0,0 +1,185 @@
+"""Resource usage sampling of module processes, from procfs (so Linux only)."""
+import os
+import sys
+import logging
+import threading
+from collections import deque
+from time import monotonic
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    from .manager import Module
+
+logger = logging.getLogger(__name__)
+
+_PROC = "/proc"
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class Sample(NamedTuple):
+    time: float  # monotonic
+    pid: int
+    cpu_percent: float  # of one core, since the previous sample of the same process
+    rss: int  # bytes
+    fds: int
+    threads: int
+
+
+class Usage(NamedTuple):
+    """Latest and peak usage of a module's current process"""
+
+    current: Sample
+    peak_cpu_percent: float
+    peak_rss: int
+
+
+def is_supported() -> bool:
+    return sys.platform.startswith("linux") and os.path.isdir(f"{_PROC}/self")
+
+
+def _read_proc(pid: int) -> Tuple[int, int, int, int]:
+    """Returns (cpu ticks, rss in bytes, open fds, threads) of a process"""
+    with open(f"{_PROC}/{pid}/stat", "rb") as f:
+        stat = f.read()
+    # The command name is in parentheses and may contain spaces, the other fields follow it.
+    # utime, stime and num_threads are fields 14, 15 and 20 in proc(5), the name is field 2.
+    fields = stat[stat.rindex(b")") + 2:].split()
+    ticks = int(fields[11]) + int(fields[12])
+    threads = int(fields[17])
+    with open(f"{_PROC}/{pid}/statm", "rb") as f:
+        rss = int(f.read().split()[1]) * _PAGE_SIZE
+    fds = len(os.listdir(f"{_PROC}/{pid}/fd"))
+    return ticks, rss, fds, threads
+
+
+def format_bytes(n: int) -> str:
+    for unit in ["B", "KB", "MB"]:
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n //= 1024
+    return f"{n:.0f} GB"
+
+
+class ResourceSampler:
+    def __init__(self, interval: float = 10.0, history: int = 360) -> None:
+        """
+        Samples CPU, memory, fd and thread usage of running modules every ``interval`` seconds,
+        keeping the last ``history`` samples per module. An interval of 0 disables sampling.
+        """
+        self.interval = interval
+        self.history = history
+        self._samples: Dict[str, Deque[Sample]] = {}
+        # Latest cpu ticks per pid, to compute CPU usage from
+        self._ticks: Dict[int, int] = {}
+        # (pid, peak cpu percent, peak rss) per module name
+        self._peaks: Dict[str, Tuple[int, float, int]] = {}
+        # Functions called with each module and its new sample, from the sampler thread
+        self.listeners: List[Callable[["Module", Sample], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._get_modules: Optional[Callable[[], List["Module"]]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 and is_supported()
+
+    def start(self, get_modules: Callable[[], List["Module"]]) -> None:
+        self._get_modules = get_modules
+        if not self.enabled:
+            logger.debug("Resource sampling is disabled or not supported")
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(get_modules,), name="aw-qt-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def configure(self, interval: float, history: int) -> None:
+        """Changes the interval and history while running, starting or stopping sampling as needed"""
+        was_enabled = self.enabled
+        self.interval = interval
+        self.history = history
+        if self.enabled and not was_enabled and self._get_modules is not None:
+            self.start(self._get_modules)
+
+    def _run(self, get_modules: Callable[[], List["Module"]]) -> None:
+        while not self._stop.wait(self.interval):
+            if not self.enabled or self._thread is not threading.current_thread():
+                # Disabled, or replaced by a new thread (see `configure`)
+                return
+            try:
+                self.sample(get_modules())
+            except Exception:
+                logger.exception("Error while sampling module resource usage")
+
+    def sample(self, modules: List["Module"]) -> None:
+        """Takes one sample of every running module in ``modules``"""
+        for module in modules:
+            pid = module.pid
+            if pid is None:
+                continue
+            try:
+                ticks, rss, fds, threads = _read_proc(pid)
+            except (OSError, ValueError, IndexError):
+                # Exited in the meantime
+                continue
+            now = monotonic()
+
+            samples = self._samples.get(module.name)
+            if samples is None or samples.maxlen != self.history:
+                samples = self._samples[module.name] = deque(
+                    samples or (), maxlen=self.history
+                )
+            cpu_percent = 0.0
+            if samples and samples[-1].pid == pid:
+                last = samples[-1]
+                last_ticks = self._ticks.get(pid, ticks)
+                if now > last.time:
+                    cpu_percent = (
+                        100 * (ticks - last_ticks) / _CLK_TCK / (now - last.time)
+                    )
+            self._ticks[pid] = ticks
+            sample = Sample(now, pid, cpu_percent, rss, fds, threads)
+            samples.append(sample)
+
+            peak_pid, peak_cpu, peak_rss = self._peaks.get(module.name, (pid, 0.0, 0))
+            if peak_pid != pid:
+                peak_cpu, peak_rss = 0.0, 0
+            self._peaks[module.name] = (
+                pid,
+                max(peak_cpu, cpu_percent),
+                max(peak_rss, rss),
+            )
+
+            for listener in self.listeners:
+                listener(module, sample)
+
+        # Forget processes that are gone
+        alive = {module.pid for module in modules}
+        for pid in [pid for pid in self._ticks if pid not in alive]:
+            del self._ticks[pid]
+
+    def samples(self, module: "Module") -> List[Sample]:
+        """The recent samples of a module, oldest first"""
+        return list(self._samples.get(module.name, ()))
+
+    def usage(self, module: "Module") -> Optional[Usage]:
+        """Latest and peak usage of a running module, if it has been sampled"""
+        samples = self._samples.get(module.name)
+        pid = module.pid
+        if not samples or pid is None or samples[-1].pid != pid:
+            return None
+        _, peak_cpu, peak_rss = self._peaks[module.name]
+        return Usage(samples[-1], peak_cpu, peak_rss)
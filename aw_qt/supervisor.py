@@ -0,0 +1,110 @@
+import logging
+import random
+from collections import deque
+from time import monotonic
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .manager import Manager, Module
+
+logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """
+    Restarts modules that stop unexpectedly according to their restart policy, with jittered exponential
+    backoff, giving up on those that crash ``restart_limit`` times within ``restart_window`` seconds.
+    Call ``process_exits()`` when the manager's exit notifier fires, and ``restart(module)`` after each returned delay.
+    """
+
+    def __init__(self, manager: Manager) -> None:
+        self.manager = manager
+        # Monotonic times of recent unexpected exits, per module name
+        self._exits: Dict[str, Deque[float]] = {}
+        # The start time of the process a scheduled restart is replacing, per module name
+        self._scheduled: Dict[str, Optional[float]] = {}
+
+    def process_exits(self) -> List[Tuple[Module, Optional[float]]]:
+        """
+        Handles the modules that stopped unexpectedly since the last call.
+
+        Returns (module, delay) pairs: ``restart(module)`` should be called after ``delay`` seconds,
+        or if delay is None the module stays stopped (the user should probably be told about it).
+        """
+        decisions = []
+        for module in self.manager.handle_exits():
+            returncode = module.returncode
+            started_at = module.started_at
+            logger.warning(
+                f"Module {module.name} quit unexpectedly with exit code {returncode}"
+            )
+            # Clean up after the dead process, it was already reaped
+            module.reset()
+            delay = self._decide(module, returncode)
+            if delay is not None:
+                self._scheduled[module.name] = started_at
+            decisions.append((module, delay))
+        return decisions
+
+    def start_failed(self, module: Module) -> Optional[float]:
+        """
+        Handles a module that couldn't be (re)started (like when spawning it raised OSError) as a crash.
+        Returns the delay after which ``restart(module)`` should be called, or None if it stays stopped.
+        """
+        delay = self._decide(module, None)
+        if delay is not None:
+            self._scheduled[module.name] = module.started_at
+        return delay
+
+    def _decide(self, module: Module, returncode: Optional[int]) -> Optional[float]:
+        settings = self.manager.settings.module(module.name)
+        failure = returncode != 0
+        if settings.restart == "never" or (
+            settings.restart == "on-failure" and not failure
+        ):
+            return None
+
+        now = monotonic()
+        exits = self._exits.setdefault(module.name, deque())
+        exits.append(now)
+        while exits and exits[0] < now - settings.restart_window:
+            exits.popleft()
+
+        if len(exits) >= settings.restart_limit:
+            logger.error(
+                f"Module {module.name} quit {len(exits)} times within {settings.restart_window:.0f}s, giving up"
+            )
+            del self._exits[module.name]
+            module.mark_failed()
+            return None
+
+        # Equal jitter: between half and all of the exponential delay, so that modules
+        # which crashed together (like when the server goes down) don't restart in lockstep
+        delay = min(
+            settings.restart_delay_max,
+            settings.restart_delay * 2 ** (len(exits) - 1),
+        )
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        logger.info(f"Restarting module {module.name} in {delay:.1f}s")
+        return delay
+
+    def restart(self, module: Module) -> None:
+        """Restarts a module after a delay returned by ``process_exits``"""
+        if module.name not in self._scheduled:
+            return
+        started_at = self._scheduled.pop(module.name)
+        if module.started or module.started_at != started_at:
+            # Started or stopped by someone else in the meantime
+            logger.debug(f"Not restarting {module.name}, its state changed")
+            return
+        current = self.manager.get_module(module.name, module.type)
+        if current is None:
+            logger.info(f"Not restarting {module.name}, it was uninstalled")
+            return
+        if current is not module:
+            logger.info(f"Module {module.name} was replaced by {current.path}")
+            if current.started:
+                return
+        self.manager.events.record(
+            "restarted", current.name, crashes=len(self._exits.get(current.name, []))
+        )
+        current.start(self.manager.testing)
@@ -3,7 +3,8 @@ import logging
 import signal
 import os
 import subprocess
-import webbrowser
+import threading
+from time import monotonic, perf_counter
 from typing import Any, Optional, Dict
 from pathlib import Path
 
@@ -16,18 +17,19 @@ from PyQt6.QtWidgets import (
     QWidget,
     QPushButton,
 )
-import getpass
-import time
-from PyQt6.QtGui import QIcon
+from PyQt6.QtGui import QIcon, QAction
 
 import aw_core
 
-from .manager import Manager, Module
+from . import profiling
+from .manager import Manager, Module, RUNNING_STATES
+from .sampler import format_bytes
+from .supervisor import Supervisor
+from .wakeup import Waker
 
 logger = logging.getLogger(__name__)
 
 
-
 def get_env() -> Dict[str, str]:
     """
     Necessary for xdg-open to work properly when PyInstaller overrides LD_LIBRARY_PATH
@@ -51,6 +53,8 @@ def open_url(url: str) -> None:
         env = get_env()
         subprocess.Popen(["xdg-open", url], env=env)
     else:
+        import webbrowser  # pylint: disable=import-outside-toplevel
+
         webbrowser.open(url)
 
 
@@ -76,6 +80,11 @@ def open_dir(d: str) -> None:
 
 
 def check_user_switch(manager: Manager) -> None:
+    # Windows only, and only needed once the tray is up
+    import getpass  # pylint: disable=import-outside-toplevel
+    import time  # pylint: disable=import-outside-toplevel
+    import win32com.client  # pylint: disable=import-outside-toplevel
+
     wmi = win32com.client.GetObject('winmgmts:')
     for session in wmi.InstancesOf('Win32_ComputerSystem'):
         if session.UserName is not None:
@@ -87,10 +96,84 @@ def check_user_switch(manager: Manager) -> None:
                 logger.warning("Mismatch detected. Exiting...")
                 exit(manager)
 
+class _LogLoader(QtCore.QObject):
+    """Reads a module's log in a worker thread, and delivers it to the GUI thread through a signal"""
+
+    loaded = QtCore.pyqtSignal(str)
+
+    def load(self, module: Module, testing: bool) -> None:
+        try:
+            log = module.read_log(testing)
+        except OSError as e:
+            log = f"Could not read log: {e}"
+        try:
+            self.loaded.emit(log)
+        except RuntimeError:
+            # The dialog was closed (and deleted) before the log was loaded
+            pass
+
+
+class SignalWakeup(QtCore.QObject):
+    """
+    Lets Python signal handlers (like the one for Ctrl+C) run while Qt's event loop is waiting, without
+    a timer waking it up all the time. Has to be created in the main thread.
+    """
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self._waker = Waker()
+        self._previous_fd = signal.set_wakeup_fd(
+            self._waker.wake_fileno(), warn_on_full_buffer=False
+        )
+        self._notifier = QtCore.QSocketNotifier(
+            self._waker.fileno(), QtCore.QSocketNotifier.Type.Read, self  # type: ignore[call-overload]
+        )
+        self._notifier.activated.connect(self._drain)
+
+    def _drain(self) -> None:
+        # Python runs the handlers of the signals now that it has control
+        self._waker.drain()
+
+    def close(self) -> None:
+        signal.set_wakeup_fd(self._previous_fd)
+        self._notifier.setEnabled(False)
+        self._waker.close()
+
+
+class WakeupCounter(QtCore.QObject):
+    """Counts how often the GUI thread's event loop wakes up, to check that an idle aw-qt stays idle"""
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self.count = 0
+        self.started = monotonic()
+        dispatcher = QtCore.QAbstractEventDispatcher.instance()
+        assert dispatcher is not None, "Needs a QCoreApplication"
+        dispatcher.awake.connect(self._on_awake)
+
+    def _on_awake(self) -> None:
+        self.count += 1
+
+    def reset(self) -> None:
+        self.count = 0
+        self.started = monotonic()
+
+    def rate(self) -> float:
+        """Wakeups per second since it was created or reset"""
+        return self.count / max(monotonic() - self.started, 1e-9)
+
+
+class _ModelBridge(QtCore.QObject):
+    """Forwards the manager's module state events, which may come from any thread, to the GUI thread"""
+
+    module_event = QtCore.pyqtSignal(str, object)
+
+
 class TrayIcon(QSystemTrayIcon):
     def __init__(
         self,
         manager: Manager,
+        supervisor: Supervisor,
         icon: QIcon,
         parent: Optional[QWidget] = None,
         testing: bool = False,
@@ -101,13 +184,20 @@ class TrayIcon(QSystemTrayIcon):
         self.setToolTip("ActivityWatch" + (" (testing)" if testing else ""))
 
         self.manager = manager
+        self.supervisor = supervisor
         self.testing = testing
 
         self.root_url = f"http://localhost:{5666 if self.testing else 5600}"
         self.activated.connect(self.on_activated)
 
+        self._module_actions: Dict[Module, QAction] = {}
         self._build_rootmenu()
 
+        # Update only the menu items of modules that changed, instead of polling all of them
+        self._model_bridge = _ModelBridge(self)
+        self._model_bridge.module_event.connect(self._on_module_event)
+        self.manager.model.subscribe(self._model_bridge.module_event.emit)
+
     def on_activated(self, reason: QSystemTrayIcon.ActivationReason) -> None:
         if reason == QSystemTrayIcon.ActivationReason.DoubleClick:
             open_webui(self.root_url)
@@ -126,8 +216,14 @@ class TrayIcon(QSystemTrayIcon):
         menu.addSeparator()
 
         modulesMenu = menu.addMenu("Modules")
+        assert modulesMenu is not None
         self._build_modulemenu(modulesMenu)
 
+        # Groups can change when the config is reloaded, so the menu is filled when it's opened
+        pauseMenu = menu.addMenu("Pause")
+        assert pauseMenu is not None
+        pauseMenu.aboutToShow.connect(lambda: self._build_pausemenu(pauseMenu))
+
         menu.addSeparator()
         menu.addAction(
             "Open log folder", lambda: open_dir(aw_core.dirs.get_log_dir(None))
@@ -150,79 +246,222 @@ class TrayIcon(QSystemTrayIcon):
         def show_module_failed_dialog(module: Module) -> None:
             box = QMessageBox(self._parent)
             box.setIcon(QMessageBox.Icon.Warning)
-            box.setText(f"Module {module.name} quit unexpectedly")
-            box.setDetailedText(module.read_log(self.testing))
+            if module.failed:
+                box.setText(
+                    f"Module {module.name} quit unexpectedly too many times, and won't be restarted automatically"
+                )
+            else:
+                box.setText(f"Module {module.name} quit unexpectedly")
+            # Reading the log does disk IO, don't block the GUI on it
+            box.setDetailedText("Loading log...")
+            loader = _LogLoader(box)
+            loader.loaded.connect(box.setDetailedText)
+            threading.Thread(
+                target=loader.load, args=(module, self.testing), daemon=True
+            ).start()
 
             restart_button = QPushButton("Restart", box)
-            restart_button.clicked.connect(module.start)
+            restart_button.clicked.connect(lambda: start_module(module))
             box.addButton(restart_button, QMessageBox.ButtonRole.AcceptRole)
             box.setStandardButtons(QMessageBox.StandardButton.Cancel)
 
             box.show()
 
-        def rebuild_modules_menu() -> None:
-            for action in modulesMenu.actions():
-                if action.isEnabled():
-                    module: Module = action.data()
-                    alive = module.is_alive()
-                    action.setChecked(alive)
-                    # print(module.text(), alive)
-
-            # TODO: Do it in a better way, singleShot isn't pretty...
-            QtCore.QTimer.singleShot(2000, rebuild_modules_menu)
-
-        QtCore.QTimer.singleShot(2000, rebuild_modules_menu)
+        def refresh_module_titles() -> None:
+            for module, action in self._module_actions.items():
+                action.setText(self._module_title(module))
+
+        # Checked states are kept up to date by model events, but the resource usage in
+        # the titles changes all the time, so it's only refreshed when the menu is opened
+        modulesMenu.aboutToShow.connect(refresh_module_titles)
+
+        # An exception escaping a slot aborts the whole process with PyQt6
+        def start_module(module: Module) -> None:
+            try:
+                module.start(self.testing)
+            except Exception:
+                logger.exception(f"Failed to start module {module.name}")
+                handle_decision(module, self.supervisor.start_failed(module))
+
+        def restart_module(module: Module) -> None:
+            try:
+                self.supervisor.restart(module)
+            except Exception:
+                logger.exception(f"Failed to restart module {module.name}")
+                handle_decision(module, self.supervisor.start_failed(module))
+
+        def handle_decision(module: Module, delay: Optional[float]) -> None:
+            if delay is None:
+                show_module_failed_dialog(module)
+            else:
+                QtCore.QTimer.singleShot(
+                    int(delay * 1000), lambda module=module: restart_module(module)
+                )
 
         def check_module_status() -> None:
-            unexpected_exits = self.manager.get_unexpected_stops()
-            if unexpected_exits:
-                for module in unexpected_exits:
-                    show_module_failed_dialog(module)
-                    module.stop()
-
-            # TODO: Do it in a better way, singleShot isn't pretty...
-            QtCore.QTimer.singleShot(2000, rebuild_modules_menu)
+            for module, delay in self.supervisor.process_exits():
+                handle_decision(module, delay)
 
-        QtCore.QTimer.singleShot(2000, check_module_status)
+        # Woken up by the manager's exit notifier whenever a module process exits
+        self._exit_notifier = QtCore.QSocketNotifier(
+            self.manager.exit_notifier.fileno(), QtCore.QSocketNotifier.Type.Read, self  # type: ignore[call-overload]
+        )
+        self._exit_notifier.activated.connect(check_module_status)
 
     def _build_modulemenu(self, moduleMenu: QMenu) -> None:
         moduleMenu.clear()
-
-        def add_module_menuitem(module: Module) -> None:
-            title = module.name
-            ac = moduleMenu.addAction(title, lambda: module.toggle(self.testing))
-
-            ac.setData(module)
-            ac.setCheckable(True)
-            ac.setChecked(module.is_alive())
+        self._modules_menu = moduleMenu
+        self._module_actions.clear()
 
         for location, modules in [
             ("bundled", self.manager.modules_bundled),
             ("system", self.manager.modules_system),
         ]:
             header = moduleMenu.addAction(location)
+            assert header is not None
             header.setEnabled(False)
 
             for module in sorted(modules, key=lambda m: m.name):
-                add_module_menuitem(module)
+                self._add_module_action(module)
+
+    def _build_pausemenu(self, pauseMenu: QMenu) -> None:
+        pauseMenu.clear()
+        for name in sorted(self.manager.settings.groups):
+            ac = pauseMenu.addAction(name)
+            assert ac is not None
+            ac.setCheckable(True)
+            ac.setChecked(name in self.manager.paused_groups)
+            ac.triggered.connect(
+                lambda checked, name=name: self._toggle_group(name, checked)
+            )
+        if pauseMenu.isEmpty():
+            empty = pauseMenu.addAction("No groups in the config")
+            assert empty is not None
+            empty.setEnabled(False)
+
+    def _toggle_group(self, name: str, pause: bool) -> None:
+        if pause:
+            self.manager.pause_group(name)
+        else:
+            self.manager.resume_group(name)
+
+    def _add_module_action(self, module: Module) -> None:
+        """Inserts a menu item for the module, in name order within its section"""
+        menu = self._modules_menu
+        actions = menu.actions()
+        if not any(not a.isEnabled() and a.text() == module.type for a in actions):
+            logger.warning(f"Unknown module type {module.type} of {module.name}")
+            return
+        # The items of a section are between its header and the next one
+        in_section = False
+        before: Optional[QAction] = None
+        for action in actions:
+            if not action.isEnabled():
+                if in_section:
+                    before = action
+                    break
+                in_section = action.text() == module.type
+            elif in_section and action.data().name > module.name:
+                before = action
+                break
+
+        ac = QAction(self._module_title(module), menu)
+        ac.setData(module)
+        ac.setCheckable(True)
+        ac.setChecked(module.state in RUNNING_STATES)
+        ac.triggered.connect(lambda: self._toggle_module(module))
+        menu.insertAction(before, ac)  # type: ignore[arg-type]
+        self._module_actions[module] = ac
+
+    def _toggle_module(self, module: Module) -> None:
+        try:
+            module.toggle(self.testing)
+        except Exception:
+            logger.exception(f"Failed to toggle module {module.name}")
+        # Qt already flipped the checkmark, undo that if the toggle didn't work out
+        self._module_actions[module].setChecked(module.state in RUNNING_STATES)
+
+    def _on_module_event(self, event: str, module: Module) -> None:
+        if event == "added":
+            if module not in self._module_actions:
+                self._add_module_action(module)
+        elif event == "removed":
+            action = self._module_actions.pop(module, None)
+            if action is not None:
+                self._modules_menu.removeAction(action)
+        elif event == "changed":
+            action = self._module_actions.get(module)
+            if action is not None:
+                action.setChecked(module.state in RUNNING_STATES)
+                action.setText(self._module_title(module))
+
+    def _module_title(self, module: Module) -> str:
+        if module.state == "starting":
+            return f"{module.name}  (starting...)"
+        if module.state == "paused":
+            return f"{module.name}  (paused)"
+        usage = self.manager.sampler.usage(module)
+        if usage is None:
+            return module.name
+        current = usage.current
+        return f"{module.name}  ({current.cpu_percent:.1f}% CPU, {format_bytes(current.rss)}, peak {format_bytes(usage.peak_rss)})"
 
 
 def exit(manager: Manager) -> None:
     # TODO: Do cleanup actions
-    # TODO: Save state for resume
+    # Modules are only left running for the next aw-qt if it was detached (see Manager.detach)
     print("Shutdown initiated, stopping all services...")
-    manager.stop_all()
+    killed = manager.stop_all()
+    if killed:
+        print(f"Killed modules that didn't stop in time: {', '.join(m.name for m in killed)}")
     # Terminate entire process group, just in case.
     # os.killpg(0, signal.SIGINT)
 
     QApplication.quit()
 
 
-def run(manager: Manager, testing: bool = False) -> Any:
+def create_trayicon(
+    manager: Manager,
+    supervisor: Supervisor,
+    parent: QWidget,
+    testing: bool = False,
+) -> TrayIcon:
+    """Shows the tray icon, with the timers it runs in the GUI thread"""
+    if sys.platform == "darwin":
+        icon = QIcon("icons:black-monochrome-logo.png")
+        # Allow macOS to use filters for changing the icon's color
+        icon.setIsMask(True)
+    else:
+        icon = QIcon("icons:logo.png")
+
+    with profiling.phase("create trayicon"):
+        trayIcon = TrayIcon(manager, supervisor, icon, parent, testing=testing)
+        trayIcon.show()
+
+    def periodic_check():
+        check_user_switch(manager)
+
+    if sys.platform == "win32":
+        # Kept alive by its parent
+        user_switch_timer = QtCore.QTimer(trayIcon)
+        user_switch_timer.timeout.connect(periodic_check)
+        user_switch_timer.start(10000)
+
+    return trayIcon
+
+
+def run(
+    manager: Manager,
+    supervisor: Supervisor,
+    testing: bool = False,
+    count_wakeups: bool = False,
+) -> Any:
     logger.info("Creating trayicon...")
+    setup_start = perf_counter()
     # print(QIcon.themeSearchPaths())
 
-    app = QApplication(sys.argv)
+    with profiling.phase("create QApplication"):
+        app = QApplication(sys.argv)
 
     # This is needed for the icons to get picked up with PyInstaller
     scriptdir = Path(__file__).parent
@@ -248,9 +487,8 @@ def run(manager: Manager, testing: bool = False) -> Any:
     # Ensure cleanup happens on SIGTERM
     signal.signal(signal.SIGTERM, lambda *args: exit(manager))
 
-    timer = QtCore.QTimer()
-    timer.start(100)  # You may change this if you wish.
-    timer.timeout.connect(lambda: None)  # Let the interpreter run each 500 ms.
+    signal_wakeup = SignalWakeup(app)
+    wakeup_counter = WakeupCounter(app) if count_wakeups else None
 
     # root widget
     widget = QWidget()
@@ -263,28 +501,17 @@ def run(manager: Manager, testing: bool = False) -> Any:
         )
         sys.exit(1)
 
-    if sys.platform == "darwin":
-        icon = QIcon("icons:black-monochrome-logo.png")
-        # Allow macOS to use filters for changing the icon's color
-        icon.setIsMask(True)
-    else:
-        icon = QIcon("icons:logo.png")
-    def periodic_check():
-        check_user_switch(manager)
-
-
-    if sys.platform == "win32":
-        import win32com.client
-        user_switch_timer = QtCore.QTimer()
-        user_switch_timer.timeout.connect(periodic_check)
-        user_switch_timer.start(10000)
-
-
-    trayIcon = TrayIcon(manager, icon, widget, testing=testing)
-    trayIcon.show()
-
+    create_trayicon(manager, supervisor, widget, testing=testing)
     QApplication.setQuitOnLastWindowClosed(False)
 
     logger.info("Initialized aw-qt and trayicon successfully")
+    profiling.add_span("set up trayicon", "startup", setup_start, perf_counter())
+    profiling.report()
     # Run the application, blocks until quit
-    return app.exec()
+    error_code = app.exec()
+    signal_wakeup.close()
+    if wakeup_counter is not None:
+        logger.info(
+            f"The event loop woke up {wakeup_counter.count} times in {monotonic() - wakeup_counter.started:.0f}s ({wakeup_counter.rate():.2f}/s)"
+        )
+    return error_code
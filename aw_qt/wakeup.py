@@ -0,0 +1,114 @@
+"""
+Waking up threads (and event loops) blocked in ``select``.
+Stdlib only, since the forkserver uses it too.
+"""
+
+import socket
+import selectors
+import threading
+from typing import Any, Callable, List, Optional
+
+
+class Waker:
+    """A socket that becomes readable on ``wake()``, to be selected on along with other files"""
+
+    def __init__(self) -> None:
+        # A socketpair rather than a pipe, since only sockets can be selected on Windows
+        self._rsock, self._wsock = socket.socketpair()
+        self._rsock.setblocking(False)
+        self._wsock.setblocking(False)
+
+    def fileno(self) -> int:
+        return self._rsock.fileno()
+
+    def wake_fileno(self) -> int:
+        """The descriptor ``wake()`` writes to, like for ``signal.set_wakeup_fd``"""
+        return self._wsock.fileno()
+
+    def wake(self) -> None:
+        try:
+            self._wsock.send(b"\0")
+        except BlockingIOError:
+            # The socket buffer is full, so the reader will wake up anyway
+            pass
+        except OSError:
+            # Closed
+            pass
+
+    def drain(self) -> None:
+        """Reads all pending wakeups, so that the socket isn't readable anymore"""
+        try:
+            while self._rsock.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self) -> None:
+        self._rsock.close()
+        self._wsock.close()
+
+
+class SelectThread:
+    """
+    Calls a callback whenever one of the watched files becomes readable, all of them
+    from a single thread blocking in ``select``, started once the first file is added.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._waker = Waker()
+        self._lock = threading.Lock()
+        # Changes to the watched files, made by the thread the next time it wakes up
+        self._changes: List[Callable[[selectors.BaseSelector], None]] = []
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, fileobj: Any, callback: Callable[[], None]) -> None:
+        """Calls ``callback`` from the thread whenever ``fileobj`` is readable, until it's removed"""
+
+        def change(selector: selectors.BaseSelector) -> None:
+            selector.register(fileobj, selectors.EVENT_READ, callback)
+
+        self._change(change)
+
+    def remove(self, fileobj: Any, then: Optional[Callable[[], None]] = None) -> None:
+        """Stops watching ``fileobj``, then calls ``then`` (like to close it) from the thread"""
+
+        def change(selector: selectors.BaseSelector) -> None:
+            selector.unregister(fileobj)
+            if then is not None:
+                then()
+
+        self._change(change)
+
+    def _change(self, change: Callable[[selectors.BaseSelector], None]) -> None:
+        if threading.current_thread() is self._thread:
+            # From a callback
+            assert self._selector is not None
+            change(self._selector)
+            return
+        with self._lock:
+            self._changes.append(change)
+            if self._thread is None:
+                self._selector = selectors.DefaultSelector()
+                self._selector.register(self._waker, selectors.EVENT_READ)
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+        self._waker.wake()
+
+    def _run(self) -> None:
+        assert self._selector is not None
+        selector = self._selector
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj is self._waker:
+                    self._waker.drain()
+                    with self._lock:
+                        changes, self._changes = self._changes, []
+                    for change in changes:
+                        change(selector)
+                elif selector.get_map().get(key.fd) is key:
+                    # Not removed since select() returned
+                    key.data()
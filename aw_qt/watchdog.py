@@ -0,0 +1,149 @@
+"""Watchdog which recycles (gracefully restarts) modules that use too much memory or CPU for too long."""
+
+import logging
+import threading
+from collections import deque
+from time import monotonic, time
+from typing import Deque, Dict, List, NamedTuple, Optional, TYPE_CHECKING
+
+from .sampler import Sample, format_bytes
+
+if TYPE_CHECKING:
+    from .config import ModuleSettings
+    from .manager import Manager, Module
+
+logger = logging.getLogger(__name__)
+
+# RSS has to drop below this fraction of max_rss to no longer count as above it
+_RSS_HYSTERESIS = 0.9
+# How many recycles to remember per module
+_MAX_RECORDS = 100
+
+
+class Recycle(NamedTuple):
+    time: float  # unix time
+    module: str
+    pid: int
+    reason: str
+
+
+class _ModuleState:
+    def __init__(self) -> None:
+        self.pid: Optional[int] = None
+        # Monotonic time since which the RSS has been above max_rss
+        self.rss_over_since: Optional[float] = None
+        # Monotonic times of recent recycles
+        self.recycled_at: Deque[float] = deque()
+        self.limit_logged = False
+
+
+class Watchdog:
+    def __init__(self, manager: "Manager") -> None:
+        """Recycles the modules of ``manager``, add ``check`` to the sampler's listeners to enable it"""
+        self.manager = manager
+        self.records: Deque[Recycle] = deque(maxlen=_MAX_RECORDS)
+        self._states: Dict[str, _ModuleState] = {}
+        # Modules being restarted right now
+        self._recycling: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def check(self, module: "Module", sample: Sample) -> None:
+        """Checks a new sample of a module, called from the sampler thread"""
+        settings = self.manager.settings.module(module.name)
+        if settings.max_rss is None and settings.max_cpu_percent is None:
+            return
+        if module.paused:
+            # Recycling would resume it, and it uses no CPU anyway
+            return
+        state = self._states.setdefault(module.name, _ModuleState())
+        if state.pid != sample.pid:
+            state.pid = sample.pid
+            state.rss_over_since = None
+
+        reason = self._check_rss(state, settings, sample) or self._check_cpu(
+            module, settings, sample
+        )
+        if reason is None:
+            state.limit_logged = False
+            return
+
+        now = monotonic()
+        while state.recycled_at and state.recycled_at[0] < now - 3600:
+            state.recycled_at.popleft()
+        if len(state.recycled_at) >= settings.max_recycles_per_hour:
+            if not state.limit_logged:
+                logger.warning(
+                    f"Not recycling module {module.name} ({reason}), it was already recycled {len(state.recycled_at)} times in the last hour"
+                )
+                state.limit_logged = True
+            return
+        with self._lock:
+            if module.name in self._recycling:
+                return
+            thread = threading.Thread(
+                target=self._recycle,
+                args=(module, sample.pid, reason),
+                name=f"aw-qt-recycle-{module.name}",
+                daemon=True,
+            )
+            self._recycling[module.name] = thread
+        state.recycled_at.append(now)
+        state.rss_over_since = None
+        thread.start()
+
+    def _check_rss(
+        self, state: _ModuleState, settings: "ModuleSettings", sample: Sample
+    ) -> Optional[str]:
+        if settings.max_rss is None:
+            return None
+        if sample.rss > settings.max_rss:
+            if state.rss_over_since is None:
+                logger.info(
+                    f"Module {settings.name} uses {format_bytes(sample.rss)} of memory, above its max_rss of {format_bytes(settings.max_rss)}"
+                )
+                state.rss_over_since = sample.time
+        elif sample.rss < settings.max_rss * _RSS_HYSTERESIS:
+            state.rss_over_since = None
+        if state.rss_over_since is None:
+            return None
+        if sample.time - state.rss_over_since >= settings.watchdog_window:
+            return f"RSS above {format_bytes(settings.max_rss)} for {settings.watchdog_window:g}s, now {format_bytes(sample.rss)}"
+        return None
+
+    def _check_cpu(
+        self, module: "Module", settings: "ModuleSettings", sample: Sample
+    ) -> Optional[str]:
+        if settings.max_cpu_percent is None:
+            return None
+        samples = [
+            s for s in self.manager.sampler.samples(module) if s.pid == sample.pid
+        ]
+        start = sample.time - settings.watchdog_window
+        # The first sample of a process has no CPU usage yet, so it can only mark the window's start
+        if len(samples) < 2 or samples[0].time > start:
+            return None
+        window = [s.cpu_percent for s in samples[1:] if s.time >= start]
+        average = sum(window) / len(window) if window else 0.0
+        if average > settings.max_cpu_percent:
+            return f"CPU usage averaged {average:.1f}% over {settings.watchdog_window:g}s, above {settings.max_cpu_percent:g}%"
+        return None
+
+    def _recycle(self, module: "Module", pid: int, reason: str) -> None:
+        try:
+            if module.pid != pid:
+                # Restarted or stopped in the meantime
+                return
+            logger.warning(f"Recycling module {module.name} (pid {pid}): {reason}")
+            self.records.append(Recycle(time(), module.name, pid, reason))
+            self.manager.events.record("recycled", module.name, pid=pid, reason=reason)
+            module.stop()
+            module.start(self.manager.testing)
+        except Exception:
+            logger.exception(f"Failed to recycle module {module.name}")
+        finally:
+            with self._lock:
+                del self._recycling[module.name]
+
+    def recycles(self, module_name: str) -> List[Recycle]:
+        """The recent recycles of a module, oldest first"""
+        return [record for record in self.records if record.module == module_name]
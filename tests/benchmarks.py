@@ -0,0 +1,314 @@
+"""
+Benchmarks for module discovery, autostart and shutdown, and end-to-end ``aw-qt --no-gui`` startup.
+
+Runs against a synthetic environment in a temporary directory: a PATH with thousands of
+unrelated entries and a number of stub ``aw-*`` modules (shell scripts that just sleep),
+and private XDG directories, so the results don't depend on what's installed.
+
+Results are saved as JSON in .benchmarks/, and can be compared against an earlier run:
+
+    python ./tests/benchmarks.py --save baseline
+    python ./tests/benchmarks.py --compare .benchmarks/baseline.json
+
+Comparing exits with a non-zero code if any benchmark got slower than the threshold.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / ".benchmarks"
+# Benchmark the working tree, not an installed aw-qt
+sys.path.insert(0, str(REPO_ROOT))
+
+# Older than the discovery cache's guard against racy mtimes, so listings get cached
+_OLD_MTIME = time.time() - 3600
+
+
+def make_environment(
+    root: Path, path_dirs: int, entries_per_dir: int, modules: int
+) -> List[str]:
+    """
+    Creates the synthetic PATH directories and XDG directories in ``root``, and points the
+    environment of this process at them. Returns the names of the stub modules.
+    """
+    sleep = shutil.which("sleep")
+    assert sleep, "sleep not found"
+    stub = f"#!/bin/sh\nexec {sleep} 1000\n"
+
+    path = []
+    for i in range(path_dirs):
+        d = root / "path" / f"bin{i}"
+        d.mkdir(parents=True)
+        for j in range(entries_per_dir):
+            entry = d / f"tool-{i}-{j}"
+            entry.write_text("")
+            # Half of them executable, like in a real bin directory
+            if j % 2:
+                entry.chmod(0o755)
+        path.append(d)
+
+    names = ["aw-server"] + [f"aw-watcher-bench{i}" for i in range(modules - 1)]
+    for i, name in enumerate(names):
+        # Spread the modules over the PATH
+        executable = path[i * path_dirs // len(names)] / name
+        executable.write_text(stub)
+        executable.chmod(0o755)
+    for d in path:
+        os.utime(d, (_OLD_MTIME, _OLD_MTIME))
+
+    os.environ["PATH"] = os.pathsep.join(str(d) for d in path)
+    for var in ["XDG_CONFIG_HOME", "XDG_CACHE_HOME", "XDG_DATA_HOME"]:
+        os.environ[var] = str(root / var.lower())
+    os.environ["XDG_RUNTIME_DIR"] = str(root / "run")
+    (root / "run").mkdir(mode=0o700)
+    # The stub server never becomes ready, don't wait for it
+    config_dir = root / "xdg_config_home" / "activitywatch" / "aw-qt"
+    config_dir.mkdir(parents=True)
+    (config_dir / "aw-qt.toml").write_text(
+        '[aw-qt-testing.modules.aw-server]\nready = ""\n'
+    )
+    return names
+
+
+def measure(
+    func: Callable[[], Any],
+    repeat: int,
+    setup: Optional[Callable[[], Any]] = None,
+    teardown: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = perf_counter()
+        func()
+        runs.append(perf_counter() - start)
+        if teardown:
+            teardown()
+    return _summarize(runs)
+
+
+def bench_manager(names: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    # Imported here, after the environment points at the synthetic directories
+    from aw_qt.config import AwQtSettings
+    from aw_qt.discovery import get_cache_path
+    from aw_qt.manager import Manager
+
+    settings = AwQtSettings(testing=True)
+
+    def remove_cache() -> None:
+        try:
+            os.unlink(get_cache_path())
+        except FileNotFoundError:
+            pass
+
+    # Closed before the temporary directory their event logs are in is removed
+    managers: List[Manager] = []
+
+    def new_manager(rediscover: bool = False) -> Manager:
+        manager = Manager(testing=True, rediscover=rediscover, settings=settings)
+        managers.append(manager)
+        return manager
+
+    results = {}
+    try:
+        results["discover (cold cache)"] = measure(
+            lambda: new_manager(rediscover=True), repeat, setup=remove_cache
+        )
+        # Leaves a cache behind for the next one
+        new_manager()
+        results["discover (warm cache)"] = measure(new_manager, repeat)
+
+        manager = new_manager()
+        assert len(manager.modules) == len(names), manager.modules
+        results["rediscover (in-process)"] = measure(manager.discover_modules, repeat)
+        results[f"autostart ({len(names)} modules)"] = measure(
+            lambda: manager.autostart(names), repeat, teardown=manager.stop_all
+        )
+        results[f"stop_all ({len(names)} modules)"] = measure(
+            manager.stop_all, repeat, setup=lambda: manager.autostart(names)
+        )
+    finally:
+        for m in managers:
+            m.close()
+    return results
+
+
+def bench_end_to_end(names: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    from aw_qt import control
+
+    cmd = [
+        sys.executable,
+        "-c",
+        "from aw_qt import main; main()",
+        "--testing",
+        "--no-gui",
+        f"--autostart-modules={','.join(names)}",
+    ]
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    startup: List[float] = []
+    shutdown: List[float] = []
+    for _ in range(repeat):
+        start = perf_counter()
+        proc = subprocess.Popen(
+            cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            # Started once all modules are reported running on the control socket
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"aw-qt exited with code {proc.returncode}")
+                try:
+                    infos = control.call("status", testing=True, timeout=5.0)
+                except OSError:
+                    infos = []
+                if infos and all(
+                    i["state"] == "ready" for i in infos if i["name"] in names
+                ):
+                    break
+                time.sleep(0.005)
+            startup.append(perf_counter() - start)
+
+            start = perf_counter()
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(60)
+            shutdown.append(perf_counter() - start)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    return {
+        f"aw-qt --no-gui startup ({len(names)} modules)": _summarize(startup),
+        f"aw-qt --no-gui shutdown ({len(names)} modules)": _summarize(shutdown),
+    }
+
+
+def _summarize(runs: List[float]) -> Dict[str, Any]:
+    return {
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "max": max(runs),
+        "runs": runs,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> bool:
+    """Prints the change of the median of each benchmark, returns False if any regressed"""
+    ok = True
+    print(
+        f"\nCompared to {baseline['meta'].get('commit')} ({baseline['meta']['date']}):"
+    )
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:45} (new)")
+            continue
+        change = result["median"] / before["median"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(
+            f"  {name:45} {before['median'] * 1000:9.2f} ms -> {result['median'] * 1000:9.2f} ms"
+            f"  {change:+7.1%}{'  REGRESSED' if regressed else ''}"
+        )
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--path-dirs", type=int, default=50)
+    parser.add_argument("--entries-per-dir", type=int, default=100)
+    parser.add_argument("--modules", type=int, default=20)
+    parser.add_argument(
+        "--no-end-to-end",
+        action="store_true",
+        help="Skip the aw-qt subprocess benchmarks",
+    )
+    parser.add_argument(
+        "--save",
+        help="Name of the results file in .benchmarks/ (default: date and commit)",
+    )
+    parser.add_argument("--compare", help="Results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown of a median that counts as a regression (default: 0.2)",
+    )
+    args = parser.parse_args()
+
+    # Before PATH is replaced with the synthetic one
+    commit = _git_commit()
+    with tempfile.TemporaryDirectory(prefix="aw-qt-bench-") as tmp:
+        names = make_environment(
+            Path(tmp), args.path_dirs, args.entries_per_dir, args.modules
+        )
+        results = bench_manager(names, args.repeat)
+        if not args.no_end_to_end:
+            results.update(bench_end_to_end(names, args.repeat))
+
+    data = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "repeat": args.repeat,
+                "path_dirs": args.path_dirs,
+                "entries_per_dir": args.entries_per_dir,
+                "modules": args.modules,
+            },
+        },
+        "results": results,
+    }
+
+    print(f"{'benchmark':47} {'min ms':>9} {'median ms':>10} {'max ms':>9}")
+    for name, result in results.items():
+        print(
+            f"  {name:45} {result['min'] * 1000:9.2f} {result['median'] * 1000:10.2f} {result['max'] * 1000:9.2f}"
+        )
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    name = args.save or f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'unknown'}"
+    out = RESULTS_DIR / f"{name}.json"
+    out.write_text(json.dumps(data, indent=2))
+    print(f"\nSaved results to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["params"] != data["meta"]["params"]:
+            print("Warning: the baseline was run with different parameters")
+        if not compare(baseline, data, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from aw_qt.manager import Module
+
+
+@pytest.fixture
+def stub_module(tmp_path: Path) -> Callable[[str], Module]:
+    """Makes a module running ``script`` with /bin/sh"""
+
+    def make(script: str) -> Module:
+        path = tmp_path / "aw-stub"
+        path.write_text(f"#!/bin/sh\n{script}\n")
+        path.chmod(0o755)
+        return Module("aw-stub", path, "system")
+
+    return make
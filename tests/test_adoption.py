@@ -0,0 +1,141 @@
+import functools
+import os
+import shutil
+import signal
+import sys
+from pathlib import Path
+from time import monotonic, sleep
+from typing import Callable, List
+
+import pytest
+
+from aw_qt.adoption import AdoptedProcess, is_supported, process_starttime
+from aw_qt.config import ModuleSettings
+from aw_qt.manager import Manager, Module
+from aw_qt.output import OutputCapture, can_hand_over
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = monotonic() + timeout
+    while not condition():
+        if monotonic() > deadline:
+            return False
+        sleep(0.05)
+    return True
+
+
+@pytest.mark.skipif(not is_supported(), reason="needs /proc")
+def test_detached_module_keeps_writing(
+    tmp_path: Path, stub_module: Callable[[str], Module]
+) -> None:
+    capture = OutputCapture(str(tmp_path / "output"))
+    module = stub_module("while :; do echo line; sleep 0.05; done")
+    module._capture = functools.partial(capture.attach, ModuleSettings(module.name, {}))
+    module.start(testing=False)
+    log = tmp_path / "output" / f"{module.name}.log"
+    adopted = None
+    try:
+        assert _wait_for(log.exists)
+        keeper = capture.hand_over([module.name])
+        assert keeper is not None
+        # aw-qt's read ends of the pipes are closed, like when it exits
+        assert _wait_for(lambda: module._process.stdout.closed)  # type: ignore
+        pid = module.pid
+        assert pid is not None
+        starttime = process_starttime(pid)
+        assert starttime is not None
+
+        # The next aw-qt
+        adopted = Module(module.name, module.path, module.type)
+        adopted.adopt(AdoptedProcess([str(adopted.path)], pid, starttime))
+        written = log.stat().st_size
+        sleep(0.5)
+        assert adopted.is_alive()
+        # Still written to the module's output file, by the keeper
+        assert log.stat().st_size > written
+    finally:
+        if adopted is not None:
+            adopted.stop()
+        module.stop()
+
+
+def _manager(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, names: List[str], config: str
+) -> Manager:
+    """A testing manager, with stub modules ``names`` running sleep"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name in names:
+        (bin_dir / name).write_text(f"#!/bin/sh\nexec {shutil.which('sleep')} 60\n")
+        (bin_dir / name).chmod(0o755)
+    config_dir = tmp_path / "config" / "activitywatch" / "aw-qt"
+    config_dir.mkdir(parents=True)
+    (config_dir / "aw-qt.toml").write_text(
+        '[aw-qt-testing.modules."*"]\ndepends_on = []\n' + config
+    )
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return Manager(testing=True)
+
+
+def _stop_modules(manager: Manager) -> None:
+    for module in manager.modules:
+        if module.is_alive():
+            module.stop()
+
+
+def test_detach_stops_forked_modules(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "aw_watcher_forked.py").write_text("import time\ntime.sleep(60)\n")
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(tmp_path)] + sys.path))
+    manager = _manager(
+        tmp_path,
+        monkeypatch,
+        ["aw-watcher-stub", "aw-watcher-forked"],
+        'capture_output = false\n[aw-qt-testing.modules.aw-watcher-forked]\nlaunch = "forkserver"\n',
+    )
+    if manager.forkserver is None:
+        pytest.skip("the forkserver isn't supported here")
+    try:
+        manager.autostart(["aw-watcher-stub", "aw-watcher-forked"])
+        forked = manager.get_module("aw-watcher-forked")
+        stub = manager.get_module("aw-watcher-stub")
+        assert forked is not None and stub is not None
+        assert forked.forked and forked.is_alive()
+        assert manager.detach() == [stub]
+        manager.stop_all()
+        manager.close()
+        # Stopped before the forkserver, rather than killed once it was gone
+        assert forked._last_process is not None
+        assert forked._last_process.returncode == -signal.SIGTERM
+        assert stub.is_alive()
+    finally:
+        _stop_modules(manager)
+
+
+@pytest.mark.skipif(not is_supported(), reason="needs /proc")
+def test_captured_modules_journaled_once_detached(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    manager = _manager(
+        tmp_path,
+        monkeypatch,
+        ["aw-watcher-captured", "aw-watcher-plain"],
+        "[aw-qt-testing.modules.aw-watcher-plain]\ncapture_output = false\n",
+    )
+    if manager.output is None or not can_hand_over():
+        pytest.skip("output can't be handed over here")
+    try:
+        manager.adopt_modules()
+        manager.autostart(["aw-watcher-captured", "aw-watcher-plain"])
+        # Nothing would read the pipes of the captured one after a crash
+        assert [e.name for e in manager.journal.load()] == ["aw-watcher-plain"]
+        manager.detach()
+        assert sorted(e.name for e in manager.journal.load()) == [
+            "aw-watcher-captured",
+            "aw-watcher-plain",
+        ]
+    finally:
+        _stop_modules(manager)
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from aw_qt.config import AwQtSettings
+
+
+@pytest.fixture
+def config_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """The aw-qt config file, in a config directory of its own"""
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    path = tmp_path / "activitywatch" / "aw-qt" / "aw-qt.toml"
+    path.parent.mkdir(parents=True)
+    return path
+
+
+@pytest.mark.skipif(
+    sys.platform != "linux", reason="config directory from XDG_CONFIG_HOME"
+)
+def test_watchdog_window_within_samples(config_file: Path) -> None:
+    config_file.write_text(
+        "[aw-qt-testing]\n"
+        "sample_interval = 10.0\n"
+        "sample_history = 31\n"
+        '[aw-qt-testing.modules."aw-watcher-*"]\n'
+        "max_cpu_percent = 50\n"
+        "watchdog_window = 300\n"
+    )
+    assert AwQtSettings(testing=True).module("aw-watcher-afk").watchdog_window == 300
+    config_file.write_text(config_file.read_text().replace("31", "30"))
+    with pytest.raises(ValueError, match="watchdog_window"):
+        AwQtSettings(testing=True)
+
+
+@pytest.mark.skipif(
+    sys.platform != "linux", reason="config directory from XDG_CONFIG_HOME"
+)
+def test_modules_depend_on_server_by_default(config_file: Path) -> None:
+    settings = AwQtSettings(testing=True)
+    servers = ["aw-server", "aw-server-rust"]
+    for name in ["aw-watcher-afk", "aw-sync", "aw-notify"]:
+        assert settings.module(name).depends_on == servers
+    for name in servers:
+        assert settings.module(name).depends_on == []
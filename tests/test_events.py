@@ -0,0 +1,102 @@
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from aw_qt.events import EventLog, read_events, summarize
+from aw_qt.manager import Module
+
+
+def test_events_are_buffered(tmp_path: Path) -> None:
+    path = tmp_path / "events.jsonl"
+    log = EventLog(str(path), flush_interval=60.0)
+    log.record("spawned", "aw-server", pid=123, duration=0.01)
+    assert not path.exists() or path.read_text() == ""
+    # Exits are written right away, with what was buffered before them
+    log.record("exited", "aw-server", pid=123, returncode=-9, signal="SIGKILL")
+    assert [e["event"] for e in read_events(str(path))] == ["spawned", "exited"]
+    log.record("spawned", "aw-server", pid=124)
+    log.close()
+    events = read_events(str(path))
+    assert [e["pid"] for e in events] == [123, 123, 124]
+    assert events[1]["signal"] == "SIGKILL"
+
+
+def test_events_flushed_after_interval(tmp_path: Path) -> None:
+    path = tmp_path / "events.jsonl"
+    log = EventLog(str(path), flush_interval=0.1)
+    log.record("paused", "aw-watcher-afk", pid=1)
+    log._timer.join(5.0)  # type: ignore[union-attr]
+    assert len(read_events(str(path))) == 1
+    log.close()
+
+
+def test_events_rotated(tmp_path: Path) -> None:
+    path = tmp_path / "events.jsonl"
+    log = EventLog(str(path), max_bytes=500, backup_count=2, flush_interval=60.0)
+    for i in range(20):
+        log.record("exited", "aw-watcher-window", pid=i)
+    log.close()
+    assert (tmp_path / "events.jsonl.1").exists()
+    assert not (tmp_path / "events.jsonl.3").exists()
+    pids = [e["pid"] for e in read_events(str(path))]
+    # Oldest first, across the rotated files, the oldest ones were rotated away
+    assert pids == sorted(pids) and pids[-1] == 19 and pids[0] > 0
+
+
+def test_read_events_filters(tmp_path: Path) -> None:
+    path = tmp_path / "events.jsonl"
+    log = EventLog(str(path))
+    log.record("spawned", "aw-server", pid=1)
+    log.record("spawned", "aw-watcher-afk", pid=2)
+    log.record("stopped", "aw-watcher-afk", pid=2, uptime=10.0)
+    log.close()
+    with open(path, "a") as f:
+        # Cut short by a crash
+        f.write('{"time": 1, "event": "spa')
+    assert len(read_events(str(path))) == 3
+    assert [e["pid"] for e in read_events(str(path), modules=["aw-server"])] == [1]
+    assert len(read_events(str(path), events=["spawned"])) == 2
+    first = json.loads(path.read_text().split("\n")[0])
+    assert read_events(str(path), since=first["time"] + 3600) == []
+
+
+def test_summarize() -> None:
+    events: List[Dict[str, Any]] = [
+        {"event": "spawned", "module": "aw-server"},
+        {"event": "ready", "module": "aw-server", "duration": 1.0},
+        {"event": "exited", "module": "aw-server", "uptime": 100.0},
+        {"event": "restarted", "module": "aw-server"},
+        {"event": "spawned", "module": "aw-server"},
+        {"event": "ready", "module": "aw-server", "duration": 3.0},
+        {"event": "killed", "module": "aw-server", "uptime": 50.0},
+    ]
+    stats = summarize(events)["aw-server"]
+    assert (stats["starts"], stats["crashes"], stats["kills"]) == (2, 1, 1)
+    assert stats["uptime"] == 150.0
+    assert stats["mean_ready_time"] == 2.0
+
+
+def test_module_lifecycle_events(
+    tmp_path: Path, stub_module: Callable[[str], Module]
+) -> None:
+    path = tmp_path / "events.jsonl"
+    log = EventLog(str(path))
+    module = stub_module("exec sleep 60")
+    module._events = log
+    module.start(testing=True)
+    pid = module.pid
+    assert module.pause()
+    assert module.resume()
+    module.stop()
+    log.close()
+    events = read_events(str(path))
+    assert [e["event"] for e in events] == [
+        "spawned",
+        "ready",
+        "paused",
+        "resumed",
+        "stopped",
+    ]
+    assert all(e["module"] == "aw-stub" and e["pid"] == pid for e in events)
+    assert events[-1]["returncode"] == -15
+    assert events[-1]["uptime"] >= 0
@@ -0,0 +1,68 @@
+import os
+import signal
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from aw_qt.forkserver import ForkServer, is_supported
+
+pytestmark = pytest.mark.skipif(not is_supported(), reason="needs fork")
+
+_MODULE = """\
+import sys
+import time
+
+
+def main():
+    print(" ".join(sys.argv))
+    sys.exit(3)
+
+
+if __name__ == "__main__":
+    print("running", sys.argv[1], file=sys.stderr)
+    if sys.argv[1] == "sleep":
+        time.sleep(60)
+    sys.exit(int(sys.argv[1]))
+"""
+
+
+@pytest.fixture
+def forkserver(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[ForkServer]:
+    (tmp_path / "aw_forked_stub.py").write_text(_MODULE)
+    # Imported by the forkserver, which is started with aw-qt's environment
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(tmp_path)] + sys.path))
+    server = ForkServer([])
+    yield server
+    server.stop()
+
+
+def test_spawn_reports_exit_code(forkserver: ForkServer) -> None:
+    process = forkserver.spawn("aw_forked_stub", ["aw-forked-stub", "5"], capture=True)
+    assert process.pid > 0
+    assert process.wait(timeout=10) == 5
+    assert process.poll() == 5
+    assert process.stderr is not None
+    assert process.stderr.read() == b"running 5\n"
+
+
+def test_spawn_function(forkserver: ForkServer) -> None:
+    process = forkserver.spawn(
+        "aw_forked_stub:main", ["aw-forked-stub", "--testing"], capture=True
+    )
+    assert process.wait(timeout=10) == 3
+    assert process.stdout is not None
+    assert process.stdout.read() == b"aw-forked-stub --testing\n"
+
+
+def test_terminate(forkserver: ForkServer) -> None:
+    process = forkserver.spawn(
+        "aw_forked_stub", ["aw-forked-stub", "sleep"], capture=True
+    )
+    assert process.stderr is not None
+    # Started running the module, rather than being killed while still being set up
+    assert process.stderr.readline() == b"running sleep\n"
+    assert process.poll() is None
+    process.terminate()
+    assert process.wait(timeout=10) == -signal.SIGTERM
@@ -0,0 +1,33 @@
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional, Set
+
+import pytest
+
+from aw_qt.hotplug import DirectoryWatcher
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs inotify")
+def test_watcher_matches_names(tmp_path: Path) -> None:
+    calls: List[Optional[Set[str]]] = []
+    called = threading.Event()
+
+    def on_change(changed: Optional[Set[str]]) -> None:
+        calls.append(changed)
+        called.set()
+
+    watcher = DirectoryWatcher(on_change, match=lambda name: name == "aw-qt.toml")
+    watcher.start([str(tmp_path)])
+    try:
+        assert watcher.uses_inotify
+        (tmp_path / "aw-watcher-stub").write_text("")
+        (tmp_path / ".aw-qt.toml.swp").write_text("")
+        assert not called.wait(1.0)
+        # Saved like editors do, through a temporary file
+        (tmp_path / "aw-qt.toml.tmp").write_text("[aw-qt]\n")
+        (tmp_path / "aw-qt.toml.tmp").rename(tmp_path / "aw-qt.toml")
+        assert called.wait(5.0)
+    finally:
+        watcher.stop()
+    assert calls == [{str(tmp_path)}]
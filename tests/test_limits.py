@@ -0,0 +1,37 @@
+import resource
+import sys
+from pathlib import Path
+from time import monotonic, sleep
+from typing import Callable
+
+import pytest
+
+from aw_qt.limits import ProcessLimits
+from aw_qt.manager import Module
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs prlimit")
+def test_limits_applied_before_exec(
+    tmp_path: Path, stub_module: Callable[[str], Module]
+) -> None:
+    out = tmp_path / "limits"
+    module = stub_module(
+        f"(ulimit -Sn; ulimit -Hn) > {out}.tmp && mv {out}.tmp {out}; exec sleep 60"
+    )
+    module.limits = ProcessLimits(rlimit_nofile=64)
+    module.start(testing=True)
+    try:
+        deadline = monotonic() + 5.0
+        while not out.exists() and monotonic() < deadline:
+            sleep(0.05)
+    finally:
+        module.stop()
+    soft, hard = out.read_text().split()
+    # In effect from the module's first command on
+    assert soft == "64"
+    # Only the soft limit is set, so a reload can raise it again
+    _, expected_hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if expected_hard == resource.RLIM_INFINITY:
+        assert hard == "unlimited"
+    else:
+        assert int(hard) == expected_hard
@@ -0,0 +1,29 @@
+from aw_qt.manager import _dependency_levels
+
+
+def test_dependency_levels() -> None:
+    depends_on = {
+        "aw-watcher-afk": ["aw-server"],
+        "aw-watcher-window": ["aw-server"],
+        "aw-watcher-input": ["aw-watcher-afk"],
+    }
+    names = ["aw-watcher-input", "aw-watcher-window", "aw-watcher-afk", "aw-server"]
+    assert _dependency_levels(names, depends_on) == [
+        ["aw-server"],
+        ["aw-watcher-afk", "aw-watcher-window"],
+        ["aw-watcher-input"],
+    ]
+
+
+def test_dependency_levels_independent() -> None:
+    assert _dependency_levels(["b", "a"], {}) == [["a", "b"]]
+
+
+def test_dependency_levels_cycle() -> None:
+    depends_on = {"a": ["b"], "b": ["a"], "c": ["d"]}
+    # The modules in the cycle are returned last, after everything that can be ordered
+    assert _dependency_levels(["a", "b", "c", "d"], depends_on) == [
+        ["d"],
+        ["c"],
+        ["a", "b"],
+    ]
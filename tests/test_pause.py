@@ -0,0 +1,68 @@
+import os
+import signal
+import sys
+from contextlib import suppress
+from pathlib import Path
+from time import sleep
+from typing import Callable
+
+import pytest
+
+from aw_qt.manager import Module
+from aw_qt.pause import format_window, in_window, parse_window
+
+
+def _lines(path: Path) -> int:
+    return len(path.read_text().splitlines()) if path.exists() else 0
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="No SIGSTOP on Windows")
+def test_pause_stops_children(
+    tmp_path: Path, stub_module: Callable[[str], Module]
+) -> None:
+    out = tmp_path / "ticks"
+    # Like a PyInstaller bootloader, the work happens in a child process
+    module = stub_module(f"(while :; do echo tick >> {out}; sleep 0.02; done) & wait")
+    module.start(testing=True)
+    try:
+        sleep(0.3)
+        assert module.pause()
+        sleep(0.1)
+        paused = _lines(out)
+        sleep(0.3)
+        assert _lines(out) == paused
+        assert module.resume()
+        sleep(0.3)
+        assert _lines(out) > paused
+    finally:
+        pid = module.pid
+        module.stop()
+        # The loop isn't stopped along with the shell
+        if pid is not None:
+            with suppress(ProcessLookupError):
+                os.killpg(pid, signal.SIGKILL)
+
+
+def test_parse_window() -> None:
+    assert parse_window("22:00-07:00") == (22 * 60, 7 * 60)
+    assert parse_window(" 09:30 - 17:05 ") == (9 * 60 + 30, 17 * 60 + 5)
+    assert format_window(parse_window("22:00-07:00")) == "22:00-07:00"
+    for spec in ["22:00", "24:00-07:00", "22:60-07:00", "ten-eleven"]:
+        with pytest.raises(ValueError):
+            parse_window(spec)
+
+
+def test_in_window() -> None:
+    day = parse_window("09:00-17:00")
+    assert in_window(day, 9 * 60)
+    assert in_window(day, 16 * 60 + 59)
+    assert not in_window(day, 17 * 60)
+    assert not in_window(day, 8 * 60 + 59)
+
+    # Ends on the next day
+    night = parse_window("22:00-07:00")
+    assert in_window(night, 23 * 60)
+    assert in_window(night, 0)
+    assert in_window(night, 6 * 60 + 59)
+    assert not in_window(night, 7 * 60)
+    assert not in_window(night, 12 * 60)
@@ -0,0 +1,55 @@
+import sys
+from importlib.abc import Loader
+from importlib.machinery import ModuleSpec
+from typing import Any, Iterator, Optional
+
+import pytest
+
+from aw_qt.profiling import _ImportTimer
+
+_SOURCES = {
+    "aw_stub_first": "import time; time.sleep(0.05)",
+    "aw_stub_second": "import time; time.sleep(0.1)",
+}
+
+
+class _SharedLoader(Loader):
+    """One loader instance for several modules, like PyInstaller's FrozenImporter"""
+
+    def find_spec(
+        self, fullname: str, path: Any, target: Any = None
+    ) -> Optional[ModuleSpec]:
+        if fullname not in _SOURCES:
+            return None
+        return ModuleSpec(fullname, self)
+
+    def create_module(self, spec: ModuleSpec) -> None:
+        return None
+
+    def exec_module(self, module: Any) -> None:
+        exec(_SOURCES[module.__name__], module.__dict__)
+
+
+@pytest.fixture
+def timer() -> Iterator[_ImportTimer]:
+    timer = _ImportTimer()
+    loader = _SharedLoader()
+    sys.meta_path.insert(0, loader)  # type: ignore[arg-type]
+    sys.meta_path.insert(0, timer)  # type: ignore[arg-type]
+    yield timer
+    sys.meta_path.remove(timer)  # type: ignore[arg-type]
+    sys.meta_path.remove(loader)  # type: ignore[arg-type]
+    for name in _SOURCES:
+        sys.modules.pop(name, None)
+
+
+def test_shared_loader_timed_per_module(timer: _ImportTimer) -> None:
+    import aw_stub_first  # type: ignore[import-not-found]  # noqa: F401
+    import aw_stub_second  # type: ignore[import-not-found]  # noqa: F401
+
+    assert set(timer.times) == {"aw_stub_first", "aw_stub_second"}
+    assert 0.05 <= timer.times["aw_stub_first"][0] < 0.1
+    assert timer.times["aw_stub_second"][0] >= 0.1
+    # The wrapper isn't left behind
+    assert isinstance(aw_stub_second.__loader__, _SharedLoader)
+    assert isinstance(aw_stub_second.__spec__.loader, _SharedLoader)
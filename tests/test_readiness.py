@@ -0,0 +1,158 @@
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import monotonic
+from typing import Callable, Iterator
+
+import pytest
+
+from aw_qt.manager import Module
+from aw_qt.readiness import FileProbe, HttpProbe, TcpProbe, parse_probe
+
+
+class _InfoHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path == "/api/0/info":
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'{"hostname": "test"}')
+        else:
+            self.send_error(404)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[ThreadingHTTPServer]:
+    """A stub of aw-server's info endpoint on a free port"""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _InfoHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _free_port() -> int:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _InfoHandler)
+    port = httpd.server_address[1]
+    httpd.server_close()
+    return port
+
+
+def test_parse_probe() -> None:
+    probe = parse_probe("tcp://localhost:5600")
+    assert isinstance(probe, TcpProbe)
+    assert (probe.host, probe.port) == ("localhost", 5600)
+    assert isinstance(parse_probe("http://localhost:5600/api/0/info"), HttpProbe)
+    assert isinstance(parse_probe("file:///run/aw.pid"), FileProbe)
+    assert isinstance(parse_probe("/run/aw.pid"), FileProbe)
+    for invalid in ["tcp://localhost", "localhost:5600", "ftp://localhost/"]:
+        with pytest.raises(ValueError):
+            parse_probe(invalid)
+
+
+def test_http_probe(server: ThreadingHTTPServer) -> None:
+    port = server.server_address[1]
+    assert HttpProbe(f"http://127.0.0.1:{port}/api/0/info").check()
+    assert not HttpProbe(f"http://127.0.0.1:{port}/missing").check()
+    assert not HttpProbe(f"http://127.0.0.1:{_free_port()}/api/0/info").check()
+
+
+def test_tcp_probe(server: ThreadingHTTPServer) -> None:
+    assert TcpProbe("127.0.0.1", server.server_address[1]).check()
+    assert not TcpProbe("127.0.0.1", _free_port()).check()
+
+
+def test_file_probe(tmp_path: Path) -> None:
+    probe = FileProbe(str(tmp_path / "ready"))
+    assert not probe.check()
+    (tmp_path / "ready").touch()
+    assert probe.check()
+
+
+def test_module_ready_once_server_is_up(stub_module: Callable[[str], Module]) -> None:
+    port = _free_port()
+    module = stub_module("exec sleep 60")
+    module.probe = HttpProbe(f"http://127.0.0.1:{port}/api/0/info")
+    module.start(testing=True)
+    try:
+        assert module.state == "starting"
+        # Not ready while nothing listens on the port
+        assert not module.wait_ready(0.3)
+        assert module.state == "starting"
+
+        httpd = ThreadingHTTPServer(("127.0.0.1", port), _InfoHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            assert module.wait_ready(5.0)
+            assert module.state == "ready"
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+    finally:
+        module.stop()
+    assert module.state == "stopped"
+
+
+def test_module_without_probe_is_ready(stub_module: Callable[[str], Module]) -> None:
+    module = stub_module("exec sleep 60")
+    module.start(testing=True)
+    try:
+        assert module.state == "ready"
+        assert module.wait_ready(0)
+    finally:
+        module.stop()
+
+
+def test_module_exit_ends_probing(stub_module: Callable[[str], Module]) -> None:
+    module = stub_module("exit 1")
+    module.probe = TcpProbe("127.0.0.1", _free_port())
+    module.ready_timeout = 30.0
+    start = monotonic()
+    module.start(testing=True)
+    assert not module.wait_ready(10.0)
+    assert monotonic() - start < 5.0
+    module.stop()
+
+
+def test_autostart_waits_for_ready_dependency(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from aw_qt.manager import Manager
+
+    port = _free_port()
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name in ["aw-server", "aw-watcher-stub"]:
+        (bin_dir / name).write_text(f"#!/bin/sh\nexec {shutil.which('sleep')} 60\n")
+        (bin_dir / name).chmod(0o755)
+    config_dir = tmp_path / "config" / "activitywatch" / "aw-qt"
+    config_dir.mkdir(parents=True)
+    (config_dir / "aw-qt.toml").write_text(
+        f'[aw-qt-testing.modules.aw-server]\nready = "http://127.0.0.1:{port}/api/0/info"\n'
+    )
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    manager = Manager(testing=True)
+    httpd = ThreadingHTTPServer(("127.0.0.1", port), _InfoHandler)
+    # The server only starts answering a while after it was started
+    timer = threading.Timer(0.5, httpd.serve_forever)
+    timer.start()
+    try:
+        start = monotonic()
+        manager.autostart(["aw-watcher-stub", "aw-server"])
+        watcher = manager.get_module("aw-watcher-stub")
+        server = manager.get_module("aw-server")
+        assert watcher is not None and server is not None
+        assert server.state == "ready"
+        assert watcher.started_at is not None and watcher.started_at - start >= 0.5
+    finally:
+        manager.stop_all()
+        httpd.shutdown()
+        timer.join()
+        httpd.server_close()
@@ -0,0 +1,102 @@
+import random
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from aw_qt import supervisor as supervisor_module
+from aw_qt.config import ModuleSettings
+from aw_qt.manager import Module
+from aw_qt.supervisor import Supervisor
+
+
+class _StubSettings:
+    def __init__(self, section: Dict[str, Any]) -> None:
+        self.section = section
+
+    def module(self, name: str) -> ModuleSettings:
+        return ModuleSettings(name, self.section)
+
+
+class _StubManager:
+    """The parts of a `Manager` the supervisor uses"""
+
+    def __init__(self, section: Dict[str, Any]) -> None:
+        self.settings = _StubSettings(section)
+        self.exited: List[Module] = []
+
+    def handle_exits(self) -> List[Module]:
+        exited, self.exited = self.exited, []
+        return exited
+
+
+def _supervisor(**section: Any) -> Supervisor:
+    return Supervisor(_StubManager(section))  # type: ignore[arg-type]
+
+
+def test_start_failed_counts_as_crash(tmp_path: Path) -> None:
+    supervisor = _supervisor(restart_delay=1.0, restart_limit=2)
+    module = Module("aw-stub", tmp_path / "aw-stub", "system")
+    delay = supervisor.start_failed(module)
+    assert delay is not None and 0.5 <= delay <= 1.0
+    # Given up on like a module that keeps crashing
+    assert supervisor.start_failed(module) is None
+    assert module.state == "failed"
+
+
+def test_start_failed_never_restarted(tmp_path: Path) -> None:
+    supervisor = _supervisor(restart="never")
+    module = Module("aw-stub", tmp_path / "aw-stub", "system")
+    assert supervisor.start_failed(module) is None
+    assert module.state != "failed"
+
+
+def test_backoff_doubles_up_to_max(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Without jitter, the full delay
+    monkeypatch.setattr(random, "uniform", lambda a, b: b)
+    supervisor = _supervisor(restart_delay=1.0, restart_delay_max=5.0, restart_limit=10)
+    module = Module("aw-stub", tmp_path / "aw-stub", "system")
+    delays = [supervisor.start_failed(module) for _ in range(5)]
+    assert delays == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_backoff_jitter(tmp_path: Path) -> None:
+    supervisor = _supervisor(restart_delay=4.0, restart_limit=100)
+    for i in range(50):
+        module = Module(f"aw-stub-{i}", tmp_path / "aw-stub", "system")
+        delay = supervisor.start_failed(module)
+        # Between half and all of the delay
+        assert delay is not None and 2.0 <= delay <= 4.0
+
+
+def test_restart_window_forgets_old_crashes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = 1000.0
+    monkeypatch.setattr(supervisor_module, "monotonic", lambda: now)
+    supervisor = _supervisor(restart_delay=1.0, restart_limit=2, restart_window=60.0)
+    module = Module("aw-stub", tmp_path / "aw-stub", "system")
+    assert supervisor.start_failed(module) is not None
+    now += 61.0
+    # The first crash is out of the window, so this is the only one in it
+    assert supervisor.start_failed(module) is not None
+    now += 1.0
+    assert supervisor.start_failed(module) is None
+    assert module.state == "failed"
+
+
+def test_on_failure_ignores_clean_exit(stub_module: Callable[[str], Module]) -> None:
+    supervisor = _supervisor(restart="on-failure")
+    manager = supervisor.manager
+    decisions = {}
+    for code in [0, 1]:
+        module = stub_module(f"exit {code}")
+        module.start(testing=True)
+        assert module._process is not None
+        module._process.wait(timeout=10)
+        manager.exited.append(module)  # type: ignore[attr-defined]
+        [(_, decisions[code])] = supervisor.process_exits()
+    assert decisions[0] is None
+    assert decisions[1] is not None
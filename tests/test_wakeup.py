@@ -0,0 +1,28 @@
+import os
+import threading
+from typing import List
+
+from aw_qt.wakeup import SelectThread
+
+
+def test_select_thread_calls_back_until_removed() -> None:
+    thread = SelectThread("test-select")
+    r, w = os.pipe()
+    os.set_blocking(r, False)
+    read: List[bytes] = []
+    closed = threading.Event()
+
+    def on_readable() -> None:
+        data = os.read(r, 4096)
+        read.append(data)
+        if not data:
+            # Removed from within the callback, before the next select()
+            thread.remove(r, closed.set)
+
+    thread.add(r, on_readable)
+    os.write(w, b"line")
+    os.close(w)
+    assert closed.wait(5.0)
+    os.close(r)
+    assert b"".join(read) == b"line"
+    assert read[-1] == b""
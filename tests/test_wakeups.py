@@ -0,0 +1,105 @@
+import os
+import signal
+import socket
+import sys
+import threading
+from time import monotonic
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+# No display needed, nor a system tray
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtCore = pytest.importorskip("PyQt6.QtCore")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+from aw_qt.trayicon import SignalWakeup, WakeupCounter, create_trayicon  # noqa: E402
+
+# Wakeups per second of an idle event loop, it used to be woken up 10 times a second.
+# On Windows the user switch check (see `create_trayicon`) still wakes it up every 10s.
+IDLE_WAKEUP_BUDGET = 1.0
+# Starting and quitting the event loop (with a timer) wakes it up too
+_RUN_WAKEUPS = 2
+
+
+@pytest.fixture
+def app() -> Iterator[QtWidgets.QApplication]:
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    wakeup = SignalWakeup(app)
+    yield app
+    wakeup.close()
+
+
+class _StubModel:
+    def subscribe(self, callback: Any) -> None:
+        pass
+
+
+class _StubSettings:
+    groups: Dict[str, Any] = {}
+
+
+class _StubManager:
+    """The parts of a `Manager` the tray icon uses, without any modules"""
+
+    def __init__(self) -> None:
+        self.model = _StubModel()
+        self.settings = _StubSettings()
+        self.modules_bundled: List[Any] = []
+        self.modules_system: List[Any] = []
+        self.paused_groups: List[str] = []
+        self.exit_notifier, self._exit_notifier_w = socket.socketpair()
+
+    def close(self) -> None:
+        self.exit_notifier.close()
+        self._exit_notifier_w.close()
+
+
+class _StubSupervisor:
+    def process_exits(self) -> List[Any]:
+        return []
+
+
+@pytest.fixture
+def trayicon(app: QtWidgets.QApplication) -> Iterator[Any]:
+    manager = _StubManager()
+    widget = QtWidgets.QWidget()
+    trayicon = create_trayicon(manager, _StubSupervisor(), widget, testing=True)  # type: ignore[arg-type]
+    yield trayicon
+    trayicon.hide()
+    trayicon.deleteLater()
+    manager.close()
+
+
+def _run_for(app: QtWidgets.QApplication, seconds: float) -> None:
+    QtCore.QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec()
+
+
+def test_idle_wakeups(app: QtWidgets.QApplication, trayicon: Any) -> None:
+    # Let startup events settle first
+    _run_for(app, 0.2)
+    counter = WakeupCounter(app)
+    start = monotonic()
+    _run_for(app, 3.0)
+    rate = (counter.count - _RUN_WAKEUPS) / (monotonic() - start)
+    assert rate < IDLE_WAKEUP_BUDGET, f"{counter.count} wakeups"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="No SIGUSR1 on Windows")
+def test_signal_handled_while_idle(app: QtWidgets.QApplication) -> None:
+    handled = []
+
+    def handler(signum: int, frame: object) -> None:
+        handled.append(monotonic())
+        app.quit()
+
+    previous = signal.signal(signal.SIGUSR1, handler)
+    try:
+        sent = monotonic()
+        threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGUSR1)).start()
+        # Only quits early if the handler runs while Qt is waiting
+        _run_for(app, 5.0)
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+    assert handled and handled[0] - sent < 1.0